@@ -1,16 +1,26 @@
-from datetime import datetime, timedelta
+import base64
 import json
-from flask import jsonify, request
+from flask import Response, jsonify, request, stream_with_context
 import traceback
 from Urls import Urls
-from Utils import Utils
-from retrivedata import retrieve_data
-import io
-import pytz
+from derived import METRICS
+from utils.conditional import is_fresh, make_etag, not_modified
+from utils.encoding import negotiate, respond
+from history_cache import ist_midnight
+from history_query import AGGREGATIONS, column_names, day_high_water, downsample, iter_rows, query, query_range, select_dates
 import requests
 
 FILE_PATH = "Percentage_Data.json"
 
+# Datasets the batch history endpoint can read, by request name
+HISTORY_DATASETS = {"percentage": "Percentage", "delta": "Delta", "iv": "Delta"}
+MAX_BATCH_STRIKES = 100
+MAX_BATCH_FIELDS = 20
+STREAM_CHUNK_BYTES = 64 * 1024  # streamed history is flushed in chunks of about this size
+# Downsampling buckets and cursors count from 1970-01-01 00:00 IST, so every
+# response and poll uses the same bucket edges, whichever sessions it covers
+BUCKET_ORIGIN = -19800
+
 
 class App:
 
@@ -108,433 +118,410 @@ class App:
             traceback.print_exc()
             return jsonify({"error": f"Server encountered an error: {str(e)}"}), 500
 
-    def get_percentage_data(symbol, exp, isCe, strike):
-        try:
-            FILE_PATH = "Percentage"
-            # Define the IST timezone
-            ist = pytz.timezone("Asia/Kolkata")
-            curr_date_ist = datetime.now(ist).replace(
-                hour=0, minute=0, second=0, microsecond=0
+    def _history(symbol, exp, file_path, window=None, **kwargs):
+        """Run a history query (today unless `date` is given); returns (result, None) or (None, error response)
+
+        `window` holds the request's optional "from"/"to" (epoch seconds),
+        "step" (bucket seconds), "agg" (last, mean or ohlc), "days" (the
+        last N sessions) and "since" (a timestamp or the "cursor" of the previous
+        response, to fetch only newer points). A range reaching past today
+        spans several sessions. Freshness is checked against the storage
+        high-water marks before anything is read: a request whose
+        If-None-Match/If-Modified-Since still matches gets the 304 (412 for
+        POST) as its error response.
+        """
+        exp, error = App._expiry(symbol, exp)
+        if error:
+            return None, error
+        params, error = App._window(window)
+        if error:
+            return None, error
+        start, end, step, agg, days, since = (
+            params[key] for key in ("start", "end", "step", "agg", "days", "since")
+        )
+
+        name = Urls.symbol_list[symbol]
+        if kwargs.get("date") is not None:
+            dates = [int(kwargs["date"])]
+        else:
+            kwargs.pop("date", None)
+            dates = select_dates(file_path, name, exp, start, end, days)
+        # Marks are read before the query, so the ETag never claims newer data than the body
+        validators = App._validators([day_high_water(file_path, name, exp, date) for date in dates])
+        if is_fresh(validators["etag"], validators["last_modified"]):
+            return None, not_modified(**validators)
+
+        if kwargs.get("date") is not None:
+            result = query(file_path, name, exp, start=start, end=end, **kwargs)
+        else:
+            result = query_range(file_path, name, exp, start=start, end=end, days=days, dates=dates, **kwargs)
+        if result is None:
+            return None, (jsonify({"error": "Expiry or date not found", "symbol": symbol, "expiry": exp}), 404)
+        # Nothing read for the strike is a 404, except on a cursor poll: that
+        # found nothing new and gets an empty delta with the same cursor
+        if not result["timestamp"] and result["missing"] and since is None:
+            return None, (
+                jsonify({"error": "Strike not found", "symbol": symbol, "expiry": exp, "strike": (kwargs.get("strikes") or [None])[0]}),
+                404,
             )
-            curr_date = int(curr_date_ist.timestamp())
-
-            symbol_id = Urls.symbol_list[symbol]
-
-            # Load data (assuming retrieve_data is a working function that loads JSON data correctly)
-            retrived_data = retrieve_data(symbol_id, exp, curr_date, FILE_PATH)
-            # print("Current Date Timestamp:", curr_date)
-
-            with io.StringIO() as file:
-                json.dump(retrived_data, file, indent=4)
-                file.seek(0)
-                data = json.load(file)
-
-            # Initialize lists to store the extracted values
-            timestamp = []
-            oi = []
-            oichng = []
-            vol = []
-
-            # Check if the expiry data is available
-            if "day" in data and str(curr_date) in str(data["day"]):
-                print("Day found in data.")
-                for key, value in data["day"][str(curr_date)].items():
-                    percent_type = "ce_data" if isCe else "pe_data"
-                    percent_data = value.get(percent_type, {})
-
-                    # Check if the specific strike price data exists
-                    if str(strike) in percent_data.keys():
-                        # print(strike, "2")
-                        timestamp.append(key)
-                        oi.append(percent_data[str(strike)].get("OI_percentage", 0))
-                        oichng.append(
-                            percent_data[str(strike)].get("oichng_percentage", 0)
-                        )
-                        vol.append(percent_data[str(strike)].get("vol_percentage", 0))
-                    else:
-                        return (
-                            json.dumps(
-                                {
-                                    "error": "Strike not found",
-                                    "symbol": symbol,
-                                    "expiry": exp,
-                                    "strike": strike,
-                                }
-                            ),
-                            404,
-                        )
-            else:
-                # Return error if the expiry or day data is not found
-                print(f"Expiry {exp} or current date {curr_date} not found in data.")
-                return (
-                    json.dumps(
-                        {
-                            "error": "Expiry or date not found",
-                            "symbol": symbol,
-                            "expiry": exp,
-                        }
-                    ),
-                    404,
-                )
+        result["validators"] = validators
+        result["step"], result["agg"] = step, agg
+        result["cursor"] = App._next_cursor(result, since)
+        return result, None
+
+    def _validators(marks):
+        """ETag/Last-Modified from the storage high-water mark of every day to be read.
+
+        The body is a function of the request and of what is stored, so the
+        ETag hashes the request (path, parameters, negotiated format) with
+        each day's snapshot count and newest timestamp. Finished sessions
+        are immutable.
+        """
+        etag = make_etag(
+            request.path,
+            request.args.to_dict(flat=False),
+            request.get_json(silent=True),
+            negotiate(request.accept_mimetypes),
+            marks,
+        )
+        newest = [last for _, _, last in marks if last is not None]
+        return {
+            "etag": etag,
+            "last_modified": max(newest) if newest else None,
+            "immutable": all(date < ist_midnight() for date, _, _ in marks),
+        }
+
+    def _expiry(symbol, exp):
+        """Validate the symbol and expiry; returns (expiry, None) or (None, error response)"""
+        if symbol not in Urls.symbol_list:
+            return None, (jsonify({"error": f"Invalid symbol: {symbol}"}), 400)
+        try:
+            return int(exp), None
+        except (ValueError, TypeError):
+            return None, (jsonify({"error": "'exp_sid' must be a valid integer"}), 400)
 
-            # Return the extracted data as JSON response
-            return (
-                json.dumps(
-                    {
-                        "symbol": symbol,
-                        "strike": strike,
-                        "isCe": isCe,
-                        "expiry": exp,
-                        "timestamp": timestamp,
-                        "oi": oi,
-                        "oichng": oichng,
-                        "vol": vol,
-                    }
-                ),
-                200,
+    def _window(window):
+        """Parse the range/downsampling/polling parameters; returns (params, None) or (None, error response)"""
+        window = window or {}
+        try:
+            start, end, step, days = (
+                int(window[key]) if window.get(key) not in (None, "") else None
+                for key in ("from", "to", "step", "days")
+            )
+        except (ValueError, TypeError):
+            return None, (jsonify({"error": "'from', 'to', 'step' and 'days' must be integers"}), 400)
+        agg = str(window.get("agg") or "last").lower()
+        if agg not in AGGREGATIONS or (step is not None and step <= 0):
+            return None, (jsonify({"error": f"'step' must be positive and 'agg' one of {list(AGGREGATIONS)}"}), 400)
+        try:
+            since = App._decode_cursor(window.get("since") or window.get("cursor"))
+        except (ValueError, TypeError):
+            return None, (jsonify({"error": "'since' must be a timestamp or a cursor from a previous response"}), 400)
+        if since is not None:
+            start = max(start or 0, since + 1)
+        return {"start": start, "end": end, "step": step, "agg": agg, "days": days, "since": since}, None
+
+    def _decode_cursor(value):
+        # Plain epoch seconds, or the opaque cursor handed out by _next_cursor
+        if value in (None, ""):
+            return None
+        if isinstance(value, int) or str(value).isdigit():
+            return int(value)
+        return int(base64.urlsafe_b64decode(str(value).encode()).decode())
+
+    def _next_cursor(result, since):
+        """Cursor for the next poll; with a step it rewinds to the last, possibly partial, bucket"""
+        if not result["timestamp"]:
+            last = since
+        elif result["step"]:
+            newest = int(result["timestamp"][-1])
+            last = newest - (newest - BUCKET_ORIGIN) % result["step"] - 1
+        else:
+            last = int(result["timestamp"][-1])
+        return App._encode_cursor(last)
+
+    def _encode_cursor(last):
+        return base64.urlsafe_b64encode(str(last).encode()).decode() if last is not None else None
+
+    def _stream_history(header, names, rows, stats, since):
+        """Chunked JSON response built row by row as the blobs are read.
+
+        {<header>, "columns": ["timestamp", ...], "rows": [[ts, ...], ...],
+         "missing": n, "cursor": "..."}
+        """
+
+        def generate():
+            buffer = [json.dumps(header)[:-1], ', "columns": ', json.dumps(["timestamp"] + names), ', "rows": [']
+            size = 0
+            last = since
+            for count, (timestamp, values) in enumerate(rows):
+                line = ("," if count else "") + "\n" + json.dumps([timestamp] + values)
+                buffer.append(line)
+                size += len(line)
+                last = int(timestamp)
+                if size >= STREAM_CHUNK_BYTES:
+                    yield "".join(buffer)
+                    buffer, size = [], 0
+            buffer.append(f'\n], "missing": {stats.get("missing", 0)}, "cursor": {json.dumps(App._encode_cursor(last))}}}')
+            yield "".join(buffer)
+
+        return Response(stream_with_context(generate()), mimetype="application/json"), 200
+
+    def _resample(result, columns):
+        """(timestamps, columns) downsampled to the step requested in _history"""
+        if not result["step"]:
+            return result["timestamp"], columns
+        return downsample(result["timestamp"], columns, result["step"], result["agg"], origin=BUCKET_ORIGIN)
+
+    def _is_call(option_type):
+        # Clients send either a boolean isCe or "CE"/"PE"
+        if isinstance(option_type, str):
+            return option_type.strip().upper() != "PE"
+        return bool(option_type)
+
+    def get_percentage_data(symbol, exp, isCe, strike, window=None):
+        try:
+            side = "ce" if App._is_call(isCe) else "pe"
+            fields = ["OI_percentage", "oichng_percentage", "vol_percentage"]
+            result, error = App._history(
+                symbol, exp, "Percentage", window, strikes=[strike], fields=fields, sides=[side]
+            )
+            if error:
+                return error
+
+            columns = result["series"][side][str(strike)]
+            timestamp, columns = App._resample(
+                result,
+                {
+                    "oi": columns["OI_percentage"],
+                    "oichng": columns["oichng_percentage"],
+                    "vol": columns["vol_percentage"],
+                },
+            )
+            return respond(
+                {
+                    "symbol": symbol,
+                    "strike": strike,
+                    "isCe": isCe,
+                    "expiry": exp,
+                    "timestamp": timestamp,
+                    "cursor": result["cursor"],
+                    **columns,
+                },
+                validators=result["validators"],
             )
 
         except Exception as e:
-            # Log the error for debugging (you might use logging here in a real application)
             print(f"An error occurred: {str(e)}")
-            # Return internal server error for any unhandled exceptions
-            return json.dumps({"error": "Internal Server Error"}), 500
+            return jsonify({"error": "Internal Server Error"}), 500
 
-    def get_iv_data(symbol, exp, isCe, strike):
+    def get_iv_data(symbol, exp, isCe, strike, window=None):
         try:
-            FILE_PATH = "Delta"
-
-            # Define the IST timezone
-            ist = pytz.timezone("Asia/Kolkata")
-            curr_date_ist = datetime.now(ist).replace(
-                hour=0, minute=0, second=0, microsecond=0
+            greeks = ["delta", "theta", "gamma", "vega", "rho"]
+            fields = ["iv"] + [f"optgeeks.{greek}" for greek in greeks]
+            result, error = App._history(symbol, exp, "Delta", window, strikes=[strike], fields=fields)
+            if error:
+                return error
+
+            columns = {}
+            for side in ("ce", "pe"):
+                series = result["series"][side][str(strike)]
+                columns[f"{side}_iv"] = series["iv"]
+                for greek in greeks:
+                    columns[f"{side}_{greek}"] = series[f"optgeeks.{greek}"]
+            timestamp, columns = App._resample(result, columns)
+            return respond(
+                {
+                    "symbol": symbol,
+                    "strike": strike,
+                    "isCe": isCe,
+                    "expiry": exp,
+                    "timestamp": timestamp,
+                    "cursor": result["cursor"],
+                    **columns,
+                },
+                validators=result["validators"],
             )
-            curr_date = int(curr_date_ist.timestamp())
-
-            symbol_id = Urls.symbol_list[symbol]
 
-            # Retrieve data directly without file I/O (use in-memory data)
-            data = retrieve_data(symbol_id, exp, curr_date, FILE_PATH)
-            with io.StringIO() as file:
-                json.dump(data, file, indent=4)
-                file.seek(0)
-                data = json.load(file)
-
-            # Initialize lists to store the extracted values
-            timestamp = []
-            ce_iv = []
-            ce_delta, ce_gamma, ce_theta, ce_vega, ce_rho = [], [], [], [], []
-            pe_iv = []
-            pe_delta, pe_gamma, pe_theta, pe_vega, pe_rho = [], [], [], [], []
-
-            # Check if the "day" field is available
-            if "day" in data:
-                # Extract the data for the current date
-                day_data = data["day"].get(str(curr_date))
-
-                for key, value in day_data.items():
-                    ce_percent_data = value.get("ce_data")
-                    pe_percent_data = value.get("pe_data")
-
-                    # Ensure the strike exists in the data for the selected option type
-                    if (
-                        str(strike) in ce_percent_data
-                        and str(strike) in pe_percent_data
-                    ):
-                        timestamp.append(key)
-                        ce_iv.append(ce_percent_data[strike].get("iv", 0))
-                        pe_iv.append(pe_percent_data[strike].get("iv", 0))
-                        ce_delta.append(
-                            ce_percent_data[strike]["optgeeks"].get("delta", 0)
-                        )
-                        pe_delta.append(
-                            pe_percent_data[strike]["optgeeks"].get("delta", 0)
-                        )
-                        ce_theta.append(
-                            ce_percent_data[strike]["optgeeks"].get("theta", 0)
-                        )
-                        pe_theta.append(
-                            pe_percent_data[strike]["optgeeks"].get("theta", 0)
-                        )
-                        ce_gamma.append(
-                            ce_percent_data[strike]["optgeeks"].get("gamma", 0)
-                        )
-                        pe_gamma.append(
-                            pe_percent_data[strike]["optgeeks"].get("gamma", 0)
-                        )
-                        ce_vega.append(
-                            ce_percent_data[strike]["optgeeks"].get("vega", 0)
-                        )
-                        pe_vega.append(
-                            pe_percent_data[strike]["optgeeks"].get("vega", 0)
-                        )
-                        ce_rho.append(ce_percent_data[strike]["optgeeks"].get("rho", 0))
-                        pe_rho.append(pe_percent_data[strike]["optgeeks"].get("rho", 0))
-                    else:
-                        # If strike is not found in the data
-                        return (
-                            jsonify(
-                                {
-                                    "error": "Strike not found",
-                                    "symbol": symbol,
-                                    "expiry": exp,
-                                }
-                            ),
-                            404,
-                        )
-            else:
-                # If "day" is not found in the data
-                return (
-                    jsonify(
-                        {
-                            "error": "Expiry not found",
-                            "symbol": symbol,
-                        }
-                    ),
-                    404,
-                )
+        except Exception as e:
+            print(f"An error occurred: {str(e)}")
+            return jsonify({"error": "Internal Server Error"}), 500
 
-            # Return the extracted data as JSON
-            return (
-                jsonify(
-                    {
-                        "symbol": symbol,
-                        "strike": strike,
-                        "isCe": isCe,
-                        "expiry": exp,
-                        "timestamp": timestamp,
-                        "ce_iv": ce_iv,
-                        "ce_delta": ce_delta,
-                        "ce_theta": ce_theta,
-                        "ce_gamma": ce_gamma,
-                        "ce_vega": ce_vega,
-                        "ce_rho": ce_rho,
-                        "pe_iv": pe_iv,
-                        "pe_delta": pe_delta,
-                        "pe_theta": pe_theta,
-                        "pe_gamma": pe_gamma,
-                        "pe_vega": pe_vega,
-                        "pe_rho": pe_rho,
-                    }
-                ),
-                200,
+    def get_delta_data(symbol, exp, strike, window=None):
+        """CE/PE OI, OI change and volume for one strike, with the per-strike derived metrics (PE-CE, PE/CE by default)"""
+        try:
+            raw = ["OI", "oichng", "vol"]
+            derived = list(METRICS["strike"])  # includes any added through DERIVED_METRICS_FILE
+            result, error = App._history(
+                symbol,
+                exp,
+                "Delta",
+                window,
+                strikes=[strike],
+                fields={"ce": raw, "pe": raw, "derived": derived},
+                sides=["ce", "pe", "derived"],
+            )
+            if error:
+                return error
+
+            ce = result["series"]["ce"][str(strike)]
+            pe = result["series"]["pe"][str(strike)]
+            columns = {
+                "ce_oi": ce["OI"],
+                "ce_oichng": ce["oichng"],
+                "ce_vol": ce["vol"],
+                "pe_oi": pe["OI"],
+                "pe_oichng": pe["oichng"],
+                "pe_vol": pe["vol"],
+            }
+            # Derived per snapshot at write time, before any downsampling
+            columns.update(result["series"]["derived"][str(strike)])
+            timestamp, columns = App._resample(result, columns)
+            return respond(
+                {
+                    "symbol": symbol,
+                    "strike": strike,
+                    "expiry": exp,
+                    "timestamp": timestamp,
+                    "cursor": result["cursor"],
+                    **columns,
+                },
+                validators=result["validators"],
             )
 
         except Exception as e:
-            # Return a generic internal server error message if something fails
+            print(f"An error occurred: {e}")
             return jsonify({"error": "Internal Server Error"}), 500
 
-    def get_delta_data(symbol, exp, strike):
-        """Function to retrieve percentage data from the JSON file."""
+    def get_fut_data(symbol, exp, window=None):
+        """Futures OI, OI change, volume and LTP for the day"""
         try:
-            FILE_PATH = "Delta"
-
-            # Define the IST timezone
-            ist = pytz.timezone("Asia/Kolkata")
-            curr_date_ist = datetime.now(ist).replace(
-                hour=0, minute=0, second=0, microsecond=0
+            result, error = App._history(
+                symbol, exp, "Future", window, fields=["oi", "oichng", "vol", "ltp"], sides=["fut"]
             )
-            curr_date = int(curr_date_ist.timestamp())
-
-            symbol_id = Urls.symbol_list[symbol]
-
-            # Retrieve data for the specific expiry and current date
-            data = retrieve_data(symbol_id, exp, curr_date, FILE_PATH)
-
-            with io.StringIO() as file:
-                json.dump(data, file, indent=4)
-                file.seek(0)
-                data = json.load(file)
-
-            # Initialize lists to store the extracted values
-            timestamp = []
-            ceoi = []
-            ceoichng = []
-            cevol = []
-            peoi = []
-            peoichng = []
-            pevol = []
-            peminusce_vol = []
-            pebyce_vol = []
-            peminusce_oi = []
-            pebyce_oi = []
-            peminusce_oichng = []
-            pebyce_oichng = []
-
-            # Check if the expiry exists in the data
-            if "day" in data and str(curr_date) in data["day"]:
-                # Iterate over the timestamps within the current date
-                for key, value in data["day"][str(curr_date)].items():
-                    percent_datace = value.get("ce_data", {})
-                    percent_datape = value.get("pe_data", {})
-
-                    # Check if the strike exists in ce_data and pe_data
-                    if str(strike) in percent_datace and str(strike) in percent_datape:
-                        timestamp.append(key)
-
-                        # Extract CE data values with default values if not found
-                        ceoi.append(percent_datace[str(strike)].get("OI", 0))
-                        ceoichng.append(percent_datace[str(strike)].get("oichng", 0))
-                        cevol.append(percent_datace[str(strike)].get("vol", 0))
-
-                        # Extract PE data values with default values if not found
-                        peoi.append(percent_datape[str(strike)].get("OI", 0))
-                        peoichng.append(percent_datape[str(strike)].get("oichng", 0))
-                        pevol.append(percent_datape[str(strike)].get("vol", 0))
-
-                        # Calculate additional metrics
-                        peminusce_vol.append(pevol[-1] - cevol[-1])
-                        pebyce_vol.append(
-                            pevol[-1] / cevol[-1] if cevol[-1] != 0 else None
-                        )
-                        peminusce_oi.append(peoi[-1] - ceoi[-1])
-                        pebyce_oi.append(peoi[-1] / ceoi[-1] if ceoi[-1] != 0 else None)
-                        peminusce_oichng.append(peoichng[-1] - ceoichng[-1])
-                        pebyce_oichng.append(
-                            peoichng[-1] / ceoichng[-1] if ceoichng[-1] != 0 else None
-                        )
-                    else:
-                        # Return error if the strike is not found
-                        return (
-                            jsonify(
-                                {
-                                    "error": "Strike not found",
-                                    "symbol": symbol,
-                                    "expiry": exp,
-                                }
-                            ),
-                            404,
-                        )
-
-            else:
-                # Return error if the expiry is not found
-                return (
-                    jsonify(
-                        {
-                            "error": "Expiry not found",
-                            "symbol": symbol,
-                        }
-                    ),
-                    404,
-                )
-
-            # Return JSON response with the collected data
-            return (
-                jsonify(
-                    {
-                        "symbol": symbol,
-                        "strike": strike,
-                        "expiry": exp,
-                        "timestamp": timestamp,
-                        "ce_oi": ceoi,
-                        "ce_oichng": ceoichng,
-                        "ce_vol": cevol,
-                        "pe_oi": peoi,
-                        "pe_oichng": peoichng,
-                        "pe_vol": pevol,
-                        "peminusce_vol": peminusce_vol,
-                        "pebyce_vol": pebyce_vol,
-                        "peminusce_oi": peminusce_oi,
-                        "pebyce_oi": pebyce_oi,
-                        "peminusce_oichng": peminusce_oichng,
-                        "pebyce_oichng": pebyce_oichng,
-                    }
-                ),
-                200,
+            if error:
+                return error
+
+            timestamp, columns = App._resample(result, result["series"]["fut"])
+            return respond(
+                {
+                    "symbol": symbol,
+                    "expiry": exp,
+                    "timestamp": timestamp,
+                    "cursor": result["cursor"],
+                    **columns,
+                },
+                validators=result["validators"],
             )
 
         except Exception as e:
-            # Log the error for debugging
             print(f"An error occurred: {e}")
             return jsonify({"error": "Internal Server Error"}), 500
 
-    def get_fut_data(symbol, exp):
-        """Function to retrieve percentage data from the JSON file."""
+    def get_pcr_data(symbol, exp, window=None):
+        """Chain-level derived series (put-call ratios by default) for the day"""
         try:
-            FILE_PATH = "Future"
-
-            # Define the IST timezone
-            ist = pytz.timezone("Asia/Kolkata")
-            curr_date_ist = datetime.now(ist).replace(
-                hour=0, minute=0, second=0, microsecond=0
+            result, error = App._history(symbol, exp, "Delta", window, fields=list(METRICS["chain"]), sides=["chain"])
+            if error:
+                return error
+
+            timestamp, columns = App._resample(result, result["series"]["chain"])
+            return respond(
+                {
+                    "symbol": symbol,
+                    "expiry": exp,
+                    "timestamp": timestamp,
+                    "cursor": result["cursor"],
+                    **columns,
+                },
+                validators=result["validators"],
             )
-            curr_date = int(curr_date_ist.timestamp())
-
-            symbol_id = Urls.symbol_list[symbol]
 
-            data = retrieve_data(symbol_id, exp, curr_date, FILE_PATH)
-
-            with io.StringIO() as file:
-                json.dump(data, file, indent=4)
-                file.seek(0)
-                data = json.load(file)
-
-            # Initialize lists to store the extracted values
-            timestamp = []
-            oi, oichng, vol, ltp = [], [], [], []
-
-            # Check if "day" and current date exist in the data
-            if "day" in data and str(curr_date) in data["day"]:
-                # Iterate over timestamps within the current date
-                for time_key, value in data["day"][str(curr_date)].items():
-                    fut_date = list(value.keys())[0]
-
-                    # Ensure the keys and values are correctly extracted for CE and PE data
-                    if isinstance(value, dict):
-                        # Extract required data with defaults in case a key is missing
-                        timestamp.append(time_key)
-                        oi.append(value[str(fut_date)].get("oi", 0))
-                        oichng.append(value[str(fut_date)].get("oichng", 0))
-                        vol.append(value[str(fut_date)].get("vol", 0))
-                        ltp.append(value[str(fut_date)].get("ltp", 0))
-                    else:
-                        return (
-                            jsonify(
-                                {
-                                    "error": "Strike not found",
-                                    "symbol": symbol,
-                                    "expiry": exp,
-                                }
-                            ),
-                            404,
-                        )
-
-            else:
-                # Return error if the expiry is not found
-                return (
-                    jsonify(
-                        {
-                            "error": "Expiry not found",
-                            "symbol": symbol,
-                        }
-                    ),
-                    404,
-                )
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return jsonify({"error": "Internal Server Error"}), 500
 
-            print("Data processing completed successfully.")
+    def get_history_batch(symbol, exp, strikes, sides=None, fields=None, dataset="delta", date=None, window=None):
+        """Several strikes, sides and fields of one day from a single storage pass.
 
-            return (
-                jsonify(
-                    {
-                        "symbol": symbol,
-                        "expiry": exp,
-                        "timestamp": timestamp,
-                        "oi": oi,
-                        "oichng": oichng,
-                        "vol": vol,
-                        "ltp": ltp,
-                    }
-                ),
-                200,
+        With "stream" set in `window` (and no "step") the rows are streamed
+        as chunked JSON, see _stream_history.
+        """
+        try:
+            file_path = HISTORY_DATASETS.get(str(dataset).lower())
+            if not file_path:
+                return jsonify({"error": f"Invalid dataset: {dataset}. Valid datasets are: {list(HISTORY_DATASETS)}"}), 400
+            if not isinstance(strikes, list) or not strikes or len(strikes) > MAX_BATCH_STRIKES:
+                return jsonify({"error": f"'strikes' must be a list of 1 to {MAX_BATCH_STRIKES} strikes"}), 400
+            if not isinstance(fields, list) or not fields or len(fields) > MAX_BATCH_FIELDS:
+                return jsonify({"error": f"'fields' must be a list of 1 to {MAX_BATCH_FIELDS} field names"}), 400
+            sides = [str(side).lower() for side in (sides or ["ce", "pe"])]
+            if not set(sides) <= {"ce", "pe", "derived"}:
+                return jsonify({"error": "'sides' may only contain 'ce', 'pe' and 'derived'"}), 400
+            if date is not None:
+                try:
+                    date = int(date)
+                except (ValueError, TypeError):
+                    return jsonify({"error": "'date' must be an IST midnight timestamp"}), 400
+
+            if (window or {}).get("stream") and not (window or {}).get("step"):
+                exp, error = App._expiry(symbol, exp)
+                params, window_error = App._window(window)
+                if error or window_error:
+                    return error or window_error
+                strikes = [str(strike) for strike in strikes]
+                fields = [str(field) for field in fields]
+                stats = {}
+                rows = iter_rows(
+                    file_path,
+                    Urls.symbol_list[symbol],
+                    exp,
+                    strikes,
+                    fields,
+                    sides,
+                    start=params["start"],
+                    end=params["end"],
+                    days=params["days"],
+                    date=date,
+                    partial=True,
+                    stats=stats,
+                )
+                header = {"symbol": symbol, "expiry": exp, "dataset": dataset}
+                names = column_names(sides, strikes, {side: fields for side in sides})
+                return App._stream_history(header, names, rows, stats, params["since"])
+
+            result, error = App._history(
+                symbol,
+                exp,
+                file_path,
+                window,
+                strikes=[str(strike) for strike in strikes],
+                fields=[str(field) for field in fields],
+                sides=sides,
+                date=date,
+                partial=True,
             )
+            if error:
+                return error
+
+            timestamp, series = App._resample(result, result["series"])
+            response = {
+                "symbol": symbol,
+                "expiry": result["expiry"],
+                "date": result["date"],
+                "dataset": dataset,
+                "timestamp": timestamp,
+                "cursor": result["cursor"],
+            }
+            response.update(series)
+            return respond(response, validators=result["validators"])
 
         except Exception as e:
-            # Log the error for debugging
             print(f"An error occurred: {e}")
             return jsonify({"error": "Internal Server Error"}), 500
 
     @staticmethod
-    def get_percentage_data(sid, exp_sid, strike, option_type):
+    def get_live_percentage_data(sid, exp_sid, strike, option_type):
         try:
             if sid not in Urls.symbol_list:
                 raise ValueError("Invalid symbol")
@@ -584,7 +571,7 @@ class App:
             raise Exception(f"Error calculating percentage data: {str(e)}")
 
     @staticmethod
-    def get_iv_data(sid, exp_sid, strike, option_type):
+    def get_live_iv_data(sid, exp_sid, strike, option_type):
         try:
             if sid not in Urls.symbol_list:
                 raise ValueError("Invalid symbol")
@@ -631,7 +618,7 @@ class App:
             raise Exception(f"Error calculating IV data: {str(e)}")
 
     @staticmethod
-    def get_delta_data(sid, exp_sid, strike):
+    def get_live_delta_data(sid, exp_sid, strike):
         try:
             if sid not in Urls.symbol_list:
                 raise ValueError("Invalid symbol")
@@ -2,20 +2,28 @@ import schedule
 import time
 import logging
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 from functools import wraps
 import pytz
+import socket
 import sys
+import threading
 import os
 from contextlib import contextmanager
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from Urls import Urls
-from Modals import get_data
-from deltadb import get_delta_data
-from Fut_Live import fetch_and_store_data
+from Modals import collect_data
+from deltadb import collect_delta_data
+from Fut_Live import collect_fut_data
+from sharding import ShardCoordinator
+from adaptive import AdaptiveScheduler
+from rate_meter import RequestRateMeter
+from telemetry import CollectorTelemetry, PHASES, TELEMETRY_KEY
+from utils.shared_store import default_store
+from utils.demand import demand_tracker
 
 # Configure logging
 logging.basicConfig(
@@ -28,7 +36,25 @@ logger = logging.getLogger(__name__)
 # Constants
 IST = pytz.timezone("Asia/Kolkata")
 MAX_WORKERS = 200
-TASK_INTERVAL = 15  # seconds
+TASK_INTERVAL = 15  # seconds; starting interval for every symbol
+SCHEDULER_RESOLUTION = 1  # seconds between due-key checks
+MIN_INTERVAL = int(os.getenv("COLLECTOR_MIN_INTERVAL", 5))  # seconds
+MAX_INTERVAL = int(os.getenv("COLLECTOR_MAX_INTERVAL", 120))  # seconds
+UPSTREAM_REQUEST_BUDGET = float(os.getenv("COLLECTOR_REQUEST_BUDGET", 20))  # req/s
+# Upstream calls per tick: two option-chain fetches (chain, spot, expiry each)
+# plus one futures fetch
+REQUESTS_PER_TICK = 7
+EXPIRY_REFRESH = 300  # seconds between expiry-list lookups per symbol
+EXPIRY_RETRY = 5  # seconds before retrying a failed lookup; doubles up to EXPIRY_REFRESH
+# Symbols with subscribers or recent requests are polled at least this often;
+# unwatched ones no more often than the slow baseline
+WATCHED_MAX_INTERVAL = TASK_INTERVAL
+UNWATCHED_MIN_INTERVAL = int(os.getenv("COLLECTOR_UNWATCHED_INTERVAL", 60))
+DEMAND_REFRESH = 5  # seconds between demand-signal reads
+# Ticks allowed in flight at once; due keys beyond this wait for the next check
+MAX_CONCURRENT_TICKS = int(os.getenv("COLLECTOR_MAX_CONCURRENCY", 16))
+TELEMETRY_PUBLISH_INTERVAL = 5  # seconds
+RATE_REPORT_INTERVAL = 60  # seconds
 WEEKEND_DAYS = ["Saturday"]
 MARKET_HOURS = {
     "start": {"hour": 0, "minute": 5},
@@ -77,11 +103,40 @@ def task_executor():
 
 
 class DataController:
-    def __init__(self):
+    def __init__(self, shard: Optional[ShardCoordinator] = None):
         self.executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
         self.running = True
         self.last_processed_time = None
-        self.processing_batch = False
+        self.intervals = AdaptiveScheduler(
+            base_interval=TASK_INTERVAL,
+            min_interval=MIN_INTERVAL,
+            max_interval=MAX_INTERVAL,
+            request_budget=UPSTREAM_REQUEST_BUDGET,
+            requests_per_tick=REQUESTS_PER_TICK,
+            watched_max_interval=WATCHED_MAX_INTERVAL,
+            unwatched_min_interval=UNWATCHED_MIN_INTERVAL,
+        )
+        self.demand: Dict[tuple, dict] = {}
+        self.last_demand_refresh = 0.0
+        self.request_meter = RequestRateMeter(window=RATE_REPORT_INTERVAL)
+        Urls.request_observers.append(self.request_meter.record)
+        self.expiries: Dict[str, tuple] = {}  # symbol -> (expiry list, fetched_at, failures)
+        self.owned: List[str] = []
+        self.owned_at = 0.0
+        self.active_keys: List[tuple] = []
+        self.in_flight: set = set()
+        self.in_flight_lock = threading.Lock()
+        self.last_rate_report = 0.0
+        # None when SHARED_STORE_URL is unset: this process owns every symbol
+        self.shard = shard if shard is not None else ShardCoordinator.from_env()
+        if self.shard is not None:
+            self.shard.start_heartbeat()
+        self.worker_id = (
+            self.shard.worker_id if self.shard is not None
+            else f"{socket.gethostname()}-{os.getpid()}"
+        )
+        self.telemetry = CollectorTelemetry()
+        self.last_telemetry_publish = 0.0
 
     @retry_on_failure(max_retries=3)
     def execute_task(self, task_func: callable, *args) -> Optional[dict]:
@@ -96,85 +151,34 @@ class DataController:
                 f"Failed to execute {task_func.__name__}: {str(e)}"
             )
 
-    def should_process_batch(self) -> bool:
-        """Check if enough time has passed since the last batch"""
-        if self.last_processed_time is None:
-            return True
-
-        time_elapsed = time.time() - self.last_processed_time
-        return time_elapsed >= TASK_INTERVAL
-
-    def run_tasks(self, symbol: str, exp: str) -> None:
-        """Run all tasks for a given symbol and expiry"""
-        logger.info(f"Running tasks for symbol: {symbol} with expiry: {exp}")
-
-        tasks = [
-            (get_delta_data, (exp, Urls.symbol_list[symbol], Urls.seg_list[symbol])),
-            (get_data, (exp, Urls.symbol_list[symbol], Urls.seg_list[symbol])),
-            (
-                fetch_and_store_data,
-                (exp, Urls.symbol_list[symbol], Urls.seg_list[symbol]),
-            ),
+    @staticmethod
+    def symbol_tasks(symbol: str, exp: str) -> List[tuple]:
+        """One collection tick for a symbol: (task_func, args) pairs"""
+        args = (exp, Urls.symbol_list[symbol], Urls.seg_list[symbol])
+        return [
+            (collect_delta_data, args),
+            (collect_data, args),
+            (collect_fut_data, args),
         ]
 
-        futures = []
-        for task_func, args in tasks:
-            future = self.executor.submit(self.execute_task, task_func, *args)
-            futures.append(future)
-
-        # Wait for all tasks to complete and handle any errors
-        for future in as_completed(futures):
+    def owned_symbols(self) -> List[str]:
+        """Symbols this worker should poll; all of them when unsharded"""
+        symbols = list(Urls.symbol_list.keys())
+        if self.shard is None:
+            return symbols
+        now = time.time()
+        # Lease round trips once per heartbeat, not on every scheduler check
+        if now - self.owned_at >= self.shard.lease_ttl / 3:
+            self.owned_at = now
             try:
-                future.result()
+                self.owned = self.shard.owned(symbols)
             except Exception as e:
-                logger.error(f"Task failed: {str(e)}")
-
-    def run_all_symbol_tasks(self, symbols_data: List[tuple]) -> None:
-        """Run tasks for all symbols concurrently"""
-        if self.processing_batch:
-            logger.warning("Previous batch still processing, skipping this run")
-            return
-
-        try:
-            self.processing_batch = True
-            all_futures = []
-
-            # Create futures for all symbols and all tasks
-            for symbol, exp in symbols_data:
-                tasks = [
-                    (
-                        get_delta_data,
-                        (exp, Urls.symbol_list[symbol], Urls.seg_list[symbol]),
-                    ),
-                    (get_data, (exp, Urls.symbol_list[symbol], Urls.seg_list[symbol])),
-                    (
-                        fetch_and_store_data,
-                        (exp, Urls.symbol_list[symbol], Urls.seg_list[symbol]),
-                    ),
-                ]
-
-                for task_func, args in tasks:
-                    future = self.executor.submit(self.execute_task, task_func, *args)
-                    all_futures.append((symbol, task_func.__name__, future))
-
-            # Process all futures as they complete
-            completed_symbols = set()
-            for future_info in as_completed([f[2] for f in all_futures]):
-                symbol, task_name, future = [
-                    f for f in all_futures if f[2] == future_info
-                ][0]
-                try:
-                    future.result()
-                    logger.info(f"Completed {task_name} for {symbol}")
-                    completed_symbols.add(symbol)
-                except Exception as e:
-                    logger.error(f"Failed {task_name} for {symbol}: {str(e)}")
-
-            logger.info(f"Batch completed. Processed symbols: {len(completed_symbols)}")
-            self.last_processed_time = time.time()
-
-        finally:
-            self.processing_batch = False
+                # Without the shared store we cannot prove ownership; poll nothing
+                # rather than double-poll every symbol
+                logger.error(f"Shard lease renewal failed: {str(e)}")
+                self.owned = []
+        # The heartbeat may have lost a lease since
+        return [symbol for symbol in self.owned if self.shard.holds(symbol)]
 
     def is_market_hours(self, current_time: datetime) -> bool:
         """Check if current time is within market hours"""
@@ -193,52 +197,220 @@ class DataController:
             or (current_time.hour == 24 and current_time.minute <= 0)
         )
 
-    def scheduled_run(self) -> None:
-        """Execute scheduled tasks based on market timing"""
+    def expiry_list(self, symbol: str, now: float) -> list:
+        """A symbol's listed expiries, nearest first, refreshed every EXPIRY_REFRESH seconds.
+
+        A failed lookup is retried after a backoff, keeping the last list
+        found meanwhile; a symbol that never resolved raises until then.
+        """
+        explist, fetched_at, failures = self.expiries.get(symbol, (None, 0.0, 0))
+        wait = min(EXPIRY_RETRY * 2 ** (failures - 1), EXPIRY_REFRESH) if failures else EXPIRY_REFRESH
+        if fetched_at and now - fetched_at < wait:
+            if explist is None:
+                raise LookupError(f"No expiry for {symbol}; retrying in {wait - (now - fetched_at):.0f}s")
+            return explist
         try:
-            # Check if enough time has passed since last batch
-            if not self.should_process_batch():
-                logger.debug("Waiting for interval before next batch")
-                return
+            expiry_data = Urls.fetch_expiry(Urls.symbol_list[symbol], Urls.seg_list[symbol])
+            latest = list(expiry_data["data"]["explist"])
+            if not latest:
+                raise LookupError(f"No expiries listed for {symbol}")
+        except Exception as e:
+            self.expiries[symbol] = (explist, now, failures + 1)
+            if explist is None:
+                raise
+            logger.warning(f"Expiry lookup for {symbol} failed, keeping the last list: {str(e)}")
+            return explist
+        self.expiries[symbol] = (latest, now, 0)
+        return latest
+
+    def nearest_expiry(self, symbol: str, now: float):
+        return self.expiry_list(symbol, now)[0]
+
+    def collection_keys(self, current_time: datetime, now: float) -> List[tuple]:
+        """(symbol, expiry) keys this worker should collect right now"""
+        keys = []
+        for symbol in self.owned_symbols():
+            try:
+                if symbol == "CRUDEOIL":
+                    if not self.is_crude_oil_hours(current_time):
+                        logger.debug("Skipping CRUDEOIL - Outside trading hours")
+                        continue
+                elif not self.is_market_hours(current_time):
+                    logger.debug(f"Skipping {symbol} - Outside market hours")
+                    continue
+                explist = self.expiry_list(symbol, now)
+                keys.append((symbol, explist[0]))
+                # Far expiries are only collected while someone is watching them,
+                # and only if the symbol actually lists them
+                listed = {str(exp) for exp in explist}
+                for demand_symbol, exp in self.demand:
+                    if demand_symbol == symbol and (symbol, exp) not in keys and str(exp) in listed:
+                        keys.append((symbol, exp))
+            except Exception as e:
+                logger.error(f"Error processing symbol {symbol}: {str(e)}")
+        return keys
+
+    def refresh_demand(self, now: float) -> None:
+        """Pull subscriber/request demand published by the web processes"""
+        if now - self.last_demand_refresh < DEMAND_REFRESH:
+            return
+        self.last_demand_refresh = now
+        try:
+            snapshot = demand_tracker.snapshot()
+        except Exception as e:
+            logger.error(f"Demand refresh failed: {str(e)}")
+            return
+        demand = {}
+        for (symbol, exp), stats in snapshot.items():
+            if symbol not in Urls.symbol_list:
+                continue
+            exp = int(exp) if str(exp).isdigit() else exp
+            demand[(symbol, exp)] = stats
+        self.demand = demand
+        self.intervals.set_demand({key: stats["score"] for key, stats in demand.items()})
+
+    def run_task(self, task_func: callable, args: tuple, timings: dict) -> Optional[dict]:
+        """execute_task with phase timings and active-task accounting"""
+        self.telemetry.task_started()
+        try:
+            return self.execute_task(task_func, *args, timings)
+        finally:
+            self.telemetry.task_finished()
+
+    def dispatch(self, key: tuple, due_at: Optional[float] = None) -> None:
+        """Submit one tick for a key without waiting for it"""
+        symbol, exp = key
+        tasks = self.symbol_tasks(symbol, exp)
+        results: Dict[str, Optional[dict]] = {}
+        errors: List[str] = []
+        timings: Dict[str, dict] = {task_func.__name__: {} for task_func, _ in tasks}
+        pending = [len(tasks)]
+        lock = threading.Lock()
+        started = time.time()
+        self.telemetry.tick_started(key, due_at, started)
+
+        def on_done(task_name, future):
+            try:
+                results[task_name] = future.result()
+            except Exception as e:
+                results[task_name] = None
+                errors.append(f"{task_name}: {str(e)}")
+                logger.error(f"Failed {task_name} for {symbol}: {str(e)}")
+            with lock:
+                pending[0] -= 1
+                finished = pending[0] == 0
+            if finished:
+                now = time.time()
+                durations = {
+                    phase: sum(t.get(phase, 0.0) for t in timings.values())
+                    for phase in PHASES
+                }
+                durations["tick"] = now - started
+                self.telemetry.tick_finished(
+                    key, not errors, durations, now, "; ".join(errors) or None
+                )
+                self.intervals.observe(key, results.get("collect_delta_data"))
+                self.last_processed_time = now
+                with self.in_flight_lock:
+                    self.in_flight.discard(key)
+
+        with self.in_flight_lock:
+            self.in_flight.add(key)
+        for task_func, args in tasks:
+            future = self.executor.submit(
+                self.run_task, task_func, args, timings[task_func.__name__]
+            )
+            future.add_done_callback(
+                lambda f, name=task_func.__name__: on_done(name, f)
+            )
+
+    def rates_report(self) -> Dict[str, dict]:
+        """Effective polling interval and request rate per (symbol, expiry)"""
+        report = self.intervals.report(self.active_keys)
+        return {f"{symbol}_{exp}": stats for (symbol, exp), stats in report.items()}
+
+    def health(self) -> dict:
+        """Per-key freshness, lag and timing telemetry for this worker"""
+        report = self.intervals.report(self.active_keys)
+        snapshot = self.telemetry.snapshot(
+            {key: stats["effective_interval"] for key, stats in report.items()}
+        )
+        snapshot.update(
+            {
+                "worker": self.worker_id,
+                "max_workers": MAX_WORKERS,
+                "in_flight_ticks": len(self.in_flight),
+                "polling": self.rates_report(),
+                "upstream_requests": self.request_meter.report(),
+            }
+        )
+        return snapshot
 
+    def publish_health(self, now: float) -> None:
+        """Share health() so the web process can serve it from any worker"""
+        if now - self.last_telemetry_publish < TELEMETRY_PUBLISH_INTERVAL:
+            return
+        self.last_telemetry_publish = now
+        try:
+            default_store().set(
+                TELEMETRY_KEY + self.worker_id,
+                self.health(),
+                ttl=TELEMETRY_PUBLISH_INTERVAL * 6,
+            )
+        except Exception as e:
+            logger.error(f"Telemetry publish failed: {str(e)}")
+
+    def scheduled_run(self) -> None:
+        """Dispatch every (symbol, expiry) whose adaptive interval has elapsed"""
+        try:
             current_time = datetime.now(IST)
             current_day = current_time.strftime("%A")
 
             if current_day in WEEKEND_DAYS:
-                logger.info("Weekend - No tasks scheduled")
+                logger.debug("Weekend - No tasks scheduled")
                 return
 
-            # Collect all valid symbols and their expiry data
-            symbols_to_process = []
-
-            for symbol in Urls.symbol_list.keys():
-                try:
-                    expiry_data = Urls.fetch_expiry(
-                        Urls.symbol_list[symbol], Urls.seg_list[symbol]
-                    )
-                    exp = list(expiry_data["data"]["explist"])[0]
-
-                    if symbol == "CRUDEOIL":
-                        if self.is_crude_oil_hours(current_time):
-                            symbols_to_process.append((symbol, exp))
-                        else:
-                            logger.info("Skipping CRUDEOIL - Outside trading hours")
-                    else:
-                        if self.is_market_hours(current_time):
-                            symbols_to_process.append((symbol, exp))
-                        else:
-                            logger.info(f"Skipping {symbol} - Outside market hours")
-                except Exception as e:
-                    logger.error(f"Error processing symbol {symbol}: {str(e)}")
-
-            # Process all valid symbols concurrently
-            if symbols_to_process:
+            now = time.time()
+            self.refresh_demand(now)
+            keys = self.collection_keys(current_time, now)
+            dropped = set(self.active_keys) - set(keys)
+            if dropped:
+                self.intervals.forget(dropped)
+                self.telemetry.forget(dropped)
+            self.active_keys = keys
+
+            with self.in_flight_lock:
+                busy = set(self.in_flight)
+            # Stretch intervals (unwatched keys first) if keys would exceed the budget
+            scales = self.intervals.scales(keys)
+            # Highest-demand keys are submitted, and so queued, first
+            for key in self.intervals.due(keys, now, scales):
+                if key in busy:
+                    # The slot passed while the previous tick is still running
+                    logger.debug(f"Previous tick for {key[0]} still running, skipping")
+                    self.telemetry.tick_missed(key)
+                    self.intervals.schedule_next(key, now, scales[key])
+                    continue
+                if len(busy) >= MAX_CONCURRENT_TICKS:
+                    # Remaining keys stay due and go out on the next check
+                    logger.debug("Tick concurrency limit reached, deferring due keys")
+                    break
+                due_at = self.intervals.next_due.get(key)
+                self.intervals.schedule_next(key, now, scales[key])
+                self.dispatch(key, due_at)
+                busy.add(key)
+
+            if now - self.last_rate_report >= RATE_REPORT_INTERVAL:
+                self.last_rate_report = now
+                logger.info(f"Effective polling rates: {self.rates_report()}")
+                rates = self.request_meter.report()
                 logger.info(
-                    f"Starting new batch: Processing {len(symbols_to_process)} symbols"
+                    f"Upstream requests over {rates['window_seconds']}s: "
+                    f"mean {rates['mean_per_sec']}/s, p95 {rates['p95_per_sec']}/s, "
+                    f"max {rates['max_per_sec']}/s, idle {rates['idle_seconds']}s"
                 )
-                self.run_all_symbol_tasks(symbols_to_process)
-            else:
-                logger.info("No symbols to process at this time")
+
+            self.publish_health(now)
 
         except Exception as e:
             logger.error(f"Scheduled run failed: {str(e)}")
@@ -246,8 +418,8 @@ class DataController:
     def start_schedule(self) -> None:
         """Initialize and start the scheduler"""
         try:
-            # Regular task schedule
-            schedule.every(TASK_INTERVAL).seconds.do(self.scheduled_run).tag("task_run")
+            # Regular task schedule; per-key intervals are decided in scheduled_run
+            schedule.every(SCHEDULER_RESOLUTION).seconds.do(self.scheduled_run).tag("task_run")
 
             # Market timing schedules
             schedule.every().day.at(
@@ -256,7 +428,7 @@ class DataController:
             schedule.every().day.at(
                 f"{MARKET_HOURS['resume']['hour']:02d}:{MARKET_HOURS['resume']['minute']:02d}"
             ).do(
-                lambda: schedule.every(TASK_INTERVAL)
+                lambda: schedule.every(SCHEDULER_RESOLUTION)
                 .seconds.do(self.scheduled_run)
                 .tag("task_run")
             )
@@ -280,6 +452,8 @@ class DataController:
             logger.info("Shutting down gracefully...")
         finally:
             self.executor.shutdown(wait=True)
+            if self.shard is not None:
+                self.shard.release_all()
             logger.info("Shutdown complete")
 
 
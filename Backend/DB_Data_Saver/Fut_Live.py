@@ -87,9 +87,51 @@ def get_current_timestamp():
     return current_date_timestamp, current_time_timestamp
 
 
-def fetch_and_store_data(expiry, symbol=13, seg=0, interval=10):
-    data = {}
+def collect_fut_data(expiry, symbol=13, seg=0, timings=None):
+    """
+    Fetch one futures snapshot and save it to MongoDB.
+    Returns the saved snapshot; raises on fetch or store failure. Phase
+    durations (fetch, process, store) are written into `timings` if given.
+    """
+    timings = timings if timings is not None else {}
+    started = time.perf_counter()
+    # Fetch data from URL
+    fetched_data = Urls.fetch_fut_data(symbol=symbol, seg=seg)
+    timings["fetch"] = time.perf_counter() - started
+
+    if (
+        not fetched_data
+        or "data" not in fetched_data
+        or "flst" not in fetched_data["data"]
+    ):
+        raise ValueError("Invalid data structure received.")
+
+    current_date, current_time = get_current_timestamp()
+
+    # Extract and store relevant keys
+    keys_of_interest = ["ltp", "oichng", "oi", "vol"]
+    expiry_code = list(fetched_data["data"]["flst"].keys())[0]
+    fut_data = fetched_data["data"]["flst"].get(expiry_code, {})
+
+    # Filter for keys of interest
+    snapshot = {expiry_code: {k: fut_data.get(k) for k in keys_of_interest}}
+
+    timings["process"] = time.perf_counter() - started - timings["fetch"]
+
+    # Save to MongoDB
+    save_data(
+        symbol=symbol,
+        expiry=expiry,
+        current_date=current_date,
+        timestamp=current_time,
+        data=snapshot,
+    )
+    timings["store"] = time.perf_counter() - started - timings["fetch"] - timings["process"]
+    print(f"Data successfully saved to MongoDB at timestamp {current_time} for fut ")
+    return snapshot
 
+
+def fetch_and_store_data(expiry, symbol=13, seg=0, interval=10):
     while True:
         now = datetime.now()
         curr_time = now.strftime("%H:%M")
@@ -105,46 +147,7 @@ def fetch_and_store_data(expiry, symbol=13, seg=0, interval=10):
             break
 
         try:
-            # Fetch data from URL
-            fetched_data = Urls.fetch_fut_data(
-                symbol=symbol, seg=seg
-            )  # Ensure `Urls` is imported and defined
-
-            if (
-                not fetched_data
-                or "data" not in fetched_data
-                or "flst" not in fetched_data["data"]
-            ):
-                print("Invalid data structure received.")
-                continue
-
-            current_date, current_time = get_current_timestamp()
-
-            # Initialize data structure for expiry if not present
-            data.setdefault(str(expiry), {}).setdefault(current_date, {})
-
-            # Extract and store relevant keys
-            keys_of_interest = ["ltp", "oichng", "oi", "vol"]
-            expiry_code = list(fetched_data["data"]["flst"].keys())[0]
-            fut_data = fetched_data["data"]["flst"].get(expiry_code, {})
-
-            # Filter for keys of interest and store in data structure
-            data[str(expiry)][current_date][current_time] = {
-                expiry_code: {k: fut_data.get(k) for k in keys_of_interest}
-            }
-
-            # Save to MongoDB
-            save_data(
-                symbol=symbol,
-                expiry=expiry,
-                current_date=current_date,
-                timestamp=current_time,
-                data=data[str(expiry)][current_date][current_time],
-            )
-            print(
-                f"Data successfully saved to MongoDB at timestamp {current_time} for fut "
-            )
-
+            collect_fut_data(expiry, symbol, seg)
         except Exception as e:
             print(f"An error occurred: {e}")
 
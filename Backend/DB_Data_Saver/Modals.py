@@ -21,6 +21,7 @@ sys.path.insert(
     ),
 )
 from Urls import Urls
+from series_index import index_snapshot
 from dotenv import load_dotenv
 
 username = quote_plus("svmsingh01")
@@ -68,6 +69,12 @@ def save_data(symbol, expiry, data, timestamp, current_date):
                     "day": {str(current_date): {str(timestamp): file_id}},
                 }
             )
+
+        # Keep the per-strike series in step with the blobs
+        try:
+            index_snapshot(db, symbol, expiry, data, timestamp, current_date)
+        except Exception as e:
+            print(f"Failed to update strike series index: {e}")
     else:
         print("No data to save.")
 
@@ -89,13 +96,62 @@ def get_current_timestamp():
     return current_date_timestamp, current_time_timestamp
 
 
+def collect_data(expiry, symbol=13, seg=0, timings=None):
+    """
+    Fetch one option-chain snapshot for the given expiry and save it to MongoDB.
+    Returns the saved snapshot; raises on fetch or store failure. Phase
+    durations (fetch, process, store) are written into `timings` if given.
+    """
+    timings = timings if timings is not None else {}
+    started = time.perf_counter()
+    # Fetch data from URL using parameters
+    fetched_data = Urls.fetch_data(symbol=symbol, seg=seg, exp=expiry)
+    timings["fetch"] = time.perf_counter() - started
+
+    if (
+        not fetched_data
+        or not fetched_data[0]
+        or "data" not in fetched_data[0]
+        or "oc" not in fetched_data[0]["data"]
+    ):
+        raise ValueError("Invalid data structure received.")
+
+    # Get the current date and time as UNIX timestamps
+    current_date, current_time = get_current_timestamp()
+
+    # Prepare the structure for the current time entry
+    snapshot = {"ce_data": {}, "pe_data": {}}
+
+    # Define the keys of interest
+    keys_of_interest = [
+        "OI_percentage",
+        "oichng_percentage",
+        "vol_percentage",
+    ]
+
+    # Extract relevant data for CE and PE
+    for key, value in fetched_data[0]["data"]["oc"].items():
+        ce_data = value.get("ce", {})
+        pe_data = value.get("pe", {})
+
+        # Filter only the keys of interest from CE and PE data
+        snapshot["ce_data"][key] = {k: ce_data.get(k) for k in keys_of_interest}
+        snapshot["pe_data"][key] = {k: pe_data.get(k) for k in keys_of_interest}
+
+    timings["process"] = time.perf_counter() - started - timings["fetch"]
+
+    # Save the snapshot to MongoDB
+    save_data(symbol, expiry, snapshot, current_time, current_date)
+    timings["store"] = time.perf_counter() - started - timings["fetch"] - timings["process"]
+
+    print(f"Data successfully saved to MongoDB at timestamp {current_time} for Modals")
+    return snapshot
+
+
 def get_data(expiry, symbol=13, seg=0):
     """
     Fetch data for the given expiry and save it to MongoDB at specified intervals.
     """
-    # Load any existing data from the JSON file (optional for additional local storage)
-    data = {}
-
     while True:
         now = datetime.now()
         curr_time = now.strftime("%H:%M")
@@ -108,75 +164,11 @@ def get_data(expiry, symbol=13, seg=0):
                 continue
 
             try:
-                # Fetch data from URL using parameters
-                fetched_data = Urls.fetch_data(symbol=symbol, seg=seg, exp=expiry)
-
-                if (
-                    not fetched_data
-                    or "data" not in fetched_data[0]
-                    or "oc" not in fetched_data[0]["data"]
-                ):
-                    print("Invalid data structure received.")
-                    continue
-
-                # Get the current date and time as UNIX timestamps
-                current_date, current_time = get_current_timestamp()
-
-                # Initialize the data structure for the current expiry if not present
-                if str(expiry) not in data:
-                    data[str(expiry)] = {}
-
-                if str(current_date) not in data[str(expiry)]:
-                    data[str(expiry)][str(current_date)] = {}
-
-                # Prepare the structure for the current time entry
-                data[str(expiry)][str(current_date)][str(current_time)] = {
-                    "ce_data": {},
-                    "pe_data": {},
-                }
-
-                # Define the keys of interest
-                keys_of_interest = [
-                    "OI_percentage",
-                    "oichng_percentage",
-                    "vol_percentage",
-                ]
-
-                # Extract relevant data for CE and PE
-                for key, value in fetched_data[0]["data"]["oc"].items():
-                    ce_data = value.get("ce", {})
-                    pe_data = value.get("pe", {})
-
-                    # Filter only the keys of interest from CE and PE data
-                    data[str(expiry)][str(current_date)][str(current_time)]["ce_data"][
-                        key
-                    ] = {k: ce_data.get(k) for k in keys_of_interest}
-                    data[str(expiry)][str(current_date)][str(current_time)]["pe_data"][
-                        key
-                    ] = {k: pe_data.get(k) for k in keys_of_interest}
-
-                # Save the updated data back to MongoDB
-                save_data(
-                    symbol,
-                    expiry,
-                    data[str(expiry)][str(current_date)][str(current_time)],
-                    current_time,
-                    current_date,
-                )
-
-                print(
-                    f"Data successfully saved to MongoDB at timestamp {current_time} for Modals"
-                )
-
-                # Exit conditions
-                # if curr_time == "15:35" or curr_time == "19:01":
-                #     print("Ending data fetching process.")
-                #     break
-
+                collect_data(expiry, symbol, seg)
             except Exception as e:
                 print(f"An error occurred: {e}")
 
-            # Sleep for 3 seconds before the next fetch
+            # Sleep for 10 seconds before the next fetch
             try:
                 time.sleep(10)
             except KeyboardInterrupt:
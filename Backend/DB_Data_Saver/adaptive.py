@@ -0,0 +1,211 @@
+import hashlib
+import math
+import random
+import threading
+from typing import Dict, Hashable, Iterable, List, Optional
+
+CHANGE_FIELDS = ("ltp", "OI")
+
+
+def change_rate(previous: Optional[dict], current: Optional[dict]) -> Optional[float]:
+    """Fraction of CE/PE strikes whose ltp or OI changed between two snapshots"""
+    if not previous or not current:
+        return None
+    total = changed = 0
+    for side in ("ce_data", "pe_data"):
+        before = previous.get(side, {})
+        for strike, values in current.get(side, {}).items():
+            total += 1
+            old = before.get(strike)
+            if old is None or any(old.get(f) != values.get(f) for f in CHANGE_FIELDS):
+                changed += 1
+    return changed / total if total else None
+
+
+class AdaptiveScheduler:
+    """Per-key polling intervals that follow each chain's observed change rate.
+
+    Each key aims to see `target_change` of its strikes move between polls:
+    a chain changing faster than that is polled sooner, a quiet one later,
+    always within [min_interval, max_interval]. The observed change is
+    turned into a rate per second (the fraction over the interval it was
+    seen at), so the next interval is aimed directly at the target instead
+    of being nudged by a ratio that lags behind it; this settles without
+    swinging between the bounds.
+
+    Demand scores (subscribers and recent requests, see utils.demand) bend
+    this: watched keys are never polled slower than `watched_max_interval`,
+    unwatched ones never faster than `unwatched_min_interval`, and watched
+    keys are dispatched first. If the summed request rate would exceed
+    `request_budget` (upstream requests per second), intervals are stretched
+    to fit, unwatched keys first; they always keep `reserved_share` of the
+    budget so they are slowed, never starved.
+
+    Each key fires on its own grid, offset by a deterministic phase (keys are
+    spaced evenly in hash order), plus a little jitter. Keys sharing an
+    interval are thereby spread across it instead of firing on the same second.
+    """
+
+    SMOOTHING = 0.3  # EWMA weight of the newest change-per-second observation
+    MAX_STEP = 2.0  # largest per-tick change of an interval, either way
+    JITTER = 0.05  # fraction of an interval added at random to each slot
+    MAX_JITTER = 1.0  # seconds
+
+    def __init__(
+        self,
+        base_interval: float,
+        min_interval: float,
+        max_interval: float,
+        request_budget: float,
+        requests_per_tick: int,
+        target_change: float = 0.3,
+        watched_max_interval: Optional[float] = None,
+        unwatched_min_interval: Optional[float] = None,
+        reserved_share: float = 0.1,
+    ):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.request_budget = request_budget
+        self.requests_per_tick = requests_per_tick
+        self.target_change = target_change
+        self.watched_max_interval = watched_max_interval or max_interval
+        self.unwatched_min_interval = unwatched_min_interval or min_interval
+        self.reserved_share = reserved_share
+        self.demand: Dict[Hashable, float] = {}
+        self.intervals: Dict[Hashable, float] = {}
+        self.rates: Dict[Hashable, float] = {}  # smoothed fraction of strikes changing per second
+        self.next_due: Dict[Hashable, float] = {}
+        self.snapshots: Dict[Hashable, dict] = {}
+        self.tick_counts: Dict[Hashable, int] = {}
+        self.phases: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+    def _clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def adaptive_interval(self, key: Hashable) -> float:
+        return self.intervals.get(key, self._clamp(self.base_interval))
+
+    def interval(self, key: Hashable) -> float:
+        """Adaptive interval bent by demand, before the budget is applied"""
+        interval = self.adaptive_interval(key)
+        if self.demand.get(key, 0) > 0:
+            return min(interval, self.watched_max_interval)
+        return max(interval, self.unwatched_min_interval)
+
+    def set_demand(self, scores: Dict[Hashable, float]) -> None:
+        self.demand = dict(scores)
+
+    def observe(self, key: Hashable, snapshot: Optional[dict]) -> Optional[float]:
+        """Record a tick's snapshot and retune the key's interval"""
+        with self._lock:
+            self.tick_counts[key] = self.tick_counts.get(key, 0) + 1
+            rate = change_rate(self.snapshots.get(key), snapshot)
+            if snapshot:
+                self.snapshots[key] = snapshot
+            if rate is None:
+                return None
+
+            current = self.adaptive_interval(key)
+            per_second = rate / current
+            smoothed = self.rates.get(key)
+            smoothed = per_second if smoothed is None else (
+                self.SMOOTHING * per_second + (1 - self.SMOOTHING) * smoothed
+            )
+            self.rates[key] = smoothed
+
+            target = self.target_change / smoothed if smoothed > 0 else current * self.MAX_STEP
+            factor = min(self.MAX_STEP, max(1 / self.MAX_STEP, target / current))
+            self.intervals[key] = self._clamp(current * factor)
+            return rate
+
+    def scales(self, keys: Iterable[Hashable]) -> Dict[Hashable, float]:
+        """Per-key factors (>= 1) stretching intervals to fit the request budget"""
+        keys = list(keys)
+        scales = {key: 1.0 for key in keys}
+        if not self.request_budget:
+            return scales
+        watched = [key for key in keys if self.demand.get(key, 0) > 0]
+        unwatched = [key for key in keys if self.demand.get(key, 0) <= 0]
+
+        def rate(group):
+            return sum(self.requests_per_tick / self.interval(key) for key in group)
+
+        watched_budget = self.request_budget * (1 - self.reserved_share if unwatched else 1)
+        watched_rate = rate(watched)
+        if watched_rate > watched_budget:
+            for key in watched:
+                scales[key] = watched_rate / watched_budget
+            watched_rate = watched_budget
+        remaining = self.request_budget - watched_rate
+        unwatched_rate = rate(unwatched)
+        if unwatched_rate > remaining:
+            for key in unwatched:
+                scales[key] = unwatched_rate / remaining
+        return scales
+
+    @staticmethod
+    def _key_hash(key: Hashable) -> int:
+        return int(hashlib.md5(repr(key).encode("utf-8")).hexdigest()[:16], 16)
+
+    def assign_phases(self, keys: Iterable[Hashable]) -> None:
+        """Space the keys evenly over [0, 1), ordered by a stable hash"""
+        keys = sorted(set(keys), key=self._key_hash)
+        if set(keys) != set(self.phases):
+            self.phases = {key: index / len(keys) for index, key in enumerate(keys)}
+
+    def phase(self, key: Hashable) -> float:
+        """Deterministic position of a key within its interval, in [0, 1)"""
+        if key in self.phases:
+            return self.phases[key]
+        return self._key_hash(key) / 2**64
+
+    def due(
+        self, keys: Iterable[Hashable], now: float, scales: Optional[Dict[Hashable, float]] = None
+    ) -> List[Hashable]:
+        """Keys whose slot has come, highest demand first"""
+        keys = list(keys)
+        self.assign_phases(keys)
+        due = []
+        for key in keys:
+            if key not in self.next_due:
+                # New keys wait for their first phase slot rather than all
+                # firing together on startup
+                self.schedule_next(key, now, (scales or {}).get(key, 1.0))
+            if self.next_due[key] <= now:
+                due.append(key)
+        return sorted(due, key=lambda key: self.demand.get(key, 0), reverse=True)
+
+    def schedule_next(self, key: Hashable, now: float, scale: float = 1.0) -> None:
+        """Move a key to the next slot on its phase-offset grid after `now`"""
+        interval = self.interval(key) * scale
+        offset = self.phase(key) * interval
+        slot = (math.floor((now - offset) / interval) + 1) * interval + offset
+        jitter = random.uniform(0, min(self.MAX_JITTER, self.JITTER * interval))
+        self.next_due[key] = slot + jitter
+
+    def forget(self, keys: Iterable[Hashable]) -> None:
+        """Drop state for keys no longer collected (expiry rolled, lease lost)"""
+        with self._lock:
+            for key in list(keys):
+                for table in (self.intervals, self.rates, self.next_due, self.snapshots, self.tick_counts):
+                    table.pop(key, None)
+
+    def report(self, keys: Iterable[Hashable]) -> Dict[Hashable, dict]:
+        """Effective per-key polling rates after demand and budget are applied"""
+        keys = list(keys)
+        scales = self.scales(keys)
+        report = {}
+        for key in keys:
+            effective = self.interval(key) * scales[key]
+            report[key] = {
+                "interval": round(self.adaptive_interval(key), 2),
+                "effective_interval": round(effective, 2),
+                "polls_per_minute": round(60 / effective, 2),
+                "upstream_requests_per_sec": round(self.requests_per_tick / effective, 3),
+                "change_per_sec": round(self.rates[key], 4) if key in self.rates else None,
+                "demand": self.demand.get(key, 0),
+                "ticks": self.tick_counts.get(key, 0),
+            }
+        return report
@@ -20,6 +20,8 @@ sys.path.insert(
     ),
 )
 from Urls import Urls
+from series_index import index_snapshot
+from derived import add_derived
 from retrivedata import retrieve_data
 
 
@@ -69,6 +71,12 @@ def save_data(symbol, expiry, data, timestamp, current_date):
                     "day": {str(current_date): {str(timestamp): file_id}},
                 }
             )
+
+        # Keep the per-strike series in step with the blobs
+        try:
+            index_snapshot(db, symbol, expiry, data, timestamp, current_date)
+        except Exception as e:
+            print(f"Failed to update strike series index: {e}")
     else:
         print("No data to save.")
 
@@ -90,16 +98,69 @@ def get_current_timestamp():
     return current_date_timestamp, current_time_timestamp
 
 
+def collect_delta_data(expiry, symbol=13, seg=0, timings=None):
+    """
+    Fetch one option-chain snapshot (greeks, OI, volume) and save it to MongoDB.
+    Returns the saved snapshot; raises on fetch or store failure. Phase
+    durations (fetch, process, store) are written into `timings` if given.
+    """
+    timings = timings if timings is not None else {}
+    started = time.perf_counter()
+    # Fetch data from URL using parameters
+    fetched_data = Urls.fetch_data(symbol=symbol, seg=seg, exp=expiry)
+    timings["fetch"] = time.perf_counter() - started
+
+    if (
+        not fetched_data
+        or not fetched_data[0]
+        or "data" not in fetched_data[0]
+        or "oc" not in fetched_data[0]["data"]
+    ):
+        raise ValueError("Invalid data structure received.")
+
+    # Get the current date and time as UNIX timestamps
+    current_date, current_time = get_current_timestamp()
+
+    # Prepare the structure for the current time entry
+    snapshot = {"ce_data": {}, "pe_data": {}}
+
+    # Define the keys of interest
+    keys_of_interest = [
+        "vol",
+        "OI",
+        "oichng",
+        "iv",
+        "ltp",
+        "p_chng",
+        "optgeeks",
+    ]
+
+    # Extract relevant data for CE and PE
+    for key, value in fetched_data[0]["data"]["oc"].items():
+        ce_data = value.get("ce", {})
+        pe_data = value.get("pe", {})
+
+        # Filter only the keys of interest from CE and PE data
+        snapshot["ce_data"][key] = {k: ce_data.get(k) for k in keys_of_interest}
+        snapshot["pe_data"][key] = {k: pe_data.get(k) for k in keys_of_interest}
+
+    # PE-CE, PE/CE per strike and chain PCR, so reads don't recompute them
+    add_derived(snapshot)
+
+    timings["process"] = time.perf_counter() - started - timings["fetch"]
+
+    # Save the snapshot to MongoDB
+    save_data(symbol, expiry, snapshot, current_time, current_date)
+    timings["store"] = time.perf_counter() - started - timings["fetch"] - timings["process"]
+
+    print(f"Data successfully saved to MongoDB at timestamp {current_time} for delta")
+    return snapshot
+
+
 def get_delta_data(expiry, symbol=13, seg=0):
     """
     Fetch data for the given expiry and save it to MongoDB at specified intervals.
     """
-    # Load any existing data from the JSON file (optional for additional local storage)
-    curr_date = int(
-        datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
-    )
-    data = {}
-
     while True:
         now = datetime.now()
         curr_time = now.strftime("%H:%M")
@@ -112,85 +173,11 @@ def get_delta_data(expiry, symbol=13, seg=0):
                 continue
 
             try:
-                # Fetch data from URL using parameters
-                fetched_data = Urls.fetch_data(symbol=symbol, seg=seg, exp=expiry)
-
-                if (
-                    not fetched_data
-                    or "data" not in fetched_data[0]
-                    or "oc" not in fetched_data[0]["data"]
-                ):
-                    print("Invalid data structure received.")
-                    continue
-
-                # Get the current date and time as UNIX timestamps
-                current_date, current_time = get_current_timestamp()
-                # print("i'm here 1")
-
-                # Initialize the data structure for the current expiry if not present
-                if "day" not in data:
-                    data["day"] = {}  # Initialize day as a dictionary
-                    # print("i'm here 2")
-
-                if str(current_date) not in data["day"]:
-                    data["day"][str(current_date)] = {}
-                    # print("i'm here 3")
-
-                # Prepare the structure for the current time entry
-                data["day"][str(current_date)][str(current_time)] = {
-                    "ce_data": {},
-                    "pe_data": {},
-                }
-
-                # Define the keys of interest
-                keys_of_interest = [
-                    "vol",
-                    "OI",
-                    "oichng",
-                    "iv",
-                    "ltp",
-                    "p_chng",
-                    "optgeeks",
-                ]
-                # print("i'm here 4")
-
-                # Extract relevant data for CE and PE
-                for key, value in fetched_data[0]["data"]["oc"].items():
-                    ce_data = value.get("ce", {})
-                    pe_data = value.get("pe", {})
-
-                    # Filter only the keys of interest from CE and PE data
-                    data["day"][str(current_date)][str(current_time)]["ce_data"][
-                        key
-                    ] = {k: ce_data.get(k) for k in keys_of_interest}
-                    data["day"][str(current_date)][str(current_time)]["pe_data"][
-                        key
-                    ] = {k: pe_data.get(k) for k in keys_of_interest}
-
-                # Save the updated data back to MongoDB
-                # print("i'm here 5")
-                save_data(
-                    symbol,
-                    expiry,
-                    data["day"][str(current_date)][str(current_time)],
-                    current_time,
-                    current_date,
-                )
-                # print("i'm here 6")
-
-                print(
-                    f"Data successfully saved to MongoDB at timestamp {current_time} for delta"
-                )
-
-                # Exit conditions
-                # if curr_time == "18:35" or curr_time == "19:01":
-                #     print("Ending data fetching process.")
-                #     break
-
+                collect_delta_data(expiry, symbol, seg)
             except Exception as e:
                 print(f"An error occurred: {e}")
 
-            # Sleep for 3 seconds before the next fetch
+            # Sleep for 10 seconds before the next fetch
             try:
                 time.sleep(10)
             except KeyboardInterrupt:
@@ -0,0 +1,53 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+
+class RequestRateMeter:
+    """Per-second counts of upstream requests over a sliding window.
+
+    `report()` summarises the window so burst smoothing can be checked: a
+    well-staggered collector shows a peak close to its mean.
+    """
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self._counts = deque()  # (second, count), oldest first
+        self._lock = threading.Lock()
+
+    def record(self, _url: Optional[str] = None, now: Optional[float] = None) -> None:
+        second = int(now if now is not None else time.time())
+        with self._lock:
+            if self._counts and self._counts[-1][0] == second:
+                self._counts[-1] = (second, self._counts[-1][1] + 1)
+            else:
+                self._counts.append((second, 1))
+            while self._counts and self._counts[0][0] <= second - self.window:
+                self._counts.popleft()
+
+    def per_second(self, now: Optional[float] = None) -> list:
+        """Counts for each of the last `window` whole seconds, oldest first"""
+        end = int(now if now is not None else time.time())
+        with self._lock:
+            counts = dict(self._counts)
+        return [counts.get(second, 0) for second in range(end - self.window, end)]
+
+    def report(self, now: Optional[float] = None) -> dict:
+        series = self.per_second(now)
+        total = sum(series)
+        mean = total / len(series) if series else 0
+        ordered = sorted(series)
+        p95 = ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)] if ordered else 0
+        peak = ordered[-1] if ordered else 0
+        return {
+            "window_seconds": self.window,
+            "requests": total,
+            "mean_per_sec": round(mean, 2),
+            "p95_per_sec": p95,
+            "max_per_sec": peak,
+            "peak_to_mean": round(peak / mean, 2) if mean else None,
+            "idle_seconds": series.count(0),
+            "per_second": series,
+        }
@@ -0,0 +1,147 @@
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import sys
+import threading
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.shared_store import get_shared_store
+
+logger = logging.getLogger(__name__)
+
+LEASE_TTL = 45  # seconds; three scheduler intervals
+VIRTUAL_NODES = 64
+MEMBER_KEY = "collector:member:"
+LEASE_KEY = "collector:lease:"
+
+
+def _hash(value: str) -> int:
+    return int(hashlib.md5(value.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """Consistent hash ring mapping symbols onto collector workers"""
+
+    def __init__(self, members: Iterable[str], replicas: int = VIRTUAL_NODES):
+        self.members = sorted(set(members))
+        self._ring = sorted(
+            (_hash(f"{member}#{i}"), member)
+            for member in self.members
+            for i in range(replicas)
+        )
+        self._points = [point for point, _ in self._ring]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._points, _hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class ShardCoordinator:
+    """Split the symbol universe across collector workers.
+
+    Every worker keeps a member lease alive in the shared store. The live
+    members form a hash ring, and a worker only polls a symbol while it also
+    holds that symbol's lease, so two workers never poll the same symbol even
+    while their views of the ring disagree. When a worker dies its leases
+    expire and the ring hands its symbols to the survivors.
+    """
+
+    def __init__(self, store, worker_id: Optional[str] = None, lease_ttl: int = LEASE_TTL):
+        self.store = store
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_ttl = lease_ttl
+        self.held: set = set()  # guarded by _lock: the heartbeat and scheduler threads both change it
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> Optional["ShardCoordinator"]:
+        """Coordinator configured from SHARED_STORE_URL, or None if unsharded"""
+        store = get_shared_store()
+        if store is None:
+            return None
+        return cls(
+            store,
+            worker_id=os.getenv("COLLECTOR_WORKER_ID"),
+            lease_ttl=int(os.getenv("COLLECTOR_LEASE_TTL", LEASE_TTL)),
+        )
+
+    def heartbeat(self) -> None:
+        self.store.acquire(MEMBER_KEY + self.worker_id, self.worker_id, self.lease_ttl)
+
+    def renew(self) -> None:
+        """Renew membership and every held symbol lease"""
+        self.heartbeat()
+        with self._lock:
+            held = list(self.held)
+        for symbol in held:
+            if not self.store.acquire(LEASE_KEY + symbol, self.worker_id, self.lease_ttl):
+                logger.warning(f"Worker {self.worker_id} lost lease on {symbol}")
+                with self._lock:
+                    self.held.discard(symbol)
+
+    def start_heartbeat(self) -> threading.Thread:
+        """Renew leases in the background so a long batch cannot let them lapse"""
+
+        def loop():
+            while not self._stop.wait(self.lease_ttl / 3):
+                try:
+                    self.renew()
+                except Exception as e:
+                    logger.error(f"Lease heartbeat failed: {str(e)}")
+
+        thread = threading.Thread(target=loop, name="shard-heartbeat", daemon=True)
+        thread.start()
+        return thread
+
+    def live_members(self) -> List[str]:
+        members = self.store.items(MEMBER_KEY)
+        return [key[len(MEMBER_KEY):] for key in members]
+
+    def owned(self, symbols: Iterable[str]) -> List[str]:
+        """Renew membership and return the symbols this worker should poll"""
+        self.heartbeat()
+        ring = HashRing(self.live_members() or [self.worker_id])
+        owned = []
+        for symbol in symbols:
+            lease = LEASE_KEY + symbol
+            if ring.owner(symbol) == self.worker_id:
+                if self.store.acquire(lease, self.worker_id, self.lease_ttl):
+                    with self._lock:
+                        taken = symbol not in self.held
+                        self.held.add(symbol)
+                    if taken:
+                        logger.info(f"Worker {self.worker_id} took ownership of {symbol}")
+                    owned.append(symbol)
+                else:
+                    logger.debug(f"{symbol} still leased by {self.store.holder(lease)}")
+            elif self.holds(symbol):
+                # Ring moved this symbol elsewhere; hand the lease over now
+                self.store.release(lease, self.worker_id)
+                with self._lock:
+                    self.held.discard(symbol)
+                logger.info(f"Worker {self.worker_id} released {symbol}")
+        return owned
+
+    def holds(self, symbol: str) -> bool:
+        with self._lock:
+            return symbol in self.held
+
+    def assignments(self) -> Dict[str, Optional[str]]:
+        """Current symbol -> worker leases, for diagnostics"""
+        leases = self.store.items(LEASE_KEY)
+        return {key[len(LEASE_KEY):]: holder for key, holder in leases.items()}
+
+    def release_all(self) -> None:
+        self._stop.set()
+        with self._lock:
+            held, self.held = list(self.held), set()
+        for symbol in held:
+            self.store.release(LEASE_KEY + symbol, self.worker_id)
+        self.store.release(MEMBER_KEY + self.worker_id, self.worker_id)
@@ -0,0 +1,137 @@
+import threading
+import time
+from typing import Dict, Hashable, Optional
+
+PHASES = ("fetch", "process", "store")
+TELEMETRY_KEY = "collector:telemetry:"  # shared-store prefix of each worker's published health()
+LATE_AFTER = 2.0  # seconds past its slot before a tick counts as late
+STALE_AFTER = 3  # missed intervals before a key is reported stale
+SMOOTHING = 0.2  # EWMA weight of the newest duration
+
+
+def _ewma(previous: Optional[float], value: float) -> float:
+    return value if previous is None else SMOOTHING * value + (1 - SMOOTHING) * previous
+
+
+class KeyStats:
+    """Freshness and timing counters for one (symbol, expiry)"""
+
+    def __init__(self):
+        self.last_success: Optional[float] = None
+        self.last_attempt: Optional[float] = None
+        self.consecutive_failures = 0
+        self.ticks = 0
+        self.failures = 0
+        self.missed = 0
+        self.late = 0
+        self.last_lag = 0.0
+        self.last_durations: Dict[str, float] = {}
+        self.avg_durations: Dict[str, float] = {}
+        self.last_error: Optional[str] = None
+
+
+class CollectorTelemetry:
+    """Per-key tick telemetry recorded by DataController.
+
+    A tick is late when it starts more than LATE_AFTER seconds after its slot
+    and missed when its slot passes while the previous tick is still running.
+    Durations are summed over the tick's tasks per phase (fetch, process,
+    store); "tick" is the wall time from dispatch to the last task finishing.
+    """
+
+    def __init__(self):
+        self.stats: Dict[Hashable, KeyStats] = {}
+        self.active_tasks = 0
+        self.peak_active_tasks = 0
+        self._lock = threading.Lock()
+
+    def _key(self, key: Hashable) -> KeyStats:
+        if key not in self.stats:
+            self.stats[key] = KeyStats()
+        return self.stats[key]
+
+    def tick_started(self, key: Hashable, due_at: Optional[float], now: float) -> None:
+        with self._lock:
+            stats = self._key(key)
+            stats.last_attempt = now
+            stats.last_lag = max(0.0, now - due_at) if due_at else 0.0
+            if stats.last_lag > LATE_AFTER:
+                stats.late += 1
+
+    def tick_missed(self, key: Hashable) -> None:
+        with self._lock:
+            self._key(key).missed += 1
+
+    def task_started(self) -> None:
+        with self._lock:
+            self.active_tasks += 1
+            self.peak_active_tasks = max(self.peak_active_tasks, self.active_tasks)
+
+    def task_finished(self) -> None:
+        with self._lock:
+            self.active_tasks -= 1
+
+    def tick_finished(
+        self,
+        key: Hashable,
+        ok: bool,
+        durations: Dict[str, float],
+        now: float,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            stats = self._key(key)
+            stats.ticks += 1
+            if ok:
+                stats.last_success = now
+                stats.consecutive_failures = 0
+            else:
+                stats.failures += 1
+                stats.consecutive_failures += 1
+                stats.last_error = error
+            stats.last_durations = {k: round(v, 4) for k, v in durations.items()}
+            for phase, value in durations.items():
+                stats.avg_durations[phase] = _ewma(stats.avg_durations.get(phase), value)
+
+    def forget(self, keys) -> None:
+        with self._lock:
+            for key in keys:
+                self.stats.pop(key, None)
+
+    def snapshot(self, intervals: Optional[Dict[Hashable, float]] = None, now: Optional[float] = None) -> dict:
+        """JSON-ready view; `intervals` (effective seconds per key) drives staleness"""
+        now = now if now is not None else time.time()
+        intervals = intervals or {}
+        keys = {}
+        with self._lock:
+            for key, stats in self.stats.items():
+                name = "_".join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+                age = now - stats.last_success if stats.last_success else None
+                interval = intervals.get(key)
+                if stats.consecutive_failures:
+                    status = "failing"
+                elif age is None or (interval and age > STALE_AFTER * interval):
+                    status = "stale"
+                else:
+                    status = "ok"
+                keys[name] = {
+                    "status": status,
+                    "last_success": stats.last_success,
+                    "age_seconds": round(age, 1) if age is not None else None,
+                    "expected_interval": round(interval, 2) if interval else None,
+                    "consecutive_failures": stats.consecutive_failures,
+                    "ticks": stats.ticks,
+                    "failures": stats.failures,
+                    "missed_ticks": stats.missed,
+                    "late_ticks": stats.late,
+                    "last_lag_seconds": round(stats.last_lag, 3),
+                    "last_durations": stats.last_durations,
+                    "avg_durations": {k: round(v, 4) for k, v in stats.avg_durations.items()},
+                    "last_error": stats.last_error,
+                }
+            return {
+                "generated_at": now,
+                "active_tasks": self.active_tasks,
+                "peak_active_tasks": self.peak_active_tasks,
+                "keys": keys,
+            }
@@ -1,15 +1,20 @@
 from app import app
-from DB_Data_Controller import start_schedule, schedule
+import os
+import sys
 import threading
-import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "DB_Data_Saver"))
+from DB_Data_Controller import DataController
 
 
 def run_scheduler():
-    """Function to start and run the scheduler loop in a separate thread."""
-    start_schedule()  # Initialize the scheduler
-    while True:
-        schedule.run_pending()
-        time.sleep(10)
+    """Function to start and run the scheduler loop in a separate thread.
+
+    With SHARED_STORE_URL set, each app replica only polls the symbols it
+    holds leases for, so upstream load does not grow with the replica count.
+    """
+    controller = DataController()
+    controller.run()
 
 
 def start_flask():
@@ -145,6 +145,15 @@ class Urls:
         "WIPRO": 1,
     }
 
+    # Callables notified with the URL of every upstream request (rate metering)
+    request_observers = []
+
+    @staticmethod
+    def post(url, payload, **kwargs):
+        for observer in Urls.request_observers:
+            observer(url)
+        return requests.post(url, headers=Urls.headers, json=payload, **kwargs)
+
     @staticmethod
     def create_payload(symbol, exp, seg):
         return {"Data": {"Seg": seg, "Sid": symbol, "Exp": exp}}
@@ -164,12 +173,7 @@ class Urls:
             payload = Urls.create_fut_payload(symbol, seg)
             print(f"Request payload: {json.dumps(payload)}")
             
-            fut_response = requests.post(
-                Urls.fut_url,
-                headers=Urls.headers,
-                json=payload,
-                timeout=10
-            )
+            fut_response = Urls.post(Urls.fut_url, payload, timeout=10)
             print(f"Response status code: {fut_response.status_code}")
             
             if fut_response.status_code != 200:
@@ -214,11 +218,7 @@ class Urls:
 
     @staticmethod
     def fetch_fut_data(symbol, seg):
-        fut_response = requests.post(
-            Urls.fut_url,
-            headers=Urls.headers,
-            json=Urls.create_fut_payload(symbol, seg),
-        )
+        fut_response = Urls.post(Urls.fut_url, Urls.create_fut_payload(symbol, seg))
         fut_response.raise_for_status()
         fut_data = fut_response.json()
         return fut_data
@@ -229,19 +229,15 @@ class Urls:
             print(f"Fetching data for symbol: {symbol}, exp: {exp}, seg: {seg}")
             
             # Fetch option chain data
-            response = requests.post(
-                Urls.url, headers=Urls.headers, json=Urls.create_payload(symbol, exp, seg)
-            )
+            response = Urls.post(Urls.url, Urls.create_payload(symbol, exp, seg))
             response.raise_for_status()
             option_data = response.json()
             print(f"Option chain response status: {response.status_code}")
             # print(f"Option chain data: {json.dumps(option_data, indent=2)}")
 
             # Fetch spot data
-            spot_response = requests.post(
-                Urls.spot_url,
-                headers=Urls.headers,
-                json=Urls.create_spot_payload(symbol, seg),
+            spot_response = Urls.post(
+                Urls.spot_url, Urls.create_spot_payload(symbol, seg)
             )
             spot_response.raise_for_status()
             spot_data = spot_response.json()
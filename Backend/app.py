@@ -1,3 +1,4 @@
+import server_mode  # first: may monkey-patch the standard library for eventlet
 from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 from flask_migrate import Migrate
@@ -9,6 +10,7 @@ from flask_socketio import SocketIO
 import threading
 from models.user import db, User, UserRole
 from routes.auth import auth_bp
+from routes.collector import collector_bp
 from utils.auth_middleware import firebase_token_required as token_required, admin_required as role_required
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -16,6 +18,9 @@ import os
 from dotenv import load_dotenv
 from utils.email_service import mail
 from flask_cors import cross_origin
+from utils.demand import demand_tracker
+from utils.encoding import option_chain_columns, respond
+from utils.conditional import conditional
 
 # Load environment variables
 load_dotenv()
@@ -111,12 +116,10 @@ mail.init_app(app)
 socketio = SocketIO(
     app,
     cors_allowed_origins=["https://main.dtruazmd8dsaa.amplifyapp.com","http://localhost:5173", "https://stockify-oc.vercel.app", "http://16.16.204.22:10001"],
-    async_mode="threading",
     ping_timeout=10,
     ping_interval=5,
     always_connect=True,
-    logger=True,
-    engineio_logger=True
+    **server_mode.socketio_options()
 )
 
 # Initialize rate limiter
@@ -130,6 +133,8 @@ limiter = Limiter(
 
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix="/api/auth")
+app.register_blueprint(collector_bp, url_prefix="/api/collector")
+limiter.exempt(collector_bp)  # scraped every few seconds by monitoring
 
 # Create database tables
 with app.app_context():
@@ -190,11 +195,13 @@ def get_option_chain():
             return jsonify({"error": "Both symbol and expiry parameters are required"}), 400
 
         app.logger.info(f"Fetching option chain for {symbol} expiry {exp_date}")
-        app_instance = App()
-        option_chain_data = app_instance.get_live_data(symbol, exp_date)
+        option_chain_data = App.get_live_data(symbol, exp_date)
         
+        if isinstance(option_chain_data, tuple):
+            return option_chain_data  # error response
         if option_chain_data:
-            return jsonify(option_chain_data), 200
+            demand_tracker.record_request(symbol, exp_date)
+            return conditional(*respond(option_chain_data, columnar=option_chain_columns))
         else:
             app.logger.warning(f"No data found for {symbol} expiry {exp_date}")
             return jsonify({"error": "No data found"}), 404
@@ -306,7 +313,11 @@ def get_future():
 def live_data(current_user):
     symbol = request.args.get("sid") or request.args.get("symbol")
     exp = request.args.get("exp_sid") or request.args.get("expiry")
-    return App.get_live_data(symbol, exp)
+    result = App.get_live_data(symbol, exp)
+    if isinstance(result, dict):
+        demand_tracker.record_request(symbol, exp)
+        return conditional(*respond(result, columnar=option_chain_columns))
+    return result
 
 
 @app.route("/api/exp-date/", methods=["GET"])
@@ -327,7 +338,7 @@ def exp_date():
         # If we got a valid response
         if response and isinstance(response, dict):
             app.logger.info(f"Found expiry dates for {sid}")
-            return jsonify(response), 200
+            return conditional(jsonify(response))
         else:
             app.logger.warning(f"No expiry dates found for {sid}")
             return jsonify({"error": "No expiry dates found"}), 404
@@ -348,7 +359,8 @@ def percentage_data(current_user):
     isCe = data.get("option_type")
     strike = data.get("strike")
 
-    response, status_code = App.get_percentage_data(symbol, exp, isCe, strike)
+    response, status_code = App.get_percentage_data(symbol, exp, isCe, strike, window=data)
+    demand_tracker.record_response(symbol, exp, status_code)
     return response, status_code
 
 
@@ -363,7 +375,8 @@ def iv_data(current_user):
     isCe = data.get("option_type")
     strike = data.get("strike")
 
-    response, status_code = App.get_iv_data(symbol, exp, isCe, strike)
+    response, status_code = App.get_iv_data(symbol, exp, isCe, strike, window=data)
+    demand_tracker.record_response(symbol, exp, status_code)
     return response, status_code
 
 
@@ -377,7 +390,8 @@ def delta_data(current_user):
     exp = data.get("exp_sid") or data.get("expiry")
     strike = data.get("strike")
 
-    response, status_code = App.get_delta_data(symbol, exp, strike)
+    response, status_code = App.get_delta_data(symbol, exp, strike, window=data)
+    demand_tracker.record_response(symbol, exp, status_code)
     return response, status_code
 
 
@@ -391,7 +405,45 @@ def fut_data(current_user):
     exp = data.get("exp_sid") or data.get("expiry")
     # strike = data.get('strike')
 
-    response, status_code = App.get_fut_data(symbol, exp)
+    response, status_code = App.get_fut_data(symbol, exp, window=data)
+    demand_tracker.record_response(symbol, exp, status_code)
+    return response, status_code
+
+
+@app.route("/api/pcr-data/", methods=["POST"])
+@token_required
+@limiter.limit("100 per minute")
+def pcr_data(current_user):
+    """Endpoint to get chain-level put-call ratios."""
+    data = request.json
+    symbol = data.get("sid") or data.get("symbol")
+    exp = data.get("exp_sid") or data.get("expiry")
+
+    response, status_code = App.get_pcr_data(symbol, exp, window=data)
+    demand_tracker.record_response(symbol, exp, status_code)
+    return response, status_code
+
+
+@app.route("/api/history-batch/", methods=["POST"])
+@token_required
+@limiter.limit("100 per minute")
+def history_batch(current_user):
+    """Endpoint to get several strikes/fields of a day's history in one response (streamed with "stream": true)."""
+    data = request.json or {}
+    symbol = data.get("sid") or data.get("symbol")
+    exp = data.get("exp_sid") or data.get("expiry")
+
+    response, status_code = App.get_history_batch(
+        symbol,
+        exp,
+        data.get("strikes"),
+        sides=data.get("sides"),
+        fields=data.get("fields"),
+        dataset=data.get("dataset", "delta"),
+        date=data.get("date"),
+        window=data,
+    )
+    demand_tracker.record_response(symbol, exp, status_code)
     return response, status_code
 
 
@@ -450,4 +502,4 @@ if __name__ == "__main__":
             print(f"Error creating admin user: {e}")
             db.session.rollback()
 
-    socketio.run(app, host='0.0.0.0', port=10001, debug=True, ssl_context=('mycert.crt', 'mykey.key'))
+    socketio.run(app, host='0.0.0.0', port=10001, **server_mode.run_options('mycert.crt', 'mykey.key'))
@@ -0,0 +1,93 @@
+import json
+import os
+
+# Series derived from a chain snapshot when it is written, so history reads
+# are lookups. Each metric is [operation, field], applied to the PE and CE
+# values of that field: per strike in "derived_data", and over the summed
+# chain in "chain_data". Override or extend with a JSON file of the same
+# shape named by DERIVED_METRICS_FILE.
+
+DEFAULT_METRICS = {
+    "strike": {
+        "peminusce_oi": ["diff", "OI"],
+        "pebyce_oi": ["ratio", "OI"],
+        "peminusce_oichng": ["diff", "oichng"],
+        "pebyce_oichng": ["ratio", "oichng"],
+        "peminusce_vol": ["diff", "vol"],
+        "pebyce_vol": ["ratio", "vol"],
+    },
+    "chain": {
+        "pcr_oi": ["ratio", "OI"],
+        "pcr_oichng": ["ratio", "oichng"],
+        "pcr_vol": ["ratio", "vol"],
+    },
+}
+
+OPERATIONS = {
+    "diff": lambda pe, ce: pe - ce,
+    "ratio": lambda pe, ce: pe / ce if ce != 0 else None,
+}
+
+
+def load_metrics(path=None):
+    """DEFAULT_METRICS updated with the definitions in `path` (or DERIVED_METRICS_FILE)"""
+    metrics = {level: dict(definitions) for level, definitions in DEFAULT_METRICS.items()}
+    path = path or os.getenv("DERIVED_METRICS_FILE")
+    if path:
+        with open(path) as file:
+            for level, definitions in json.load(file).items():
+                metrics.setdefault(level, {}).update(definitions)
+    for level in metrics.values():
+        for name, (operation, _) in level.items():
+            if operation not in OPERATIONS:
+                raise ValueError(f"Unknown operation {operation!r} for derived metric {name!r}")
+    return metrics
+
+
+METRICS = load_metrics()
+
+
+def _apply(operation, pe, ce):
+    if pe is None or ce is None:
+        return None
+    try:
+        return OPERATIONS[operation](pe, ce)
+    except TypeError:
+        return None
+
+
+def derive_strike(ce, pe, metrics=None):
+    """{name: value} for one strike's CE and PE values"""
+    metrics = metrics or METRICS
+    ce, pe = ce or {}, pe or {}
+    return {
+        name: _apply(operation, pe.get(field), ce.get(field))
+        for name, (operation, field) in metrics["strike"].items()
+    }
+
+
+def derive_chain(snapshot, metrics=None):
+    """{name: value} over the whole chain, e.g. put-call ratio of summed OI"""
+    metrics = metrics or METRICS
+    totals = {}
+    for side in ("ce_data", "pe_data"):
+        for values in (snapshot.get(side) or {}).values():
+            for _, field in metrics["chain"].values():
+                value = (values or {}).get(field)
+                if isinstance(value, (int, float)):
+                    totals[(side, field)] = totals.get((side, field), 0) + value
+    return {
+        name: _apply(operation, totals.get(("pe_data", field)), totals.get(("ce_data", field)))
+        for name, (operation, field) in metrics["chain"].items()
+    }
+
+
+def add_derived(snapshot, metrics=None):
+    """Store per-strike and chain-level derived series next to the raw fields"""
+    ce_data, pe_data = snapshot.get("ce_data") or {}, snapshot.get("pe_data") or {}
+    snapshot["derived_data"] = {
+        strike: derive_strike(ce_data.get(strike), pe_data.get(strike), metrics)
+        for strike in ce_data.keys() | pe_data.keys()
+    }
+    snapshot["chain_data"] = derive_chain(snapshot, metrics)
+    return snapshot
@@ -0,0 +1,171 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import pytz
+
+from retrivedata import decode_snapshots, get_client
+
+# Read-through cache of decoded intraday snapshots, shared by every request in
+# the process. Today only grows, so each lookup re-reads the small
+# {timestamp: file_id} map and downloads just the blobs newer than the
+# entry's high-water mark, plus any earlier ones that failed to decode.
+# Earlier days never change: once read in full after their date has passed
+# they are served without touching Mongo again.
+
+MAX_CACHE_BYTES = int(os.getenv("HISTORY_CACHE_MB", "256")) * 1024 * 1024
+MAX_ENTRIES = int(os.getenv("HISTORY_CACHE_ENTRIES", "64"))
+
+ist = pytz.timezone("Asia/Kolkata")
+
+
+def ist_midnight(now=None):
+    """Timestamp of today's IST midnight, the `date` key used by the writers"""
+    current = datetime.fromtimestamp(now, ist) if now is not None else datetime.now(ist)
+    return int(current.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+
+class DayEntry:
+    """Decoded snapshots of one (db, symbol, expiry, date), oldest first"""
+
+    def __init__(self):
+        self.expiry = None
+        self.date_list = []
+        self.snapshots = {}
+        self.high_water = None  # newest timestamp already decoded
+        self.missing = set()  # listed timestamps whose blob was missing or undecodable, retried on each lookup
+        self.size = 0  # raw JSON bytes held
+        self.complete = False  # a past day, fully read with no blob missing
+        self.lock = threading.Lock()
+
+
+class HistoryCache:
+    """LRU of DayEntry, bounded by raw snapshot bytes and entry count.
+
+    Past days stay until the LRU bound pushes them out; the first lookup
+    after the IST date rolls over tops a day up one last time and marks it
+    complete. Returned days share the cached snapshot dicts; callers must
+    not mutate them.
+    """
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, max_entries=MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = DayEntry()
+            self.entries.move_to_end(key)
+            return entry
+
+    def _grew(self, key, added):
+        with self._lock:
+            if key not in self.entries:
+                return  # evicted while it was being filled
+            self.size += added
+            while len(self.entries) > 1 and (
+                self.size > self.max_bytes or len(self.entries) > self.max_entries
+            ):
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_day(self, symbol, expiry, date, file_path):
+        """Same shape as retrieve_data(): {"expiry", "dateList", "day": {date: {ts: snapshot}}}"""
+        db = get_client()[str(file_path)]
+        key = (str(file_path), symbol, expiry, int(date))
+        entry = self._entry(key)
+
+        with entry.lock:
+            if entry.complete:
+                self._count(hit=True)
+                return {
+                    "expiry": entry.expiry,
+                    "dateList": entry.date_list,
+                    "day": {date: entry.snapshots},
+                }
+
+            doc = db[f"{symbol}_{expiry }"].find_one(
+                {"symbol": symbol, "expiry": expiry, f"day.{date}": {"$exists": True}},
+                {"expiry": 1, "dateList": 1, f"day.{date}": 1},
+            )
+            if not doc or str(date) not in doc.get("day", {}):
+                print(f"No data found for expiry: {expiry} and Symbol: {symbol}.")
+                return None
+
+            day_data = doc["day"][str(date)]
+            new_ids = {
+                timestamp: day_data[timestamp]
+                for timestamp in sorted(day_data, key=int)
+                if entry.high_water is None or int(timestamp) > entry.high_water or timestamp in entry.missing
+            }
+            if new_ids:
+                self._count(hit=False)
+                sizes = {}
+                decoded = decode_snapshots(db, new_ids, sizes)
+                entry.missing = set(new_ids) - set(decoded)
+                if decoded:
+                    newest = max(int(timestamp) for timestamp in decoded)
+                    if entry.high_water is not None and min(int(timestamp) for timestamp in decoded) < entry.high_water:
+                        # A retried blob filled a hole; keep the snapshots oldest first
+                        entry.snapshots = dict(sorted({**entry.snapshots, **decoded}.items(), key=lambda item: int(item[0])))
+                    else:
+                        entry.snapshots.update(decoded)
+                    entry.high_water = max(newest, entry.high_water or newest)
+                added = sum(sizes.values())
+                entry.size += added
+            else:
+                self._count(hit=True)
+                added = 0
+            entry.expiry = doc["expiry"]
+            entry.date_list = doc.get("dateList", [])
+            entry.complete = int(date) < ist_midnight() and not entry.missing
+            result = {
+                "expiry": entry.expiry,
+                "dateList": entry.date_list,
+                "day": {date: dict(entry.snapshots)},
+            }
+
+        if added:
+            self._grew(key, added)
+        return result
+
+    def completed(self, symbol, expiry, date, file_path):
+        """(snapshot count, newest timestamp) of a past day cached in full, else None; never reads Mongo"""
+        with self._lock:
+            entry = self.entries.get((str(file_path), symbol, expiry, int(date)))
+        if entry is None or not entry.complete:
+            return None
+        return len(entry.snapshots), entry.high_water
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+history_cache = HistoryCache()
@@ -0,0 +1,443 @@
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from derived import derive_chain, derive_strike
+from history_cache import history_cache, ist_midnight
+from retrivedata import get_client, iter_day
+from series_index import SIDES, read_strike_series
+
+# One query path for every history endpoint: pick the snapshots of a day and
+# return the requested fields as parallel columns, ready to jsonify.
+
+INDEXED_DATASETS = {"Percentage", "Delta"}  # written through series_index
+STRIKELESS_SIDES = ("fut", "chain")
+AGGREGATIONS = ("last", "mean", "ohlc")
+MAX_DAYS = 30  # sessions one range query may span
+DAY_WORKERS = 4  # days fetched in parallel
+
+
+def _value(values, field, default):
+    # Dotted fields reach into nested dicts, e.g. "optgeeks.delta"
+    for part in field.split("."):
+        if not isinstance(values, dict) or part not in values:
+            return default
+        values = values[part]
+    return values
+
+
+def _leg(snapshot, side, strike):
+    if side == "fut":
+        # Futures blobs are {expiry_code: {...}} with a single contract
+        return next(iter(snapshot.values()), None) if snapshot else None
+    if side == "chain":
+        if "chain_data" in snapshot:
+            return snapshot["chain_data"]
+        return derive_chain(snapshot) if "ce_data" in snapshot else None
+    if side == "derived" and "derived_data" not in snapshot:
+        # Recorded before derived series were written
+        ce = (snapshot.get("ce_data") or {}).get(str(strike))
+        pe = (snapshot.get("pe_data") or {}).get(str(strike))
+        return derive_strike(ce, pe) if ce is not None and pe is not None else None
+    return (snapshot.get(SIDES[side]) or {}).get(str(strike))
+
+
+def _legs(sides, strikes, fields):
+    return [(side, strike, fields[side]) for side in sides for strike in strikes]
+
+
+def _row(snapshot, legs, partial, default):
+    """Per-leg field values of one snapshot, or None when it is skipped"""
+    found = [_leg(snapshot, side, strike) for side, strike, _ in legs]
+    absent = sum(value is None for value in found)
+    if absent == len(found) or (absent and not partial):
+        return None
+    return [
+        [None if value is None else _value(value, field, default) for field in leg_fields]
+        for value, (_, _, leg_fields) in zip(found, legs)
+    ]
+
+
+def _strikeless(sides):
+    return len(sides) == 1 and sides[0] in STRIKELESS_SIDES
+
+
+def _in_range(timestamp, start, end):
+    return (start is None or int(timestamp) >= start) and (end is None or int(timestamp) <= end)
+
+
+def _empty_series(sides, strikes, fields):
+    if _strikeless(sides):
+        return {sides[0]: {field: [] for field in fields[sides[0]]}}
+    return {side: {str(strike): {field: [] for field in fields[side]} for strike in strikes} for side in sides}
+
+
+def _columns(series, side, strike):
+    return series[side] if side in STRIKELESS_SIDES else series[side][str(strike)]
+
+
+def day_snapshot_count(db, symbol, expiry, date):
+    """Number of snapshots recorded for the day, counted server-side"""
+    result = list(
+        db[f"{symbol}_{expiry }"].aggregate(
+            [
+                {"$match": {"symbol": symbol, "expiry": expiry}},
+                {"$project": {"_id": 0, "n": {"$size": {"$objectToArray": {"$ifNull": [f"$day.{date}", {}]}}}}},
+            ]
+        )
+    )
+    return result[0]["n"] if result else 0
+
+
+def day_high_water(file_path, symbol, expiry, date):
+    """[date, snapshots stored, newest timestamp] of one day, without reading any blob.
+
+    Matches the "high_water" of query(), so validators can be checked
+    before the query runs.
+    """
+    cached = history_cache.completed(symbol, expiry, date, file_path)
+    if cached is not None:
+        return [date, *cached]
+    result = list(
+        get_client()[file_path][f"{symbol}_{expiry }"].aggregate(
+            [
+                {"$match": {"symbol": symbol, "expiry": expiry}},
+                {"$project": {"_id": 0, "timestamps": {"$map": {
+                    "input": {"$objectToArray": {"$ifNull": [f"$day.{date}", {}]}},
+                    "in": "$$this.k",
+                }}}},
+            ]
+        )
+    )
+    timestamps = result[0]["timestamps"] if result else []
+    return [date, len(timestamps), max(map(int, timestamps), default=None)]
+
+
+def _from_index(file_path, symbol, expiry, date, strike, sides, fields, default):
+    """Single-strike columns from the series index, or None when it is incomplete"""
+    db = get_client()[file_path]
+    top_level = sorted({field.split(".")[0] for side in sides for field in fields[side]})
+    indexed = read_strike_series(db, symbol, expiry, date, strike, sides, top_level)
+    if not indexed or set(indexed) != set(sides):
+        return None
+    timestamps = indexed[sides[0]]["timestamp"]
+    if any(indexed[side]["timestamp"] != timestamps for side in sides):
+        return None
+    if len(timestamps) != day_snapshot_count(db, symbol, expiry, date):
+        return None  # started mid-day or missed a write; the blobs are authoritative
+
+    series = {}
+    for side in sides:
+        rows = len(timestamps)
+        raw = indexed[side]
+        columns = {}
+        for field in fields[side]:
+            head, _, rest = field.partition(".")
+            values = raw.get(head, [default] * rows)
+            columns[field] = [_value(v, rest, default) for v in values] if rest else values
+        series[side] = {str(strike): columns}
+    return timestamps, series
+
+
+def query(file_path, symbol, expiry, strikes=None, fields=(), sides=("ce", "pe"), date=None, start=None, end=None, default=0, use_index=True, partial=False):
+    """Columnar history of one day.
+
+    `file_path` is the database ("Percentage", "Delta", "Future"). Sides are
+    "ce", "pe" and "derived" (PE-CE, PE/CE per strike, from derived.py);
+    futures use sides=("fut",) and chain-level series sides=("chain",), with
+    no strikes. `fields` is one list for every side or {side: [fields]}.
+    A snapshot is kept only when every requested (side, strike) is present
+    in it; skipped ones are counted in "missing". With partial=True a
+    snapshot is kept when any leg is present and absent legs get None.
+    Returns None when nothing is recorded for the day:
+
+        {"date", "expiry", "timestamp": [...], "missing": n, "source",
+         "series": {side: {strike: {field: [...]}}},   # {"fut"/"chain": {field: [...]}}
+         "high_water": [[date, snapshots stored, newest timestamp]]}
+    """
+    date = int(date) if date is not None else ist_midnight()
+    sides = tuple(sides)
+    fields = {side: list(fields[side] if isinstance(fields, dict) else fields) for side in sides}
+    strikes = [str(strike) for strike in (strikes or [])] if not _strikeless(sides) else [None]
+    if not _strikeless(sides) and not strikes:
+        raise ValueError("strikes are required for option history")
+
+    if use_index and file_path in INDEXED_DATASETS and len(strikes) == 1:
+        indexed = _from_index(file_path, symbol, expiry, date, strikes[0], sides, fields, default)
+        if indexed is not None:
+            timestamps, series = indexed
+            high_water = [[date, len(timestamps), int(timestamps[-1]) if timestamps else None]]
+            keep = [i for i, ts in enumerate(timestamps) if _in_range(ts, start, end)]
+            if len(keep) != len(timestamps):
+                timestamps = [timestamps[i] for i in keep]
+                for side in sides:
+                    columns = series[side][strikes[0]]
+                    for field in fields[side]:
+                        columns[field] = [columns[field][i] for i in keep]
+            return {
+                "date": date,
+                "expiry": expiry,
+                "timestamp": timestamps,
+                "missing": 0,
+                "series": series,
+                "source": "index",
+                "high_water": high_water,
+            }
+
+    data = history_cache.get_day(symbol, expiry, date, file_path)
+    if not data:
+        return None
+
+    timestamps = []
+    missing = 0
+    series = _empty_series(sides, strikes, fields)
+    legs = _legs(sides, strikes, fields)
+    targets = [_columns(series, side, strike) for side, strike, _ in legs]
+    day = data["day"][date]
+    for timestamp, snapshot in day.items():
+        if not _in_range(timestamp, start, end):
+            continue
+        row = _row(snapshot, legs, partial, default)
+        if row is None:
+            missing += 1
+            continue
+        timestamps.append(timestamp)
+        for columns, (_, _, leg_fields), values in zip(targets, legs, row):
+            for field, value in zip(leg_fields, values):
+                columns[field].append(value)
+
+    return {
+        "date": date,
+        "expiry": data["expiry"],
+        "timestamp": timestamps,
+        "missing": missing,
+        "series": series,
+        "source": "snapshots",
+        "high_water": [[date, len(day), max(map(int, day), default=None)]],
+    }
+
+
+def session_dates(file_path, symbol, expiry):
+    """Recorded session dates (IST midnights) from the document's dateList, oldest first"""
+    doc = get_client()[file_path][f"{symbol}_{expiry }"].find_one(
+        {"symbol": symbol, "expiry": expiry}, {"_id": 0, "dateList": 1}
+    )
+    return sorted(int(date) for date in (doc or {}).get("dateList", []))
+
+
+def select_dates(file_path, symbol, expiry, start=None, end=None, days=None):
+    """Sessions overlapping [start, end], or the last `days` of them; today when neither is set"""
+    if start is None and not days:
+        return [ist_midnight()]
+    dates = [
+        date
+        for date in session_dates(file_path, symbol, expiry)
+        if (start is None or date + 86400 > start) and (end is None or date <= end)
+    ]
+    return dates[-(days or MAX_DAYS):][-MAX_DAYS:]
+
+
+def _concat(parts):
+    if isinstance(parts[0], dict):
+        return {key: _concat([part[key] for part in parts]) for key in parts[0]}
+    return [value for part in parts for value in part]
+
+
+def query_range(file_path, symbol, expiry, start=None, end=None, days=None, dates=None, **kwargs):
+    """query() over several sessions, stitched into continuous columns.
+
+    Sessions are the dateList days overlapping [start, end], or the last
+    `days` sessions up to `end`; without either only today is read. Days are
+    fetched in parallel and capped at MAX_DAYS. `dates` passes sessions
+    already chosen by select_dates. Adds "dates" to the result.
+    """
+    if start is None and not days:
+        result = query(file_path, symbol, expiry, start=start, end=end, **kwargs)
+        if result is not None:
+            result["dates"] = [result["date"]]
+        return result
+
+    if dates is None:
+        dates = select_dates(file_path, symbol, expiry, start, end, days)
+    if not dates:
+        return None
+
+    def run(date):
+        return query(file_path, symbol, expiry, date=date, start=start, end=end, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=min(DAY_WORKERS, len(dates))) as pool:
+        results = [result for result in pool.map(run, dates) if result is not None]
+    if not results:
+        return None
+
+    sources = {result["source"] for result in results}
+    return {
+        "date": results[0]["date"],
+        "dates": [result["date"] for result in results],
+        "expiry": results[0]["expiry"],
+        "timestamp": _concat([result["timestamp"] for result in results]),
+        "missing": sum(result["missing"] for result in results),
+        "series": _concat([result["series"] for result in results]),
+        "source": sources.pop() if len(sources) == 1 else "mixed",
+        "high_water": [mark for result in results for mark in result["high_water"]],
+    }
+
+
+def column_names(sides, strikes, fields):
+    """Flat names of the values in each iter_rows() row, side.strike.field or side.field"""
+    return [
+        f"{side}.{field}" if side in STRIKELESS_SIDES else f"{side}.{strike}.{field}"
+        for side, strike, leg_fields in _legs(sides, strikes, fields)
+        for field in leg_fields
+    ]
+
+
+def iter_rows(file_path, symbol, expiry, strikes=None, fields=(), sides=("ce", "pe"), start=None, end=None, days=None, date=None, default=0, partial=False, stats=None):
+    """Row-wise query_range(): yields (timestamp, [values in column_names() order]).
+
+    Blobs are read straight from GridFS a batch at a time and never held for
+    the whole range, so memory stays flat however long the range is. Skipped
+    snapshots are counted into stats["missing"] when a dict is passed.
+    """
+    sides = tuple(sides)
+    fields = {side: list(fields[side] if isinstance(fields, dict) else fields) for side in sides}
+    strikes = [str(strike) for strike in (strikes or [])] if not _strikeless(sides) else [None]
+    legs = _legs(sides, strikes, fields)
+    dates = [int(date)] if date is not None else select_dates(file_path, symbol, expiry, start, end, days)
+    for day in dates:
+        for timestamp, snapshot in iter_day(symbol, expiry, day, file_path, start, end):
+            row = _row(snapshot, legs, partial, default)
+            if row is None:
+                if stats is not None:
+                    stats["missing"] = stats.get("missing", 0) + 1
+                continue
+            yield timestamp, [value for values in row for value in values]
+
+
+def _numeric(values):
+    array = np.asarray(values)
+    if array.dtype.kind in "iuf":
+        return array
+    try:
+        return np.array([np.nan if value is None else value for value in values], dtype=float)
+    except (TypeError, ValueError):
+        return None  # dicts, strings
+
+
+def _nan_to_none(array):
+    return [None if value != value else value for value in array.tolist()]
+
+
+def downsample(timestamps, columns, step, how="last", origin=0):
+    """Aggregate parallel columns into `step`-second buckets counted from `origin`.
+
+    "last" keeps each bucket's final value, "mean" averages it (None ignored)
+    and "ohlc" turns a column into {"open", "high", "low", "close"}. Columns
+    may be nested dicts of lists; non-numeric ones always use "last".
+    Returns (bucket start timestamps, columns).
+    """
+    if not timestamps:
+        return [], columns
+    buckets = (np.asarray(timestamps, dtype=np.int64) - origin) // step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    def reduce(values):
+        if isinstance(values, dict):
+            return {name: reduce(column) for name, column in values.items()}
+        array = _numeric(values) if how != "last" else None
+        if array is None:
+            return [values[i] for i in ends]
+        if how == "mean":
+            valid = ~np.isnan(array) if array.dtype.kind == "f" else np.ones(len(array), dtype=bool)
+            sums = np.add.reduceat(np.where(valid, array, 0), starts)
+            counts = np.add.reduceat(valid.astype(np.int64), starts)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return _nan_to_none(sums / counts)
+        return {
+            "open": [values[i] for i in starts],
+            "high": _nan_to_none(np.fmax.reduceat(array, starts)),
+            "low": _nan_to_none(np.fmin.reduceat(array, starts)),
+            "close": [values[i] for i in ends],
+        }
+
+    bucket_timestamps = [str(origin + int(bucket) * step) for bucket in buckets[starts]]
+    return bucket_timestamps, {name: reduce(column) for name, column in columns.items()}
+
+
+def benchmark(symbol, expiry, date, strike, repeat=3):
+    """Latency of the old retrieve_data + StringIO round trip vs query(), on one day"""
+    import io
+    import json
+
+    from retrivedata import retrieve_data
+
+    def legacy():
+        data = retrieve_data(symbol, expiry, date, "Delta")
+        with io.StringIO() as file:
+            json.dump(data, file, indent=4)
+            file.seek(0)
+            data = json.load(file)
+        columns = {"timestamp": [], "ce_oi": [], "pe_oi": []}
+        for key, value in data["day"][str(date)].items():
+            ce, pe = value.get("ce_data", {}), value.get("pe_data", {})
+            if str(strike) in ce and str(strike) in pe:
+                columns["timestamp"].append(key)
+                columns["ce_oi"].append(ce[str(strike)].get("OI", 0))
+                columns["pe_oi"].append(pe[str(strike)].get("OI", 0))
+        return columns
+
+    runs = [
+        ("legacy", legacy),
+        ("cold", lambda: (history_cache.clear(), query("Delta", symbol, expiry, [strike], ["OI"], date=date, use_index=False))),
+        ("warm", lambda: query("Delta", symbol, expiry, [strike], ["OI"], date=date, use_index=False)),
+        ("index", lambda: query("Delta", symbol, expiry, [strike], ["OI"], date=date)),
+    ]
+    for name, run in runs:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        print(f"{name:>7}: best {min(timings):.3f}s, mean {sum(timings) / repeat:.3f}s")
+
+
+def benchmark_stream(symbol, expiry, date, strikes, fields=("OI", "oichng", "vol"), file_path="Delta"):
+    """Peak memory and time to first byte: one jsonify'd columnar body vs streamed rows"""
+    import json
+    import tracemalloc
+
+    def columnar():
+        history_cache.clear()
+        result = query(file_path, symbol, expiry, strikes, fields, date=date, use_index=False, partial=True)
+        yield json.dumps(result)
+
+    def streamed():
+        for timestamp, values in iter_rows(file_path, symbol, expiry, strikes, fields, date=date, partial=True):
+            yield json.dumps([timestamp] + values)
+
+    for name, body in (("columnar", columnar), ("streamed", streamed)):
+        tracemalloc.start()
+        started = time.perf_counter()
+        first_byte, size = None, 0
+        for chunk in body():
+            first_byte = first_byte or time.perf_counter() - started
+            size += len(chunk)
+        total = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:>8}: ttfb {first_byte or 0:.3f}s, total {total:.3f}s, peak {peak / 1e6:.1f} MB, {size} bytes")
+    history_cache.clear()
+
+
+# Benchmark: python history_query.py <symbol_id> <expiry> <strike[,strike...]> [date] [--stream]
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--stream"]
+    symbol, expiry, strikes = int(args[0]), int(args[1]), args[2].split(",")
+    date = int(args[3]) if len(args) > 3 else ist_midnight()
+    if "--stream" in sys.argv:
+        benchmark_stream(symbol, expiry, date, strikes)
+    else:
+        benchmark(symbol, expiry, date, strikes[0])
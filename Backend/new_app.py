@@ -1,8 +1,10 @@
+import server_mode  # first: may monkey-patch the standard library for eventlet
 from flask import Flask, jsonify, request, send_from_directory
 from flask_socketio import SocketIO
 from flask_cors import CORS
 from routes.auth import auth_bp
 from utils.auth_middleware import firebase_token_required as token_required
+from utils.ops_auth import ops_token_required
 from models.user import db
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -10,8 +12,12 @@ import os
 from dotenv import load_dotenv
 import logging
 from logging.handlers import RotatingFileHandler
-import time
 from APIs import App
+from Urls import Urls
+from utils.broadcast import BroadcastHub
+from utils.demand import demand_tracker
+from utils.expiries import ExpiryCache
+from utils.live_view import make_view
 
 # Load environment variables
 load_dotenv()
@@ -54,13 +60,11 @@ db.init_app(app)
 # Initialize SocketIO
 socketio = SocketIO(app, 
     cors_allowed_origins="*",
-    logger=True,
-    engineio_logger=True,
     ping_timeout=5000,
     ping_interval=2500,
-    async_mode='threading',
     always_connect=True,
-    cors_credentials=False
+    cors_credentials=False,
+    **server_mode.socketio_options()
 )
 
 # Initialize rate limiter
@@ -93,37 +97,27 @@ with app.app_context():
 def uploaded_file(filename):
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
-# Event to control the live data stream
-client_streams = {}  # Dictionary to track active streams per client
+def fetch_live_data(sid, exp_sid):
+    """One tick of the live stream; error responses from App are raised"""
+    with app.app_context():
+        live_data = App.get_live_data(sid, exp_sid)
+        if isinstance(live_data, tuple):
+            raise ValueError(live_data[0].get_json().get("error", "Live data unavailable"))
+    return live_data
 
-def broadcast_live_data(client_id, sid, exp_sid):
-    """Send live data to specific client every 5 seconds."""
-    logger.info(f"Starting live data broadcast - Client ID: {client_id}, SID: {sid}, EXP_SID: {exp_sid}")
-    
-    while client_streams.get(client_id, {}).get("active", False):
-        try:
-            # Check if the stream parameters have changed
-            current_params = client_streams[client_id]
-            if current_params["sid"] != sid or current_params["exp_sid"] != exp_sid:
-                logger.info(f"Stream parameters changed for client {client_id}, stopping current stream")
-                break
-            
-            # Here you would typically fetch live data
-            live_data = App.get_live_data(sid, exp_sid)
-            socketio.emit("live_data", live_data, room=client_id)
-            time.sleep(10)  # No delay for real-time data
-            
-        except Exception as e:
-            logger.error(f"Error in live data broadcast - Client ID: {client_id}: {str(e)}")
-            break
+def listed_expiries(sid):
+    expiry_data = Urls.fetch_expiry(Urls.symbol_list[sid], Urls.seg_list[sid])
+    return expiry_data["data"]["explist"]
 
-    logger.info(f"Stopped live data broadcast - Client ID: {client_id}")
+# One producer per (symbol, expiry) with subscribers, emitting to its room
+live_hub = BroadcastHub(socketio, fetch_live_data)
+# Streams are only started for listed expiries of known symbols
+stream_expiries = ExpiryCache(listed_expiries, Urls.symbol_list)
 
 @socketio.on("connect")
 def handle_connect():
     try:
         client_id = request.sid
-        client_streams[client_id] = {"active": False}
         logger.info(f"WebSocket client connected - ID: {client_id}")
         socketio.emit('connection_established', {'sid': client_id}, room=client_id)
         return True
@@ -134,9 +128,8 @@ def handle_connect():
 @socketio.on("disconnect")
 def handle_disconnect():
     client_id = request.sid
-    if client_id in client_streams:
-        client_streams[client_id]["active"] = False
-        del client_streams[client_id]
+    live_hub.unsubscribe(client_id)
+    demand_tracker.unsubscribe(client_id)
     logger.info(f"WebSocket client disconnected - ID: {client_id}")
 
 @socketio.on("start_stream")
@@ -145,49 +138,110 @@ def start_streaming(data):
         client_id = request.sid
         sid = data.get("sid", "NIFTY")
         exp_sid = data.get("exp_sid", "1419013800")
+        patches = bool(data.get("patches", False))  # opt in to live_snapshot + live_patch
         
         logger.info(f"Received start_stream request - Client ID: {client_id}, SID: {sid}, EXP_SID: {exp_sid}")
         
-        # Stop any existing stream for this client
-        if client_id in client_streams:
-            client_streams[client_id]["active"] = False
-            time.sleep(0.1)  # Small delay to ensure the previous stream stops
+        # Replaces every subscription of the connection; the hub starts or shares the producer
+        stream_expiries.validate(sid, exp_sid)
+        room = live_hub.subscribe(client_id, sid, exp_sid, patches=patches, exclusive=True)
+        demand_tracker.unsubscribe(client_id)
+        demand_tracker.subscribe(client_id, sid, exp_sid)
         
-        # Start new stream with updated parameters
-        client_streams[client_id] = {
-            "active": True,
-            "sid": sid,
-            "exp_sid": exp_sid
-        }
-        
-        # Start the broadcast in a background thread
-        from threading import Thread
-        thread = Thread(target=broadcast_live_data, args=(client_id, sid, exp_sid))
-        thread.daemon = True
-        thread.start()
-        
-        logger.info(f"Started streaming thread - Client ID: {client_id}")
-        socketio.emit("stream_started", {"status": "Streaming started", "client_id": client_id}, room=client_id)
+        logger.info(f"Subscribed client {client_id} to {room}")
+        socketio.emit("stream_started", {"status": "Streaming started", "client_id": client_id, "patches": patches}, room=client_id)
     except Exception as e:
         logger.error(f"Error in start_streaming: {str(e)}")
         socketio.emit("stream_error", {"error": str(e)}, room=client_id)
 
+@socketio.on("subscribe")
+def subscribe_stream(data):
+    """Add one (symbol, expiry) to the connection's streams, keeping the others
+
+    Optional "patches", "strikes" (a count either side of the spot, or a
+    [low, high] price range) and "fields" apply to this subscription only.
+    Subscribing again to the same key changes its options. live_data
+    arrives as {"sid", "exp_sid", "seq", "data"}.
+    """
+    client_id = request.sid
+    data = data or {}
+    sid = data.get("sid")
+    exp_sid = data.get("exp_sid")
+    try:
+        if not sid or not exp_sid:
+            raise ValueError("'sid' and 'exp_sid' are required")
+        patches = bool(data.get("patches", False))
+        view = make_view(data.get("strikes"), data.get("fields"))
+        stream_expiries.validate(sid, exp_sid)
+
+        room = live_hub.subscribe(client_id, sid, exp_sid, patches=patches, view=view, tagged=True)
+        demand_tracker.subscribe(client_id, sid, exp_sid)
+
+        logger.info(f"Subscribed client {client_id} to {room}")
+        socketio.emit("subscribed", {"sid": sid, "exp_sid": str(exp_sid), "patches": patches, "view": view}, room=client_id)
+    except Exception as e:
+        logger.error(f"Error in subscribe_stream: {str(e)}")
+        socketio.emit("stream_error", {"sid": sid, "exp_sid": exp_sid, "error": str(e)}, room=client_id)
+
+@socketio.on("unsubscribe")
+def unsubscribe_stream(data):
+    """Drop one (symbol, expiry) from the connection's streams"""
+    client_id = request.sid
+    data = data or {}
+    sid = data.get("sid")
+    exp_sid = str(data.get("exp_sid"))
+
+    if not sid or not live_hub.unsubscribe(client_id, sid, exp_sid):
+        socketio.emit("unsubscribed", {"sid": sid, "exp_sid": exp_sid, "status": "No such subscription"}, room=client_id)
+        return
+
+    demand_tracker.unsubscribe(client_id, sid, exp_sid)
+    logger.info(f"Unsubscribed client {client_id} from {sid}|{exp_sid}")
+    socketio.emit("unsubscribed", {"sid": sid, "exp_sid": exp_sid, "status": "Unsubscribed"}, room=client_id)
+
+@socketio.on("resync")
+def resync_stream(data=None):
+    """A patch client saw a seq gap; send it a fresh live_snapshot of that stream, or of all"""
+    client_id = request.sid
+    data = data or {}
+    if not live_hub.resync(client_id, data.get("sid"), data.get("exp_sid")):
+        socketio.emit("stream_error", {"error": "No active stream"}, room=client_id)
+
 @socketio.on("stop_stream")
 def stop_streaming():
     client_id = request.sid
     
-    if client_id not in client_streams:
+    if not live_hub.unsubscribe(client_id):
         logger.warning(f"No active stream found - Client ID: {client_id}")
         socketio.emit("stream_stopped", {"status": "No active stream"}, room=client_id)
         return
     
-    client_streams[client_id]["active"] = False
-    time.sleep(0.1)  # Small delay to ensure the stream stops
-    del client_streams[client_id]
+    demand_tracker.unsubscribe(client_id)
     
     logger.info(f"Stopped streaming - Client ID: {client_id}")
     socketio.emit("stream_stopped", {"status": "Streaming stopped"}, room=client_id)
 
+@app.route('/api/stream-stats', methods=['GET'])
+@limiter.exempt
+@ops_token_required
+def stream_stats():
+    """Connections, live-data producers and process memory, for load tests and monitoring
+
+    Requires the ops token, like the collector's health routes. With
+    ?detail=1 the per-connection send queue stats (depth, held and dropped
+    frames) are included.
+    """
+    connections = len(socketio.server.eio.sockets)
+    stats = {
+        "async_mode": server_mode.ASYNC_MODE,
+        "connections": connections,
+        "rss_bytes": server_mode.memory_usage(),
+        "hub": live_hub.stats(),
+    }
+    if request.args.get("detail"):
+        stats["outboxes"] = live_hub.outboxes.connections()
+    return jsonify(stats), 200
+
 # Add API endpoints for percentage and IV data
 @app.route('/api/percentage-data/', methods=['POST', 'OPTIONS'])
 @token_required
@@ -206,14 +260,14 @@ def get_percentage_data(current_user):
             return jsonify({"error": f"Missing required fields: {', '.join(missing_fields)}"}), 400
             
         logger.info(f"Percentage data request: {data}")
-        
         # Get data from App
-        result = App.get_percentage_data(
+        result = App.get_live_percentage_data(
             sid=data.get('sid'),
             exp_sid=data.get('exp_sid'),
             strike=data.get('strike'),
             option_type=data.get('option_type')
         )
+        demand_tracker.record_request(data.get('sid'), data.get('exp_sid'))
         
         return jsonify(result), 200
         
@@ -238,14 +292,14 @@ def get_iv_data(current_user):
             return jsonify({"error": f"Missing required fields: {', '.join(missing_fields)}"}), 400
             
         logger.info(f"IV data request: {data}")
-        
         # Get data from App
-        result = App.get_iv_data(
+        result = App.get_live_iv_data(
             sid=data.get('sid'),
             exp_sid=data.get('exp_sid'),
             strike=data.get('strike'),
             option_type=data.get('option_type')
         )
+        demand_tracker.record_request(data.get('sid'), data.get('exp_sid'))
         
         return jsonify(result), 200
         
@@ -270,13 +324,13 @@ def get_delta_data(current_user):
             return jsonify({"error": f"Missing required fields: {', '.join(missing_fields)}"}), 400
             
         logger.info(f"Delta data request: {data}")
-        
         # Get data from App
-        result = App.get_delta_data(
+        result = App.get_live_delta_data(
             sid=data.get('sid'),
             exp_sid=data.get('exp_sid'),
             strike=data.get('strike')
         )
+        demand_tracker.record_request(data.get('sid'), data.get('exp_sid'))
         
         return jsonify(result), 200
         
@@ -301,13 +355,13 @@ def get_future_price_data(current_user):
             return jsonify({"error": f"Missing required fields: {', '.join(missing_fields)}"}), 400
             
         logger.info(f"Future price data request: {data}")
-        
         # Get data from App
         result = App.get_future_price_data(
             sid=data.get('sid'),
             exp_sid=data.get('exp_sid'),
             strike=data.get('strike')
         )
+        demand_tracker.record_request(data.get('sid'), data.get('exp_sid'))
         
         return jsonify(result), 200
         
@@ -330,5 +384,5 @@ def home():
     return {"message": "Authentication API is running"}
 
 if __name__ == "__main__":
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True, ssl_context=('mycert.crt', 'mykey.key'))
+    socketio.run(app, host='0.0.0.0', port=5000, **server_mode.run_options('mycert.crt', 'mykey.key'))
     # socketio.run(app, host="0.0.0.0", port=5000, debug=True, allow_unsafe_werkzeug=True)
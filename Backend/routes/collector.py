@@ -0,0 +1,119 @@
+from flask import Blueprint, Response, jsonify
+from DB_Data_Saver.telemetry import TELEMETRY_KEY
+from utils.ops_auth import ops_token_required
+from utils.shared_store import default_store
+
+collector_bp = Blueprint('collector', __name__)
+
+KEY_GAUGES = [
+    ("age_seconds", "collector_last_success_age_seconds", "Seconds since the last successful tick"),
+    ("expected_interval", "collector_expected_interval_seconds", "Effective polling interval"),
+    ("consecutive_failures", "collector_consecutive_failures", "Failed ticks in a row"),
+    ("last_lag_seconds", "collector_tick_lag_seconds", "Delay between a tick's slot and its start"),
+]
+KEY_COUNTERS = [
+    ("ticks", "collector_ticks_total", "Completed ticks"),
+    ("failures", "collector_tick_failures_total", "Ticks with at least one failed task"),
+    ("missed_ticks", "collector_missed_ticks_total", "Slots skipped because the previous tick was still running"),
+    ("late_ticks", "collector_late_ticks_total", "Ticks started late"),
+]
+
+
+def load_workers():
+    """{worker_id: health snapshot} for every live collector worker"""
+    workers = default_store().items(TELEMETRY_KEY)
+    return {key[len(TELEMETRY_KEY):]: value for key, value in workers.items() if value}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def render_metrics(workers):
+    """Prometheus text exposition of the published collector telemetry"""
+    lines = []
+
+    def family(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}")
+
+    def key_samples(field, phase=None):
+        for worker, health in workers.items():
+            for key, stats in health.get("keys", {}).items():
+                value = stats.get(field) if phase is None else stats.get(field, {}).get(phase)
+                if value is not None:
+                    labels = {"worker": worker, "key": key}
+                    if phase is not None:
+                        labels["phase"] = phase
+                    yield labels, value
+
+    for field, name, help_text in KEY_GAUGES:
+        family(name, "gauge", help_text, key_samples(field))
+    for field, name, help_text in KEY_COUNTERS:
+        family(name, "counter", help_text, key_samples(field))
+    family(
+        "collector_tick_duration_seconds",
+        "gauge",
+        "Smoothed tick duration by phase (fetch, process, store, tick)",
+        (
+            sample
+            for phase in ("fetch", "process", "store", "tick")
+            for sample in key_samples("avg_durations", phase)
+        ),
+    )
+    family(
+        "collector_active_tasks",
+        "gauge",
+        "Tasks running in the worker pool",
+        (({"worker": w}, h.get("active_tasks", 0)) for w, h in workers.items()),
+    )
+    family(
+        "collector_peak_active_tasks",
+        "gauge",
+        "Most tasks ever running at once, against max_workers",
+        (({"worker": w}, h.get("peak_active_tasks", 0)) for w, h in workers.items()),
+    )
+    family(
+        "collector_upstream_requests_per_second",
+        "gauge",
+        "Mean upstream request rate over the last minute",
+        (
+            ({"worker": w}, h.get("upstream_requests", {}).get("mean_per_sec", 0))
+            for w, h in workers.items()
+        ),
+    )
+    return "\n".join(lines) + "\n"
+
+
+def _public(health):
+    # Error text can carry upstream URLs and payloads; it stays in the worker logs
+    keys = {key: {k: v for k, v in stats.items() if k != "last_error"} for key, stats in health.get("keys", {}).items()}
+    return {**health, "keys": keys}
+
+
+@collector_bp.route('/health', methods=['GET'])
+@ops_token_required
+def collector_health():
+    workers = load_workers()
+    statuses = [
+        stats.get("status")
+        for health in workers.values()
+        for stats in health.get("keys", {}).values()
+    ]
+    summary = {status: statuses.count(status) for status in ("ok", "stale", "failing")}
+    healthy = bool(workers) and not summary["failing"] and not summary["stale"]
+    return jsonify({
+        "status": "ok" if healthy else ("down" if not workers else "degraded"),
+        "workers": len(workers),
+        "keys": summary,
+        "detail": {worker: _public(health) for worker, health in workers.items()},
+    }), 200 if workers else 503
+
+
+@collector_bp.route('/metrics', methods=['GET'])
+@ops_token_required
+def collector_metrics():
+    return Response(render_metrics(load_workers()), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,135 @@
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+
+import bson
+import pytz
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+# Per-strike time-series index kept next to the snapshot blobs.
+#
+# One document per (date, side, strike) in "<symbol>_<expiry>_series":
+#     {"date": 1730140200, "side": "ce", "strike": "24000",
+#      "ts": [t0, t1, ...], "f": {"OI": [...], "iv": [...], "optgeeks": [{...}, ...]}}
+# Every write pushes one element to "ts" and to every field array in a single
+# update, so the arrays stay aligned. A single-strike history then reads one
+# small document instead of every blob of the day.
+# A push only matches a document whose "ts" lacks the timestamp, so a retried
+# write is a no-op: the upsert it falls back to hits the unique index instead.
+
+SIDES = {"ce": "ce_data", "pe": "pe_data", "derived": "derived_data"}
+
+_indexed_collections = set()
+
+
+def series_collection(db, symbol, expiry):
+    collection = db[f"{symbol}_{expiry }_series"]
+    if collection.full_name not in _indexed_collections:
+        collection.create_index(
+            [("date", ASCENDING), ("strike", ASCENDING), ("side", ASCENDING)],
+            unique=True,
+        )
+        _indexed_collections.add(collection.full_name)
+    return collection
+
+
+def index_snapshot(db, symbol, expiry, data, timestamp, current_date):
+    """Append one chain snapshot ({"ce_data": {...}, "pe_data": {...}, "derived_data": {...}}) to the index"""
+    operations = []
+    for side, data_key in SIDES.items():
+        for strike, values in (data.get(data_key) or {}).items():
+            push = {"ts": int(timestamp)}
+            for field, value in (values or {}).items():
+                push[f"f.{field}"] = value
+            operations.append(
+                UpdateOne(
+                    {"date": int(current_date), "side": side, "strike": str(strike), "ts": {"$ne": int(timestamp)}},
+                    {"$push": push},
+                    upsert=True,
+                )
+            )
+    if not operations:
+        return
+    try:
+        series_collection(db, symbol, expiry).bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Duplicate keys are strikes that already hold this timestamp
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])) or e.details.get("writeConcernErrors"):
+            raise
+
+
+def read_strike_series(db, symbol, expiry, date, strike, sides=("ce", "pe"), fields=None):
+    """{side: {"timestamp": [...], field: [...]}} for one strike, or None if unindexed.
+
+    Only the requested fields are read from the server.
+    """
+    projection = {"_id": 0, "side": 1, "ts": 1}
+    if fields:
+        projection.update({f"f.{field}": 1 for field in fields})
+    else:
+        projection["f"] = 1
+    docs = series_collection(db, symbol, expiry).find(
+        {"date": int(date), "strike": str(strike), "side": {"$in": list(sides)}},
+        projection,
+    )
+    result = {}
+    for doc in docs:
+        series = {"timestamp": [str(ts) for ts in doc.get("ts", [])]}
+        series.update(doc.get("f", {}))
+        result[doc["side"]] = series
+    return result or None
+
+
+def backfill_day(db, symbol, expiry, date):
+    """Build the index for a day recorded before it existed, from the blobs"""
+    from retrivedata import retrieve_data
+
+    data = retrieve_data(symbol, expiry, date, db.name)
+    if not data:
+        return 0
+    series_collection(db, symbol, expiry).delete_many({"date": int(date)})
+    snapshots = data["day"][date]
+    for timestamp in sorted(snapshots, key=int):
+        index_snapshot(db, symbol, expiry, snapshots[timestamp], timestamp, date)
+    return len(snapshots)
+
+
+def compare_strike_read(symbol, expiry, date, file_path, strike, fields=None):
+    """Bytes read and latency for one strike: full-day blobs vs the series index"""
+    from retrivedata import get_client, retrieve_data
+
+    db = get_client()[str(file_path)]
+
+    started = time.perf_counter()
+    data = retrieve_data(symbol, expiry, date, file_path) or {"day": {date: {}}}
+    blob_seconds = time.perf_counter() - started
+    blob_bytes = sum(len(json.dumps(snapshot)) for snapshot in data["day"][date].values())
+
+    started = time.perf_counter()
+    series = read_strike_series(db, symbol, expiry, date, strike, fields=fields) or {}
+    index_seconds = time.perf_counter() - started
+    index_bytes = len(bson.encode({"series": series}))
+
+    logger.info(f"full-day blobs: {blob_bytes} bytes in {blob_seconds:.3f}s")
+    logger.info(f"strike series : {index_bytes} bytes in {index_seconds:.3f}s")
+
+
+# python series_index.py <db> <symbol_id> <expiry> <strike> [date] [--backfill]
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ist = pytz.timezone("Asia/Kolkata")
+    today = int(datetime.now(ist).replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+    args = [arg for arg in sys.argv[1:] if arg != "--backfill"]
+    file_path, symbol, expiry, strike = args[0], int(args[1]), int(args[2]), args[3]
+    date = int(args[4]) if len(args) > 4 else today
+    if "--backfill" in sys.argv:
+        from retrivedata import get_client
+
+        count = backfill_day(get_client()[file_path], symbol, expiry, date)
+        logger.info(f"Indexed {count} snapshots")
+    compare_strike_read(symbol, expiry, date, file_path, strike)
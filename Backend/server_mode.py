@@ -0,0 +1,66 @@
+import os
+import sys
+
+# Socket.IO server mode. Import this module before anything else so eventlet
+# can patch the standard library first.
+#
+# "threading" (the default) costs an OS thread per websocket and suits
+# development. SOCKETIO_ASYNC_MODE=eventlet runs connections, live-data
+# producers and the blocking upstream HTTP and Mongo calls as green threads,
+# so one process can hold thousands of subscribers:
+#     SOCKETIO_ASYNC_MODE=eventlet gunicorn -k eventlet -w 1 new_app:app
+# Keep one worker per process; Socket.IO sessions live in process memory.
+# To run several processes behind a load balancer (with sticky sessions), set
+# SOCKETIO_MESSAGE_QUEUE=redis://... and SHARED_STORE_URL=redis://... so rooms
+# and the per-key live-data leader are shared (see utils/message_queue.py).
+
+ASYNC_MODES = ("threading", "eventlet")
+ASYNC_MODE = os.getenv("SOCKETIO_ASYNC_MODE", "threading").lower()
+if ASYNC_MODE not in ASYNC_MODES:
+    raise ValueError(f"SOCKETIO_ASYNC_MODE must be one of {ASYNC_MODES}, not {ASYNC_MODE!r}")
+
+if ASYNC_MODE == "eventlet":
+    import eventlet
+
+    eventlet.monkey_patch()
+
+from utils.message_queue import queue_options  # after monkey-patching
+
+# Per-packet Socket.IO/Engine.IO logging costs more than the sends at high connection counts
+SOCKETIO_LOGGING = os.getenv("SOCKETIO_LOGGING", "1" if ASYNC_MODE == "threading" else "0") == "1"
+
+
+def socketio_options():
+    """SocketIO() keyword arguments: async mode, logging and the message queue (SOCKETIO_MESSAGE_QUEUE)"""
+    options = {"async_mode": ASYNC_MODE, "logger": SOCKETIO_LOGGING, "engineio_logger": SOCKETIO_LOGGING}
+    options.update(queue_options())
+    return options
+
+
+def run_options(certfile=None, keyfile=None, debug=True):
+    """socketio.run() keyword arguments; eventlet takes certfile/keyfile and no reloader"""
+    if ASYNC_MODE == "eventlet":
+        options = {"debug": False, "use_reloader": False}
+        if certfile:
+            options.update(certfile=certfile, keyfile=keyfile)
+    else:
+        options = {"debug": debug}
+        if certfile:
+            options["ssl_context"] = (certfile, keyfile)
+    return options
+
+
+def memory_usage():
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+
+    # Peak rather than current RSS where /proc is missing; kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
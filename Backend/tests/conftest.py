@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+
+import pytest
+from flask import Flask, request
+from flask_socketio import SocketIO
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import history_cache
+import history_query
+from APIs import App
+from Urls import Urls
+from utils.broadcast import BroadcastHub
+from utils.demand import DemandTracker
+from utils.shared_store import MemoryStore
+
+SYMBOL = next(iter(Urls.symbol_list))
+EXPIRY = 1419013800
+TODAY = history_cache.ist_midnight()
+
+
+def wait_for(condition, timeout=3.0):
+    """Poll until condition() is true; the hub ticks on background threads"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+class Ticker:
+    """A fetch callback returning a new option chain on every tick"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, symbol, expiry):
+        self.calls += 1
+        return {
+            "symbol": symbol,
+            "n": self.calls,
+            "options": {"data": {"oc": {
+                str(strike): {"ce": {"ltp": strike / 100 + self.calls, "OI": strike}, "pe": {"ltp": 1.0, "OI": strike}}
+                for strike in range(24000, 24500, 50)
+            }}},
+        }
+
+
+@pytest.fixture
+def live():
+    """A Socket.IO server on the threading async mode with a hub wired up as in new_app.py
+
+    Returns (socketio, app, hub, fetch); clients connect with socketio.test_client(app).
+    """
+    app = Flask(__name__)
+    socketio = SocketIO(app, async_mode="threading")
+    fetch = Ticker()
+    hub = BroadcastHub(socketio, fetch, interval=0.05, demand=DemandTracker(MemoryStore()), store=MemoryStore())
+
+    @socketio.on("start_stream")
+    def start_stream(data):
+        hub.subscribe(request.sid, data["sid"], data["exp_sid"], patches=data.get("patches"), exclusive=True)
+
+    @socketio.on("subscribe")
+    def subscribe(data):
+        try:
+            hub.subscribe(request.sid, data["sid"], data["exp_sid"], patches=data.get("patches"), view=data.get("view"), tagged=True)
+        except ValueError as e:
+            socketio.emit("stream_error", {"error": str(e)}, to=request.sid)
+
+    @socketio.on("resync")
+    def resync(data=None):
+        hub.resync(request.sid)
+
+    @socketio.on("disconnect")
+    def disconnect(*args):
+        hub.unsubscribe(request.sid)
+
+    yield socketio, app, hub, fetch
+    for client_id in list(hub.subscriptions):
+        hub.unsubscribe(client_id)
+
+
+def snapshot(n):
+    return {
+        "ce_data": {"105": {"OI": n, "oichng": 0, "vol": 1}},
+        "pe_data": {"105": {"OI": 2 * n, "oichng": 0, "vol": 0}},
+    }
+
+
+class Collection:
+    """The parts of a pymongo collection the history reads use; `days` maps date -> {timestamp: blob id}"""
+
+    def __init__(self, days):
+        self.days = days
+
+    def find_one(self, query, projection=None):
+        dates = [key.split(".")[1] for key in projection if key.startswith("day.")]
+        if not dates:
+            return {"dateList": list(self.days)}
+        date = dates[0]
+        if int(date) not in self.days:
+            return None
+        return {"expiry": EXPIRY, "dateList": list(self.days), "day": {date: dict(self.days[int(date)])}}
+
+    def aggregate(self, pipeline):
+        # day_high_water projects the keys of "$day.<date>"
+        field = pipeline[1]["$project"]["timestamps"]["$map"]["input"]["$objectToArray"]["$ifNull"][0]
+        return [{"timestamps": list(self.days.get(int(field.split(".")[1]), {}))}]
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    """Today's Delta snapshots of one key, stored in memory; returns a write(n) adding snapshot n"""
+    days = {TODAY: {}}
+    blobs = {}
+    client = {"Delta": {f"{Urls.symbol_list[SYMBOL]}_{EXPIRY}": Collection(days)}}
+
+    def decode(db, ids, sizes):
+        for timestamp in ids:
+            sizes[timestamp] = 1
+        return {timestamp: blobs[blob] for timestamp, blob in ids.items() if blob in blobs}
+
+    monkeypatch.setattr(history_cache, "get_client", lambda: client)
+    monkeypatch.setattr(history_cache, "decode_snapshots", decode)
+    monkeypatch.setattr(history_query, "get_client", lambda: client)
+    monkeypatch.setattr(history_query, "history_cache", history_cache.HistoryCache())
+    monkeypatch.setattr(history_query, "_from_index", lambda *args: None)
+
+    def write(n, date=TODAY, decodable=True):
+        blob = f"blob{date}-{n}"
+        days.setdefault(date, {})[str(date + 1000 + n)] = blob
+        if decodable:
+            blobs[blob] = snapshot(n)
+        return blob, blobs
+
+    return write
+
+
+def delta(window=None, headers=None):
+    """POST /api/delta-data/ for strike 105 of the stored key; returns (response, status)"""
+    with Flask(__name__).test_request_context("/api/delta-data/", method="POST", json={}, headers=headers):
+        response, status = App.get_delta_data(SYMBOL, str(EXPIRY), "105", window=window)
+        return response, status
@@ -0,0 +1,123 @@
+import pytest
+
+from DB_Data_Saver.adaptive import AdaptiveScheduler, change_rate
+from utils.demand import SUBSCRIBER_WEIGHT, DemandTracker
+from utils.shared_store import MemoryStore
+
+STRIKES = 100
+
+
+def snapshot(tick, changed):
+    """A chain in which the first `changed` strikes moved since tick - 1"""
+    return {
+        "ce_data": {str(strike): {"ltp": tick if strike < changed else 0, "OI": 1} for strike in range(STRIKES)},
+        "pe_data": {},
+    }
+
+
+def scheduler(**kwargs):
+    options = dict(base_interval=10, min_interval=1, max_interval=120, request_budget=0, requests_per_tick=3)
+    options.update(kwargs)
+    return AdaptiveScheduler(**options)
+
+
+def run(intervals, key, per_second, ticks=40):
+    """Feed `intervals` ticks whose changed fraction is per_second * the interval polled at"""
+    intervals.observe(key, snapshot(0, 0))
+    history = []
+    for tick in range(1, ticks):
+        changed = min(STRIKES, round(STRIKES * per_second * intervals.adaptive_interval(key)))
+        intervals.observe(key, snapshot(tick, changed))
+        history.append(intervals.adaptive_interval(key))
+    return history
+
+
+def test_change_rate_counts_moved_strikes():
+    assert change_rate(snapshot(0, 0), snapshot(1, 25)) == 0.25
+    assert change_rate(None, snapshot(1, 25)) is None
+
+
+@pytest.mark.parametrize("per_second", [0.1, 0.03, 0.01, 0.005])
+def test_interval_settles_on_the_target_change(per_second):
+    intervals = scheduler(target_change=0.3)
+    history = run(intervals, "key", per_second)
+    settled = 0.3 / per_second
+    assert history[-1] == pytest.approx(settled, rel=0.05)
+    # No swinging: once within 10% it stays there
+    first = next(index for index, interval in enumerate(history) if abs(interval - settled) <= 0.1 * settled)
+    assert all(abs(interval - settled) <= 0.1 * settled for interval in history[first:])
+
+
+def test_interval_is_clamped_to_its_bounds():
+    fast = scheduler(min_interval=2, max_interval=30)
+    assert min(run(fast, "fast", 1.0)) == 2
+    slow = scheduler(min_interval=2, max_interval=30)
+    assert run(slow, "slow", 0.0001)[-1] == 30
+    quiet = scheduler(min_interval=2, max_interval=30)
+    quiet.observe("quiet", snapshot(0, 0))
+    for tick in range(10):
+        quiet.observe("quiet", snapshot(0, 0))  # nothing moves at all
+    assert quiet.adaptive_interval("quiet") == 30
+
+
+def test_scales_keep_the_request_rate_within_budget():
+    intervals = scheduler(request_budget=2.0, requests_per_tick=3)
+    keys = [f"key{number}" for number in range(20)]
+    for number, key in enumerate(keys):
+        intervals.intervals[key] = 1 + number  # 1..20 seconds
+    scales = intervals.scales(keys)
+    total = sum(intervals.requests_per_tick / (intervals.interval(key) * scales[key]) for key in keys)
+    assert total == pytest.approx(intervals.request_budget)
+    assert all(scale >= 1 for scale in scales.values())
+    # Within budget nothing is stretched
+    roomy = scheduler(request_budget=100.0)
+    assert set(roomy.scales(keys).values()) == {1.0}
+
+
+def test_demand_bends_intervals():
+    intervals = scheduler(watched_max_interval=5, unwatched_min_interval=30)
+    intervals.intervals.update({"watched": 60, "unwatched": 2, "idle": 45})
+    intervals.set_demand({"watched": 3, "unwatched": 0})
+    assert intervals.interval("watched") == 5
+    assert intervals.interval("unwatched") == 30
+    assert intervals.interval("idle") == 45
+
+
+def test_watched_keys_are_dispatched_first():
+    intervals = scheduler()
+    keys = ["a", "b", "c"]
+    intervals.set_demand({"b": 1, "c": 12})
+    for key in keys:
+        intervals.next_due[key] = 0
+    assert intervals.due(keys, now=1) == ["c", "b", "a"]
+
+
+def test_unwatched_keys_keep_their_reserved_share():
+    intervals = scheduler(request_budget=10.0, requests_per_tick=3, reserved_share=0.2)
+    watched = [f"w{number}" for number in range(30)]
+    unwatched = [f"u{number}" for number in range(10)]
+    for key in watched + unwatched:
+        intervals.intervals[key] = 1  # 3 requests/s each: far over budget
+    intervals.set_demand({key: 1 for key in watched})
+    scales = intervals.scales(watched + unwatched)
+
+    def rate(keys):
+        return sum(intervals.requests_per_tick / (intervals.interval(key) * scales[key]) for key in keys)
+
+    assert rate(watched) == pytest.approx(8.0)
+    assert rate(unwatched) == pytest.approx(2.0)
+    # With no watched demand the whole budget goes to the unwatched keys
+    intervals.set_demand({})
+    scales = intervals.scales(unwatched)
+    assert rate(unwatched) == pytest.approx(10.0)
+
+
+def test_demand_scores_count_subscribers_and_served_reads():
+    demand = DemandTracker(MemoryStore())
+    demand.subscribe("client", "NIFTY", 1)
+    for status in (200, 304, 400, 404):
+        demand.record_response("NIFTY", 1, status)
+    demand.record_response("MADEUP", 1, 400)
+    assert demand.snapshot() == {
+        ("NIFTY", "1"): {"subscribers": 1, "requests": 2, "score": SUBSCRIBER_WEIGHT + 2},
+    }
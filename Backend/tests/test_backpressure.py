@@ -0,0 +1,78 @@
+import threading
+
+from conftest import wait_for
+from utils.backpressure import Outboxes
+
+
+class FakeServer:
+    """Records the frames written to each Engine.IO session"""
+
+    def __init__(self):
+        self.written = {}
+        self.disconnected = []
+
+    def _send_eio_packet(self, eio_sid, frame):
+        self.written.setdefault(eio_sid, []).append(frame)
+
+    def disconnect(self, sid, namespace=None):
+        self.disconnected.append(sid)
+
+
+def start_task(target):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    return thread
+
+
+def outboxes(depths, **kwargs):
+    boxes = Outboxes(FakeServer(), start_task, max_depth=4, **kwargs)
+    boxes.depth = lambda eio_sid: depths.get(eio_sid, 0)
+    return boxes
+
+
+def test_depth_reads_zero_without_an_engineio_queue():
+    boxes = Outboxes(FakeServer(), start_task)
+    assert boxes.depth("missing") == 0
+
+
+def test_slow_client_gets_the_latest_frame_per_slot():
+    depths = {"slow": 10}
+    boxes = outboxes(depths)
+    for tick in range(5):
+        boxes.send("fast-sid", "fast", "room", [f"full{tick}"])
+        boxes.send("slow-sid", "slow", "room", [f"full{tick}"])
+    assert boxes.server.written["fast"] == [f"full{tick}" for tick in range(5)]
+    assert "slow" not in boxes.server.written
+    assert boxes.connections()["slow-sid"]["dropped"] == 4
+
+    depths.clear()
+    assert wait_for(lambda: boxes.server.written.get("slow"))
+    assert boxes.server.written["slow"] == ["full4"]
+    assert boxes.stats()["lagging"] == 0
+
+
+def test_builders_run_outside_the_shared_lock():
+    depths = {"slow": 10}
+    boxes = outboxes(depths)
+    held = []
+
+    def snapshot():
+        held.append(boxes._lock.locked())
+        return ["snapshot", "attachment"]
+
+    boxes.send("sid", "slow", "room:patch", ["patch1"], coalesce=snapshot)
+    depths.clear()
+    assert wait_for(lambda: boxes.server.written.get("slow"))
+    assert held == [False]
+    assert boxes.server.written["slow"] == ["snapshot", "attachment"]
+    # Caught up: later frames go straight out again
+    boxes.send("sid", "slow", "room:patch", ["patch2"], coalesce=snapshot)
+    assert boxes.server.written["slow"][-1] == "patch2"
+
+
+def test_client_behind_too_long_is_disconnected():
+    boxes = outboxes({"slow": 10}, max_lag=0.1)
+    boxes.send("sid", "slow", "room", ["frame"])
+    assert wait_for(lambda: boxes.server.disconnected == ["sid"])
+    assert boxes.stats()["slow_disconnects"] == 1
+    assert "sid" not in boxes.connections()
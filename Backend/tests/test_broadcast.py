@@ -0,0 +1,27 @@
+from importlib.metadata import version
+
+from conftest import wait_for
+from utils.broadcast import direct_delivery
+
+
+def received(client, event):
+    return [message["args"][0] for message in client.get_received() if message["name"] == event]
+
+
+def test_pinned_socketio_has_the_internals_the_hub_uses(live):
+    socketio, _, hub, _ = live
+    assert version("python-socketio").split(".")[0] == "5"
+    assert version("python-engineio").split(".")[0] == "4"
+    assert direct_delivery(socketio.server)
+    assert hub.direct
+
+
+def test_falls_back_to_emit_without_socketio_internals(live):
+    socketio, app, hub, _ = live
+    hub.direct = False
+    client = socketio.test_client(app)
+    client.emit("subscribe", {"sid": "NIFTY", "exp_sid": 1})
+    assert wait_for(lambda: hub.producers[("NIFTY", "1")].seq >= 2)
+    messages = received(client, "live_data")
+    assert messages and all(message["sid"] == "NIFTY" for message in messages)
+    assert hub.outboxes.stats()["lagging"] == 0
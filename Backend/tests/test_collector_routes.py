@@ -0,0 +1,73 @@
+import pytest
+from flask import Flask
+
+import routes.collector as collector
+import utils.ops_auth as ops_auth
+from DB_Data_Saver.telemetry import TELEMETRY_KEY
+from utils.shared_store import MemoryStore
+
+TOKEN = "s3cret"
+HEALTH = {
+    "active_tasks": 2,
+    "peak_active_tasks": 5,
+    "upstream_requests": {"mean_per_sec": 4.5},
+    "keys": {
+        "NIFTY|1419013800": {
+            "status": "ok",
+            "ticks": 12,
+            "failures": 1,
+            "age_seconds": 3.2,
+            "avg_durations": {"fetch": 0.4, "tick": 0.9},
+            "last_error": "HTTPError: 502 for https://upstream.example/?token=abc",
+        },
+    },
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    store = MemoryStore()
+    store.set(TELEMETRY_KEY + 'worker-"1"', HEALTH)
+    monkeypatch.setattr(collector, "default_store", lambda: store)
+    monkeypatch.setattr(ops_auth, "OPS_TOKEN", TOKEN)
+    app = Flask(__name__)
+    app.register_blueprint(collector.collector_bp, url_prefix="/api/collector")
+    return app.test_client()
+
+
+def auth(token=TOKEN):
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.parametrize("path", ["/api/collector/health", "/api/collector/metrics"])
+def test_routes_reject_a_missing_or_wrong_token(client, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=auth("wrong")).status_code == 401
+    assert client.get(path, headers={"Authorization": TOKEN}).status_code == 401
+    assert client.get(path, headers=auth()).status_code == 200
+
+
+def test_routes_stay_closed_without_an_ops_token(client, monkeypatch):
+    monkeypatch.setattr(ops_auth, "OPS_TOKEN", None)
+    assert client.get("/api/collector/health", headers=auth()).status_code == 403
+
+
+def test_health_summarises_workers_without_error_text(client):
+    body = client.get("/api/collector/health", headers=auth()).get_json()
+    assert body["status"] == "ok" and body["workers"] == 1
+    assert body["keys"] == {"ok": 1, "stale": 0, "failing": 0}
+    stats = body["detail"]['worker-"1"']["keys"]["NIFTY|1419013800"]
+    assert "last_error" not in stats and stats["ticks"] == 12
+
+
+def test_metrics_are_prometheus_text(client):
+    response = client.get("/api/collector/metrics", headers=auth())
+    assert response.mimetype == "text/plain"
+    lines = response.get_data(as_text=True).splitlines()
+    labels = 'worker="worker-\\"1\\"",key="NIFTY|1419013800"'
+    assert "# TYPE collector_ticks_total counter" in lines
+    assert f"collector_ticks_total{{{labels}}} 12" in lines
+    assert f"collector_last_success_age_seconds{{{labels}}} 3.2" in lines
+    assert f'collector_tick_duration_seconds{{{labels},phase="fetch"}} 0.4' in lines
+    assert 'collector_upstream_requests_per_second{worker="worker-\\"1\\""} 4.5' in lines
+    assert not any("upstream.example" in line for line in lines)
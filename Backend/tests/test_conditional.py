@@ -0,0 +1,12 @@
+from conftest import delta
+
+
+def test_matching_etag_on_post_is_a_precondition_failure(stored):
+    stored(0)
+    response, status = delta()
+    etag = response.headers["ETag"]
+    response, status = delta(headers={"If-None-Match": etag})
+    assert status == 412
+    stored(1)
+    response, status = delta(headers={"If-None-Match": etag})
+    assert status == 200 and response.headers["ETag"] != etag
@@ -0,0 +1,20 @@
+from conftest import TODAY, delta
+
+
+def test_cursor_polls_return_only_newer_snapshots(stored):
+    for n in range(5):
+        stored(n)
+    response, status = delta()
+    body = response.get_json()
+    assert status == 200 and len(body["timestamp"]) == 5
+
+    response, status = delta({"since": body["cursor"]})
+    quiet = response.get_json()
+    assert status == 200 and quiet["timestamp"] == [] and quiet["cursor"] == body["cursor"]
+
+    stored(5)
+    stored(6)
+    response, _ = delta({"since": quiet["cursor"]})
+    update = response.get_json()
+    assert update["timestamp"] == [str(TODAY + 1005), str(TODAY + 1006)]
+    assert update["ce_oi"] == [5, 6]
@@ -0,0 +1,49 @@
+from conftest import wait_for
+from utils import demand as demand_module
+from utils.demand import SUBSCRIPTION_KEY, DemandTracker
+from utils.shared_store import MemoryStore
+
+
+class WriteCountingStore(MemoryStore):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def set(self, key, value, ttl=None):
+        self.writes += 1
+        return super().set(key, value, ttl)
+
+
+def test_refresh_writes_only_subscriptions_near_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(demand_module.time, "monotonic", lambda: now[0])
+    store = WriteCountingStore()
+    demand = DemandTracker(store)
+    demand.subscribe("a", "NIFTY", 1)
+    assert store.writes == 1
+
+    for _ in range(50):
+        demand.refresh(["a", "b"], "NIFTY", 1)  # "b" was never subscribed here, so it is written once
+    assert store.writes == 2
+
+    now[0] += demand_module.REFRESH_AFTER
+    demand.refresh(["a", "b"], "NIFTY", 1)
+    assert store.writes == 4
+    assert demand.snapshot()[("NIFTY", "1")]["subscribers"] == 2
+
+    demand.unsubscribe("a")
+    assert list(store.items(SUBSCRIPTION_KEY)) == [f"{SUBSCRIPTION_KEY}b|NIFTY|1"]
+
+
+def test_hub_ticks_do_not_rewrite_demand_per_subscriber(live):
+    socketio, app, hub, _ = live
+    store = WriteCountingStore()
+    hub.demand = DemandTracker(store)
+    clients = [socketio.test_client(app) for _ in range(20)]
+    for client in clients:
+        client.emit("subscribe", {"sid": "NIFTY", "exp_sid": 1})
+    assert wait_for(lambda: len(hub.producers[("NIFTY", "1")].clients) == 20)
+    ticks = hub.producers[("NIFTY", "1")].ticks
+    assert wait_for(lambda: hub.producers[("NIFTY", "1")].ticks >= ticks + 10)
+    assert store.writes == 20  # once per client, not once per client per tick
+    assert hub.demand.snapshot()[("NIFTY", "1")]["subscribers"] == 20
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from derived import DEFAULT_METRICS, add_derived, derive_strike, load_metrics
+
+
+def chain():
+    return {
+        "ce_data": {
+            "100": {"OI": 200, "oichng": 0, "vol": 10},
+            "105": {"OI": 100, "oichng": 20, "vol": 0},
+            "110": {"OI": 50, "oichng": -5, "vol": 5},
+        },
+        "pe_data": {
+            "100": {"OI": 300, "oichng": 10, "vol": 0},
+            "105": {"OI": 50, "oichng": 0, "vol": 0},
+        },
+    }
+
+
+def test_default_metrics_cover_oi_oichng_and_vol():
+    assert set(DEFAULT_METRICS) == {"strike", "chain"}
+    for field in ("OI", "oichng", "vol"):
+        assert DEFAULT_METRICS["strike"][f"peminusce_{field.lower()}"] == ["diff", field]
+        assert DEFAULT_METRICS["strike"][f"pebyce_{field.lower()}"] == ["ratio", field]
+        assert DEFAULT_METRICS["chain"][f"pcr_{field.lower()}"] == ["ratio", field]
+    assert load_metrics() == DEFAULT_METRICS
+
+
+def test_strike_diffs_and_ratios():
+    snapshot = add_derived(chain(), DEFAULT_METRICS)
+    assert set(snapshot["derived_data"]) == {"100", "105", "110"}
+    assert snapshot["derived_data"]["100"] == {
+        "peminusce_oi": 100,
+        "pebyce_oi": 1.5,
+        "peminusce_oichng": 10,
+        "pebyce_oichng": None,  # CE change of zero
+        "peminusce_vol": -10,
+        "pebyce_vol": 0.0,
+    }
+    assert snapshot["derived_data"]["105"]["pebyce_oi"] == 0.5
+    assert snapshot["derived_data"]["105"]["pebyce_vol"] is None  # 0 / 0
+    # A strike listed on one side only has nothing to compare
+    assert set(snapshot["derived_data"]["110"].values()) == {None}
+
+
+def test_chain_ratios_sum_each_side_first():
+    snapshot = add_derived(chain(), DEFAULT_METRICS)
+    assert snapshot["chain_data"] == {
+        "pcr_oi": 1.0,
+        "pcr_oichng": pytest.approx(10 / 15),
+        "pcr_vol": 0.0,
+    }
+
+
+def test_zero_or_missing_denominators_give_none():
+    snapshot = add_derived({"ce_data": {"100": {"OI": 0, "vol": "-"}}, "pe_data": {"100": {"OI": 10, "vol": 4}}}, DEFAULT_METRICS)
+    assert snapshot["derived_data"]["100"]["pebyce_oi"] is None
+    assert snapshot["derived_data"]["100"]["peminusce_vol"] is None  # not a number
+    assert snapshot["chain_data"] == {"pcr_oi": None, "pcr_oichng": None, "pcr_vol": None}
+    assert add_derived({}, DEFAULT_METRICS) == {"derived_data": {}, "chain_data": {"pcr_oi": None, "pcr_oichng": None, "pcr_vol": None}}
+
+
+def test_metrics_file_extends_the_defaults(tmp_path):
+    path = tmp_path / "metrics.json"
+    path.write_text(json.dumps({"chain": {"pcr_oi": ["diff", "OI"]}, "strike": {"pebyce_ltp": ["ratio", "ltp"]}}))
+    metrics = load_metrics(str(path))
+    assert metrics["chain"]["pcr_oi"] == ["diff", "OI"]
+    assert metrics["strike"]["pebyce_ltp"] == ["ratio", "ltp"]
+    assert DEFAULT_METRICS["chain"]["pcr_oi"] == ["ratio", "OI"]
+    assert derive_strike({"ltp": 4}, {"ltp": 2}, metrics)["pebyce_ltp"] == 0.5
+
+    path.write_text(json.dumps({"strike": {"pe_max": ["max", "OI"]}}))
+    with pytest.raises(ValueError):
+        load_metrics(str(path))
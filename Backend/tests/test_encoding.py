@@ -0,0 +1,90 @@
+import json
+
+import pytest
+from flask import Flask
+
+from utils.encoding import ARROW, JSON, MSGPACK, negotiate, option_chain_columns, respond
+
+HISTORY = {
+    "symbol": "NIFTY",
+    "timestamp": ["1000", "1060", "1120"],
+    "ce": {"OI": [1, 2, 3], "iv": [10.5, None, 11.0]},
+    "cursor": "1120",
+}
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+
+    @app.route("/history")
+    def history():
+        return respond(HISTORY)
+
+    @app.route("/chain")
+    def chain():
+        return respond(
+            {"symbol": "NIFTY", "options": {"ts": 5, "data": {"expiry": "x", "oc": {
+                "24050": {"ce": {"ltp": 2.5}, "pe": {"ltp": 1.0}},
+                "24000": {"ce": {"ltp": 3.5}, "pe": {"ltp": 0.5, "OI": 7}},
+            }}}},
+            columnar=option_chain_columns,
+        )
+
+    return app.test_client()
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("", JSON),
+    ("*/*", JSON),
+    ("text/html", JSON),
+    ("application/msgpack", MSGPACK),
+    ("application/x-msgpack", MSGPACK),
+    (ARROW, ARROW),
+    ("application/vnd.apache.arrow.file", ARROW),
+    ("application/json, application/msgpack", JSON),
+])
+def test_negotiate_strings(accept, expected):
+    if expected == ARROW:
+        pytest.importorskip("pyarrow")
+    if expected == MSGPACK:
+        pytest.importorskip("msgpack")
+    assert negotiate(accept) == expected
+
+
+def test_quality_picks_the_format(client):
+    pytest.importorskip("msgpack")
+    response = client.get("/history", headers={"Accept": "application/json;q=0.5, application/msgpack"})
+    assert response.mimetype == MSGPACK and response.headers["Vary"] == "Accept"
+    response = client.get("/history", headers={"Accept": "application/json, application/msgpack;q=0.5"})
+    assert response.mimetype == JSON and response.get_json() == HISTORY
+
+
+def test_msgpack_round_trip(client):
+    msgpack = pytest.importorskip("msgpack")
+    response = client.get("/history", headers={"Accept": MSGPACK})
+    body = msgpack.unpackb(response.data, raw=False)
+    assert body["columns"] == {"timestamp": HISTORY["timestamp"], "ce.OI": [1, 2, 3], "ce.iv": [10.5, None, 11.0]}
+    assert body["meta"] == {"symbol": "NIFTY", "cursor": "1120"}
+
+
+def test_arrow_round_trip(client):
+    pa = pytest.importorskip("pyarrow")
+    response = client.get("/history", headers={"Accept": ARROW})
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table.to_pydict() == {"timestamp": HISTORY["timestamp"], "ce.OI": [1, 2, 3], "ce.iv": [10.5, None, 11.0]}
+    assert json.loads(table.schema.metadata[b"meta"]) == {"symbol": "NIFTY", "cursor": "1120"}
+
+
+def test_chain_is_pivoted_by_strike(client):
+    pa = pytest.importorskip("pyarrow")
+    response = client.get("/chain", headers={"Accept": ARROW})
+    table = pa.ipc.open_stream(response.data).read_all()
+    assert table.to_pydict() == {
+        "strike": ["24000", "24050"],
+        "ce.ltp": [3.5, 2.5],
+        "pe.OI": [7, None],
+        "pe.ltp": [0.5, 1.0],
+    }
+    meta = json.loads(table.schema.metadata[b"meta"])
+    assert meta == {"symbol": "NIFTY", "options": {"ts": 5, "data": {"expiry": "x"}}}
@@ -0,0 +1,61 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Runs in a fresh interpreter: eventlet must monkey-patch before anything
+# else imports threading, and the patch cannot be undone for other tests.
+SMOKE = textwrap.dedent(
+    """
+    import server_mode  # monkey-patches first
+    import time
+    from flask import Flask, request
+    from flask_socketio import SocketIO
+    from utils.broadcast import BroadcastHub
+    from utils.demand import DemandTracker
+    from utils.shared_store import MemoryStore
+
+    assert server_mode.ASYNC_MODE == "eventlet"
+    app = Flask(__name__)
+    socketio = SocketIO(app, **server_mode.socketio_options())
+    fetches = []
+
+    def fetch(symbol, expiry):
+        time.sleep(0.01)  # a blocking upstream call, green under eventlet
+        fetches.append(symbol)
+        return {"n": len(fetches), "options": {"data": {"oc": {"100": {"ce": {"ltp": len(fetches)}}}}}}
+
+    hub = BroadcastHub(socketio, fetch, interval=0.05, demand=DemandTracker(MemoryStore()), store=MemoryStore())
+
+    @socketio.on("subscribe")
+    def subscribe(data):
+        hub.subscribe(request.sid, data["sid"], data["exp_sid"], patches=data.get("patches"))
+
+    clients = [socketio.test_client(app) for _ in range(3)]
+    for number, client in enumerate(clients):
+        client.emit("subscribe", {"sid": "NIFTY", "exp_sid": 1, "patches": number == 2})
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and hub.producers[("NIFTY", "1")].seq < 3:
+        time.sleep(0.05)
+    names = [{message["name"] for message in client.get_received()} for client in clients]
+    assert hub.producers[("NIFTY", "1")].seq >= 3, hub.stats()
+    assert "live_data" in names[0] and "live_data" in names[1], names
+    assert "live_patch" in names[2], names
+    print("ok", hub.stats()["ticks"])
+    """
+)
+
+
+def test_live_stream_under_eventlet():
+    pytest.importorskip("eventlet")
+    env = {**os.environ, "SOCKETIO_ASYNC_MODE": "eventlet"}
+    env.pop("SOCKETIO_MESSAGE_QUEUE", None)
+    result = subprocess.run(
+        [sys.executable, "-c", SMOKE], cwd=BACKEND, env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.startswith("ok")
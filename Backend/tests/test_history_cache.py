@@ -0,0 +1,25 @@
+import history_query
+from conftest import EXPIRY, SYMBOL, TODAY, snapshot
+from Urls import Urls
+
+
+def test_cache_retries_undecoded_blobs_before_freezing_a_day(stored):
+    yesterday = TODAY - 86400
+    stored(0, yesterday)
+    blob, blobs = stored(1, yesterday, decodable=False)
+    stored(2, yesterday)
+    cache = history_query.history_cache
+    key = ("Delta", Urls.symbol_list[SYMBOL], EXPIRY, yesterday)
+
+    day = cache.get_day(Urls.symbol_list[SYMBOL], EXPIRY, yesterday, "Delta")["day"][yesterday]
+    assert list(day) == [str(yesterday + 1000), str(yesterday + 1002)]
+    assert not cache.entries[key].complete
+
+    blobs[blob] = snapshot(1)  # the blob becomes readable
+    day = cache.get_day(Urls.symbol_list[SYMBOL], EXPIRY, yesterday, "Delta")["day"][yesterday]
+    assert list(day) == [str(yesterday + n) for n in (1000, 1001, 1002)]
+    assert cache.entries[key].complete
+    assert cache.completed(Urls.symbol_list[SYMBOL], EXPIRY, yesterday, "Delta") == (3, yesterday + 1002)
+
+    cache.get_day(Urls.symbol_list[SYMBOL], EXPIRY, yesterday, "Delta")
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
@@ -0,0 +1,73 @@
+import pytest
+from flask import Flask
+from flask_socketio import SocketIO
+from socketio import packet
+
+from conftest import Ticker, wait_for
+from utils.broadcast import BroadcastHub
+from utils.demand import DemandTracker
+from utils.message_queue import queue_options
+from utils.shared_store import FileStore, MemoryStore
+
+
+def start_server(store, fetch, name):
+    """A Socket.IO server on the in-process local:// queue; returns (server, hub, frames by eio sid)"""
+    socketio = SocketIO(Flask(name), async_mode="threading", **queue_options("local://"))
+    server = socketio.server
+    server.manager.initialize()
+    server.manager_initialized = True
+    frames = {}
+
+    def send(eio_sid, frame):
+        event, message = packet.Packet(encoded_packet=frame.data).data
+        frames.setdefault(eio_sid, []).append((event, message))
+
+    server._send_eio_packet = send
+    hub = BroadcastHub(socketio, fetch, interval=0.1, demand=DemandTracker(MemoryStore()), store=store)
+    return server, hub, frames
+
+
+def connect(server, hub, eio_sid, patches=False):
+    sid = server.manager.connect(eio_sid, "/")
+    hub.subscribe(sid, "NIFTY", 1, patches=patches)
+    return sid
+
+
+def test_message_queue_requires_a_shared_store(monkeypatch):
+    monkeypatch.delenv("SHARED_STORE_URL", raising=False)
+    socketio = SocketIO(Flask(__name__), async_mode="threading", **queue_options("local://"))
+    with pytest.raises(ValueError):
+        BroadcastHub(socketio, Ticker())
+
+
+def test_shared_store_url_is_used_over_a_message_queue(monkeypatch, tmp_path):
+    monkeypatch.setenv("SHARED_STORE_URL", f"file://{tmp_path}")
+    socketio = SocketIO(Flask(__name__), async_mode="threading", **queue_options("local://"))
+    assert isinstance(BroadcastHub(socketio, Ticker()).store, FileStore)
+
+
+def test_one_leader_fetches_and_hands_over_when_its_clients_leave():
+    store, fetch = MemoryStore(), Ticker()
+    (server_a, hub_a, frames_a), (server_b, hub_b, frames_b) = (
+        start_server(store, fetch, name) for name in ("a", "b")
+    )
+    leader = connect(server_a, hub_a, "a0")
+    follower = connect(server_b, hub_b, "b0")
+    follower_patches = connect(server_b, hub_b, "b1", patches=True)
+    key = ("NIFTY", "1")
+    assert wait_for(lambda: hub_a.producers[key].seq >= 3)
+    assert hub_a.producers[key].leading and not hub_b.producers[key].leading
+    # Only the leader fetches; every process delivers each tick to its own clients
+    assert fetch.calls == hub_a.producers[key].seq
+    assert wait_for(lambda: len(frames_b.get("b0", [])) >= 3)
+    assert {event for event, _ in frames_b["b1"]} <= {"live_snapshot", "live_patch"}
+
+    hub_a.unsubscribe(leader)
+    seq = store.get("live:state:NIFTY|1")["seq"]
+    assert wait_for(lambda: hub_b.producers[key].leading, timeout=2)
+    assert wait_for(lambda: hub_b.producers[key].seq > seq + 1)
+    # The new leader continues the shared sequence, so patch subscribers see no gap
+    seqs = [message["seq"] for event, message in frames_b["b1"] if event == "live_patch"]
+    assert seqs == list(range(seqs[0], seqs[0] + len(seqs)))
+    hub_b.unsubscribe(follower)
+    hub_b.unsubscribe(follower_patches)
@@ -0,0 +1,80 @@
+import copy
+import random
+
+from conftest import Ticker, wait_for
+from utils.live_patch import apply_patch, make_patch
+
+
+def expected(seq):
+    """The payload the fixture's fetch returned for tick `seq`"""
+    ticker = Ticker()
+    ticker.calls = seq - 1
+    return ticker("NIFTY", "1")
+
+
+def received(client):
+    return [(message["name"], message["args"][0]) for message in client.get_received()]
+
+
+def test_patch_round_trips_nested_changes():
+    rng = random.Random(7)
+    old = {
+        "spot": {"data": {"Ltp": 24010.5}},
+        "options": {"data": {"oc": {str(strike): {"ce": {"ltp": 1.0, "OI": strike}, "pe": {"ltp": 2.0}} for strike in range(24000, 24500, 50)}}},
+    }
+    for seq in range(1, 50):
+        new = copy.deepcopy(old)
+        chain = new["options"]["data"]["oc"]
+        chain[rng.choice(list(chain))]["ce"]["ltp"] = rng.random()
+        if rng.random() < 0.3 and len(chain) > 2:
+            del chain[rng.choice(list(chain))]
+        if rng.random() < 0.3:
+            chain[str(rng.randrange(20000, 30000))] = {"ce": {"ltp": 0.5}, "pe": None}
+        new["spot"]["data"]["Ltp"] += rng.random()
+        patch = make_patch(old, new, seq)
+        assert patch["seq"] == seq
+        assert apply_patch(copy.deepcopy(old), patch) == new
+        old = new
+
+
+def test_patch_clients_rebuild_the_payload_and_resync_after_a_gap(live):
+    socketio, app, hub, _ = live
+    client = socketio.test_client(app)
+    client.emit("subscribe", {"sid": "NIFTY", "exp_sid": 1, "patches": True})
+    producer = hub.producers[("NIFTY", "1")]
+    assert wait_for(lambda: producer.seq >= 4)
+    messages = received(client)
+
+    state, seq = None, None
+    for event, message in messages:
+        assert (message["sid"], message["exp_sid"]) == ("NIFTY", "1")
+        if event == "live_snapshot":
+            state, seq = copy.deepcopy(message["data"]), message["seq"]
+        elif state is not None and event == "live_patch":
+            assert message["seq"] == seq + 1
+            apply_patch(state, message)
+            seq = message["seq"]
+    assert seq >= 4 and state == expected(seq)
+
+
+def test_resync_sends_a_snapshot_newer_than_the_missed_patch(live):
+    socketio, app, hub, _ = live
+    client = socketio.test_client(app)
+    client.emit("subscribe", {"sid": "NIFTY", "exp_sid": 1, "patches": True})
+    producer = hub.producers[("NIFTY", "1")]
+    assert wait_for(lambda: producer.seq >= 3)
+    patches = [message for event, message in received(client) if event == "live_patch"]
+    missed = patches[-1]["seq"]  # pretend this one was lost
+
+    client.emit("resync")
+    snapshots = [message for event, message in received(client) if event == "live_snapshot"]
+    assert snapshots and snapshots[-1]["seq"] >= missed
+    state, seq = copy.deepcopy(snapshots[-1]["data"]), snapshots[-1]["seq"]
+    assert wait_for(lambda: producer.seq >= seq + 2)
+    for event, message in received(client):
+        # Patches at or below the snapshot's seq are already in it
+        if event == "live_patch" and message["seq"] > seq:
+            assert message["seq"] == seq + 1
+            apply_patch(state, message)
+            seq = message["seq"]
+    assert seq > snapshots[-1]["seq"] and state == expected(seq)
@@ -0,0 +1,126 @@
+import time
+
+import pytest
+
+from conftest import wait_for
+from utils.demand import SUBSCRIPTION_KEY, DemandTracker
+from utils.expiries import ExpiryCache
+from utils.live_view import make_view
+from utils.shared_store import MemoryStore
+
+
+def received(client, event):
+    return [message["args"][0] for message in client.get_received() if message["name"] == event]
+
+
+def test_start_stream_gets_the_bare_payload_and_subscribe_the_envelope(live):
+    socketio, app, hub, _ = live
+    legacy, multiplexed = socketio.test_client(app), socketio.test_client(app)
+    legacy.emit("start_stream", {"sid": "NIFTY", "exp_sid": 1})
+    multiplexed.emit("subscribe", {"sid": "NIFTY", "exp_sid": 1})
+    multiplexed.emit("subscribe", {"sid": "BANKNIFTY", "exp_sid": 2})
+    assert wait_for(lambda: all(producer.seq >= 2 for producer in hub.producers.values()))
+
+    bare = received(legacy, "live_data")
+    assert bare and all(set(message) == {"symbol", "n", "options"} for message in bare)
+    envelopes = received(multiplexed, "live_data")
+    assert {(message["sid"], message["exp_sid"]) for message in envelopes} == {("NIFTY", "1"), ("BANKNIFTY", "2")}
+    assert all(message["data"]["symbol"] == message["sid"] for message in envelopes)
+
+
+def test_filtered_view_keeps_the_strike_window_and_fields(live):
+    socketio, app, hub, _ = live
+    client = socketio.test_client(app)
+    client.emit("subscribe", {"sid": "NIFTY", "exp_sid": 1, "view": make_view([24100, 24200], ["ltp"])})
+    assert wait_for(lambda: hub.producers[("NIFTY", "1")].seq >= 2)
+    messages = received(client, "live_data")
+    assert messages
+    for message in messages:
+        chain = message["data"]["options"]["data"]["oc"]
+        assert list(chain) == ["24100", "24150", "24200"]
+        assert all(set(strike["ce"]) == {"ltp"} for strike in chain.values())
+
+
+def test_subscriptions_per_connection_are_capped(live):
+    socketio, app, hub, _ = live
+    hub.max_subscriptions = 2
+    client = socketio.test_client(app)
+    for expiry in (1, 2, 3):
+        client.emit("subscribe", {"sid": "NIFTY", "exp_sid": expiry})
+    errors = received(client, "stream_error")
+    assert len(errors) == 1 and "At most 2" in errors[0]["error"]
+    assert [len(current) for current in hub.subscriptions.values()] == [2]
+    # Changing the options of a held stream is not a new one
+    client.emit("subscribe", {"sid": "NIFTY", "exp_sid": 1, "patches": True})
+    assert not received(client, "stream_error")
+
+
+def test_expiry_cache_rejects_unlisted_keys_and_backs_off():
+    calls = []
+
+    def lookup(symbol):
+        calls.append(symbol)
+        if len(calls) == 1:
+            raise ConnectionError("upstream down")
+        return [1700000000, 1700600000]
+
+    expiries = ExpiryCache(lookup, {"NIFTY": 13})
+    with pytest.raises(ValueError):
+        expiries.validate("MADEUP", 1700000000)
+    with pytest.raises(LookupError):
+        expiries.validate("NIFTY", 1700000000)
+    # Within the backoff a flood of subscribes makes no further upstream calls
+    for _ in range(5):
+        with pytest.raises(LookupError):
+            expiries.validate("NIFTY", 1700000000)
+    assert calls == ["NIFTY"]
+
+    expiries.entries["NIFTY"] = (None, time.monotonic() - 60, 1)  # backoff elapsed
+    expiries.validate("NIFTY", "1700000000")
+    with pytest.raises(ValueError):
+        expiries.validate("NIFTY", 999)
+    assert len(calls) == 2
+
+
+class CountingStore(MemoryStore):
+    def __init__(self):
+        super().__init__()
+        self.scans = 0
+
+    def items(self, prefix=""):
+        self.scans += 1
+        return super().items(prefix)
+
+
+def test_demand_unsubscribe_deletes_the_client_keys_without_a_scan():
+    store = CountingStore()
+    demand = DemandTracker(store)
+    demand.subscribe("a", "NIFTY", 1)
+    demand.subscribe("a", "BANKNIFTY", 2)
+    demand.subscribe("b", "NIFTY", 1)
+    demand.unsubscribe("a", "BANKNIFTY", 2)
+    demand.unsubscribe("a")
+    assert store.scans == 0
+    assert list(store.items(SUBSCRIPTION_KEY)) == [f"{SUBSCRIPTION_KEY}b|NIFTY|1"]
+    assert "a" not in demand.keys
+
+
+def test_leaving_a_room_drops_the_frames_held_for_it(live):
+    socketio, app, hub, _ = live
+    client = socketio.test_client(app)
+    client.emit("subscribe", {"sid": "NIFTY", "exp_sid": 1})
+    client.emit("subscribe", {"sid": "BANKNIFTY", "exp_sid": 2})
+    (sid, rooms), = hub.subscriptions.items()
+    nifty, banknifty = rooms[("NIFTY", "1")], rooms[("BANKNIFTY", "2")]
+    hub.outboxes.depth = lambda eio_sid: 100  # the client is behind, so every frame is held
+    assert wait_for(lambda: sid in hub.outboxes.boxes and {nifty, banknifty} <= set(hub.outboxes.boxes[sid].pending))
+
+    # Same key in another mode: the old room's frame must not be flushed after the switch
+    client.emit("subscribe", {"sid": "NIFTY", "exp_sid": 1, "patches": True})
+    patch = hub.subscriptions[sid][("NIFTY", "1")]
+    assert nifty not in hub.outboxes.boxes[sid].pending
+    assert banknifty in hub.outboxes.boxes[sid].pending
+
+    # start_stream leaves every other subscription
+    client.emit("start_stream", {"sid": "NIFTY", "exp_sid": 1})
+    assert not {nifty, banknifty, patch} & set(hub.outboxes.boxes[sid].pending)
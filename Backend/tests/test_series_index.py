@@ -0,0 +1,60 @@
+from pymongo.errors import BulkWriteError
+
+import series_index
+
+DATE = 1730140200
+
+
+class SeriesCollection:
+    """The parts of a pymongo collection the series index uses, with its unique (date, strike, side) index"""
+
+    full_name = "Delta.series"
+
+    def __init__(self):
+        self.docs = {}
+
+    def create_index(self, keys, unique=False):
+        pass
+
+    def bulk_write(self, operations, ordered=True):
+        errors = []
+        for index, operation in enumerate(operations):
+            query = dict(operation._filter)
+            guard = query.pop("ts", None)
+            key = (query["date"], query["strike"], query["side"])
+            doc = self.docs.get(key)
+            if doc is not None and guard and guard["$ne"] in doc["ts"]:
+                # The filter no longer matches, so the upsert inserts a second document for the key
+                errors.append({"index": index, "code": 11000})
+                continue
+            if doc is None:
+                doc = self.docs[key] = {**query, "ts": [], "f": {}}
+            for field, value in operation._doc["$push"].items():
+                if field == "ts":
+                    doc["ts"].append(value)
+                else:
+                    doc["f"].setdefault(field.split(".", 1)[1], []).append(value)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "writeConcernErrors": []})
+
+    def find(self, query, projection):
+        return [
+            doc
+            for (date, strike, side), doc in self.docs.items()
+            if date == query["date"] and strike == query["strike"] and side in query["side"]["$in"]
+        ]
+
+
+def chain(n):
+    return {"ce_data": {"24000": {"OI": n, "iv": 10 + n}}, "pe_data": {"24000": {"OI": 2 * n, "iv": 12 + n}}}
+
+
+def test_indexing_a_snapshot_twice_keeps_the_series_aligned():
+    collection = SeriesCollection()
+    db = {"24_1419013800_series": collection}
+    for timestamp, n in ((DATE + 60, 1), (DATE + 120, 2), (DATE + 120, 2), (DATE + 180, 3)):
+        series_index.index_snapshot(db, 24, 1419013800, chain(n), timestamp, DATE)
+
+    series = series_index.read_strike_series(db, 24, 1419013800, DATE, "24000")
+    assert series["ce"] == {"timestamp": [str(DATE + 60), str(DATE + 120), str(DATE + 180)], "OI": [1, 2, 3], "iv": [11, 12, 13]}
+    assert series["pe"]["OI"] == [2, 4, 6]
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from DB_Data_Saver.sharding import LEASE_KEY, HashRing, ShardCoordinator
+from utils.shared_store import FileStore, MemoryStore
+
+SYMBOLS = [f"SYM{number}" for number in range(400)]
+
+
+@pytest.fixture(params=["file", "memory"])
+def store(request, tmp_path):
+    return FileStore(tmp_path) if request.param == "file" else MemoryStore()
+
+
+def owners(ring):
+    return {symbol: ring.owner(symbol) for symbol in SYMBOLS}
+
+
+def test_ring_spreads_keys_and_moves_about_one_nth_on_membership_changes():
+    before = owners(HashRing(["a", "b", "c", "d"]))
+    counts = {member: list(before.values()).count(member) for member in "abcd"}
+    assert all(len(SYMBOLS) / 4 * 0.5 < count < len(SYMBOLS) / 4 * 1.5 for count in counts.values())
+
+    joined = owners(HashRing(["a", "b", "c", "d", "e"]))
+    moved = [symbol for symbol in SYMBOLS if joined[symbol] != before[symbol]]
+    # Only keys taken by the new worker move, about 1/5 of them
+    assert all(joined[symbol] == "e" for symbol in moved)
+    assert len(SYMBOLS) / 5 * 0.5 < len(moved) < len(SYMBOLS) / 5 * 1.5
+
+    left = owners(HashRing(["a", "b", "c"]))
+    moved = [symbol for symbol in SYMBOLS if left[symbol] != before[symbol]]
+    assert all(before[symbol] == "d" for symbol in moved)
+    assert len(moved) == counts["d"]
+
+
+def test_coordinators_never_hold_the_same_key(store):
+    first = ShardCoordinator(store, worker_id="a", lease_ttl=30)
+    second = ShardCoordinator(store, worker_id="b", lease_ttl=30)
+    first.owned(SYMBOLS)  # alone, it takes everything
+    assert first.held == set(SYMBOLS)
+    for _ in range(3):
+        for coordinator in (second, first):
+            coordinator.owned(SYMBOLS)
+            assert not first.held & second.held
+    # Once the first has handed over, the split follows the ring
+    ring = HashRing(["a", "b"])
+    assert first.held == {symbol for symbol in SYMBOLS if ring.owner(symbol) == "a"}
+    assert second.held == {symbol for symbol in SYMBOLS if ring.owner(symbol) == "b"}
+    assert set(store.items(LEASE_KEY).values()) == {"a", "b"}
+
+
+def test_renew_keeps_leases_alive(store):
+    coordinator = ShardCoordinator(store, worker_id="a", lease_ttl=0.5)
+    coordinator.owned(SYMBOLS[:5])
+    for _ in range(4):
+        time.sleep(0.2)
+        coordinator.renew()
+    assert coordinator.held == set(SYMBOLS[:5])
+    assert all(store.holder(LEASE_KEY + symbol) == "a" for symbol in SYMBOLS[:5])
+
+
+def test_release_all_frees_every_key(store):
+    coordinator = ShardCoordinator(store, worker_id="a", lease_ttl=30)
+    coordinator.owned(SYMBOLS[:10])
+    coordinator.release_all()
+    assert coordinator.held == set()
+    assert store.items(LEASE_KEY) == {}
+    assert coordinator.live_members() == []
+
+
+def test_survivor_takes_over_once_a_dead_workers_leases_expire(store):
+    dead = ShardCoordinator(store, worker_id="a", lease_ttl=0.3)
+    survivor = ShardCoordinator(store, worker_id="b", lease_ttl=0.3)
+    dead.owned(SYMBOLS[:20])
+    survivor.owned(SYMBOLS[:20])
+    taken = set(dead.held)
+    assert taken and not taken & survivor.held
+    # "a" stops renewing; its member and symbol leases lapse
+    time.sleep(0.4)
+    assert set(survivor.owned(SYMBOLS[:20])) == set(SYMBOLS[:20])
+    assert all(store.holder(LEASE_KEY + symbol) == "b" for symbol in taken)
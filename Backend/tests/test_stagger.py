@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from DB_Data_Saver.adaptive import AdaptiveScheduler
+from DB_Data_Saver.rate_meter import RequestRateMeter
+
+KEYS = [(f"SYM{number}", 1700000000 + number) for number in range(60)]
+INTERVAL = 15
+REQUESTS_PER_TICK = 7
+
+
+def scheduler():
+    return AdaptiveScheduler(INTERVAL, INTERVAL, INTERVAL, request_budget=0, requests_per_tick=REQUESTS_PER_TICK)
+
+
+def test_phases_are_deterministic_and_evenly_spaced():
+    first, second = scheduler(), scheduler()
+    first.assign_phases(KEYS)
+    second.assign_phases(list(reversed(KEYS)))
+    assert first.phases == second.phases
+    phases = sorted(first.phases.values())
+    assert phases == [number / len(KEYS) for number in range(len(KEYS))]
+
+
+def test_slots_stay_on_the_phase_grid_within_the_jitter_bound():
+    intervals = scheduler()
+    intervals.assign_phases(KEYS)
+    jitter = min(intervals.MAX_JITTER, intervals.JITTER * INTERVAL)
+    for key in KEYS:
+        offset = intervals.phase(key) * INTERVAL
+        for now in (0.0, 7.3, 1000.9):
+            intervals.schedule_next(key, now)
+            due = intervals.next_due[key]
+            slot = due - (due - offset) % INTERVAL if (due - offset) % INTERVAL <= jitter else None
+            assert slot is not None and slot > now
+            assert 0 <= due - slot <= jitter
+
+
+def test_keys_sharing_an_interval_spread_their_requests():
+    """60 keys at a 15s interval, 7 requests a tick, dispatched once a second for five minutes"""
+    random.seed(29)
+    intervals, meter = scheduler(), RequestRateMeter(window=240)
+    start = 1_700_000_000
+    for second in range(300):
+        now = start + second
+        for key in intervals.due(KEYS, now):
+            for _ in range(REQUESTS_PER_TICK):
+                meter.record(now=now)
+            intervals.schedule_next(key, now)
+    report = meter.report(now=start + 300)
+    assert report["mean_per_sec"] == pytest.approx(REQUESTS_PER_TICK * len(KEYS) / INTERVAL, rel=0.01)
+    assert report["peak_to_mean"] <= 1.6
+    assert report["idle_seconds"] == 0
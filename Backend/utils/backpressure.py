@@ -0,0 +1,166 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per-connection send queues for the live stream. Frames go straight to a
+# client's Engine.IO queue while it holds fewer than MAX_QUEUE_DEPTH packets.
+# Past that the client is behind, and its frames are held per slot (one per
+# room): a newer frame replaces the one waiting, so a slow consumer only
+# gets the latest state per subscription once it drains. Slots whose
+# frames cannot be skipped (patches) hold a builder instead, which makes a
+# fresh snapshot at flush time. A client still behind after MAX_LAG seconds
+# is disconnected.
+#
+# The shared lock only guards the bookkeeping. Held frames are taken out
+# under it and built (a builder may read the shared store) and written
+# after it is released; each client's own lock keeps the frames of one
+# message together, and new frames for a client being flushed wait in its
+# slots so they never overtake the flush.
+
+MAX_QUEUE_DEPTH = int(os.getenv("LIVE_STREAM_MAX_QUEUE", "16"))
+MAX_LAG = float(os.getenv("LIVE_STREAM_MAX_LAG", "60"))
+DRAIN_INTERVAL = 0.25  # seconds between checks of the clients that are behind
+NAMESPACE = "/"
+
+
+class Outbox:
+    def __init__(self, eio_sid):
+        self.eio_sid = eio_sid
+        self.pending = {}  # slot -> frames, or a callable returning them
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.behind_since = None
+        self.flushing = False  # held frames are being written; new ones must wait behind them
+        self.lock = threading.Lock()  # serialises writes, so a message's frames never interleave
+
+
+class Outboxes:
+    def __init__(self, server, start_task, max_depth=MAX_QUEUE_DEPTH, max_lag=MAX_LAG):
+        """`server` is the socketio.Server; `start_task` starts a background task in its async mode"""
+        self.server = server
+        self.start_task = start_task
+        self.max_depth = max_depth
+        self.max_lag = max_lag
+        self.boxes = {}  # sid -> Outbox
+        self.slow_disconnects = 0
+        self._drainer = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def depth(self, eio_sid):
+        """Packets waiting in the client's Engine.IO queue; 0 when it cannot be read"""
+        # Not public API: python-engineio 4.x (checked up to 4.14) keeps a
+        # socket's outgoing packets in Socket.queue, a queue.Queue (eventlet's
+        # under eventlet). Anything else reads as 0, so frames are never held.
+        try:
+            return self.server.eio.sockets[eio_sid].queue.qsize()
+        except (AttributeError, KeyError, NotImplementedError):
+            return 0
+
+    def _push(self, outbox, frames):
+        # Called without self._lock; `frames` are already built
+        with outbox.lock:
+            for frame in frames:
+                self.server._send_eio_packet(outbox.eio_sid, frame)
+            outbox.sent += 1
+
+    def send(self, sid, eio_sid, slot, frames, coalesce=None):
+        """Queue frames for one client, or hold them for `slot` while it is behind.
+
+        `coalesce` builds replacement frames at flush time for slots whose
+        frames are not self-contained; it is held instead of `frames`.
+        """
+        depth = self.depth(eio_sid)
+        with self._lock:
+            outbox = self.boxes.get(sid)
+            if outbox is None:
+                outbox = self.boxes[sid] = Outbox(eio_sid)
+            outbox.max_depth = max(outbox.max_depth, depth)
+            direct = depth < self.max_depth and not outbox.pending and not outbox.flushing
+            if not direct:
+                if slot in outbox.pending:
+                    outbox.dropped += 1
+                outbox.pending[slot] = coalesce or frames
+                if outbox.behind_since is None:
+                    outbox.behind_since = time.monotonic()
+                if self._drainer is None:
+                    self._drainer = self.start_task(self._drain)
+        if direct:
+            self._push(outbox, frames)
+            return True
+        self._wake.set()
+        return False
+
+    def discard(self, sid, slots=None):
+        """Forget a client, or only the frames it holds for `slots`"""
+        with self._lock:
+            if slots is None:
+                self.boxes.pop(sid, None)
+                return
+            outbox = self.boxes.get(sid)
+            for slot in slots if outbox is not None else ():
+                outbox.pending.pop(slot, None)
+            if outbox is not None and not outbox.pending:
+                outbox.behind_since = None
+
+    def _drain(self):
+        """Flush held frames to clients that caught up; disconnect those behind too long"""
+        while True:
+            self._wake.clear()
+            slow = []
+            flush = []
+            with self._lock:
+                for sid, outbox in self.boxes.items():
+                    if not outbox.pending:
+                        continue
+                    if self.depth(outbox.eio_sid) < self.max_depth:
+                        flush.append((outbox, outbox.pending))
+                        outbox.pending, outbox.behind_since, outbox.flushing = {}, None, True
+                    elif time.monotonic() - outbox.behind_since > self.max_lag:
+                        slow.append(sid)
+                for sid in slow:
+                    del self.boxes[sid]
+            for outbox, pending in flush:
+                try:
+                    for frames in pending.values():
+                        self._push(outbox, frames() if callable(frames) else frames)
+                except Exception as e:
+                    logger.error(f"Error flushing live stream frames: {str(e)}")
+                finally:
+                    with self._lock:
+                        outbox.flushing = False
+            for sid in slow:
+                logger.warning(f"Disconnecting live stream client {sid}: behind for over {self.max_lag}s")
+                self.slow_disconnects += 1
+                self.server.disconnect(sid, namespace=NAMESPACE)
+            with self._lock:
+                waiting = any(outbox.pending for outbox in self.boxes.values())
+            self._wake.wait(DRAIN_INTERVAL if waiting else None)
+
+    def connections(self):
+        """{sid: queue depth, held frames, sent and dropped counts} for every client"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                sid: {
+                    "queue_depth": self.depth(outbox.eio_sid),
+                    "max_queue_depth": outbox.max_depth,
+                    "pending": len(outbox.pending),
+                    "sent": outbox.sent,
+                    "dropped": outbox.dropped,
+                    "behind_seconds": round(now - outbox.behind_since, 1) if outbox.behind_since else 0,
+                }
+                for sid, outbox in self.boxes.items()
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "lagging": sum(1 for outbox in self.boxes.values() if outbox.pending),
+                "dropped_frames": sum(outbox.dropped for outbox in self.boxes.values()),
+                "slow_disconnects": self.slow_disconnects,
+            }
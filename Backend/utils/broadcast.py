@@ -0,0 +1,630 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from socketio import PubSubManager
+from socketio import packet as sio_packet
+
+from .backpressure import Outboxes
+from .demand import demand_tracker
+from .encoding import msgpack
+from .live_patch import make_patch
+from .live_view import apply_view, view_id
+from .message_queue import LocalQueueManager
+from .shared_store import FileStore, RedisStore, default_store, get_shared_store
+
+logger = logging.getLogger(__name__)
+
+# One live-data producer per (symbol, expiry) with subscribers: it fetches
+# once per interval and emits to the key's rooms, so upstream calls scale
+# with keys rather than connections. One scheduler hands due ticks to a
+# bounded worker pool (LIVE_STREAM_WORKERS), one tick per key at a time; a
+# producer whose last subscriber leaves is cancelled and its pending tick
+# discarded. Subscribers of a key sharing a mode and view (live_view.py)
+# share a room, and each message is encoded once for all of them
+# (patch clients get a live_snapshot, then a live_patch per tick and send
+# "resync" on a gap; see live_patch.py). Encoding is JSON, or
+# LIVE_STREAM_ENCODING=msgpack for one binary attachment. Frames are
+# queued through python-socketio/engineio internals pinned in
+# requirements.txt, falling back to a plain emit where they are missing,
+# and go through per-connection send queues (backpressure.py).
+#
+# Over a message queue (message_queue.py) each key has one leader across
+# processes, elected by a lease in the shared store: it fetches, publishes
+# each tick to the queue and keeps the latest state for late joiners. The
+# lease needs a store every process sees, so SHARED_STORE_URL is required.
+
+STREAM_INTERVAL = float(os.getenv("LIVE_STREAM_INTERVAL", "10"))
+STREAM_ENCODING = os.getenv("LIVE_STREAM_ENCODING", "json")
+STREAM_WORKERS = int(os.getenv("LIVE_STREAM_WORKERS", "8"))
+MAX_SUBSCRIPTIONS = int(os.getenv("LIVE_STREAM_MAX_SUBSCRIPTIONS", "10"))  # per connection
+LEADER_KEY = "live:leader:"
+STATE_KEY = "live:state:"
+LEASE_INTERVALS = 3  # a leader that misses this many ticks loses the key
+NAMESPACE = "/"
+SNAPSHOT_EVENT = "live_snapshot"
+PATCH_EVENT = "live_patch"
+PATCH_ROOM_SUFFIX = ":patch"
+TAGGED_ROOM_SUFFIX = ":tagged"
+FULL, TAGGED, PATCH = "full", "tagged", "patch"  # bare payloads, envelopes, patches
+
+try:
+    from engineio import packet as eio_packet
+except ImportError:  # pragma: no cover
+    eio_packet = None
+
+
+def direct_delivery(server):
+    """True when the Socket.IO internals for queueing pre-encoded frames are available"""
+    return (
+        eio_packet is not None
+        and hasattr(eio_packet, "Packet")
+        and callable(getattr(server, "_send_eio_packet", None))
+        and callable(getattr(server.manager, "get_participants", None))
+        and hasattr(getattr(server, "eio", None), "sockets")
+    )
+
+
+def stream_room(symbol, expiry, mode=FULL, view=""):
+    suffix = {FULL: "", TAGGED: TAGGED_ROOM_SUFFIX, PATCH: PATCH_ROOM_SUFFIX}[mode]
+    return f"live:{symbol}:{expiry}" + (f":{view}" if view else "") + suffix
+
+
+def stream_tag(key, seq):
+    """Fields naming the stream a message belongs to"""
+    return {"sid": key[0], "exp_sid": key[1], "seq": seq}
+
+
+class View:
+    """One room of a key: bare payloads, envelopes or patches, optionally filtered by a live_view spec"""
+
+    def __init__(self, key, mode=FULL, spec=None):
+        self.mode = mode
+        self.patches = mode == PATCH
+        self.spec = spec
+        self.room = stream_room(*key, mode=mode, view=view_id(spec))
+        self.members = 0
+        self.base = None  # (seq, data) a filtered patch view last sent, the base of its next patch
+
+
+class Producer:
+    def __init__(self, key):
+        self.key = key
+        self.name = "|".join(key)
+        self.rooms = {mode: stream_room(*key, mode=mode) for mode in (FULL, TAGGED, PATCH)}
+        self.clients = {}  # client_id -> room
+        self.views = {}  # room -> View, for rooms with subscribers
+        self.stop = threading.Event()  # set when the last subscriber leaves
+        self.due = 0.0  # monotonic time of the next tick
+        self.last = None  # latest payload, sent to clients joining mid-interval
+        self.seq = 0
+        self.ticks = 0
+        self.leading = False  # holds the key's lease (always, without a message queue)
+        self.started = time.time()
+        self.traffic = {mode: {"messages": 0, "bytes": 0, "seconds": 0.0} for mode in ("full", "patch")}
+
+    def join(self, client_id, view):
+        view = self.views.setdefault(view.room, view)
+        view.members += 1
+        self.clients[client_id] = view.room
+        return view
+
+    def leave(self, client_id):
+        """Returns the room the client left, if it was here"""
+        room = self.clients.pop(client_id, None)
+        view = self.views.get(room)
+        if view is not None:
+            view.members -= 1
+            if not view.members:
+                del self.views[room]
+        return room
+
+    def has(self, mode):
+        return self.rooms[mode] in self.views
+
+    def filtered(self):
+        return [view for view in self.views.values() if view.spec]
+
+    def account(self, mode, size, seconds):
+        traffic = self.traffic[mode]
+        traffic["messages"] += 1
+        traffic["bytes"] += size
+        traffic["seconds"] += seconds
+
+    def snapshot(self):
+        return {"seq": self.seq, "data": self.last}
+
+
+def encode_frames(server, event, message, encoding="json"):
+    """Engine.IO packets carrying one Socket.IO event, and their size in bytes"""
+    if encoding == "msgpack":
+        message = msgpack.packb(message, use_bin_type=True, default=str)
+    encoded = server.packet_class(sio_packet.EVENT, namespace=NAMESPACE, data=[event, message]).encode()
+    if not isinstance(encoded, list):
+        encoded = [encoded]
+    size = sum(len(frame) for frame in encoded)
+    return [eio_packet.Packet(eio_packet.MESSAGE, frame) for frame in encoded], size
+
+
+class BroadcastHub:
+    def __init__(self, socketio, fetch, event="live_data", interval=STREAM_INTERVAL, demand=demand_tracker, encoding=STREAM_ENCODING, store=None, workers=STREAM_WORKERS, max_subscriptions=MAX_SUBSCRIPTIONS):
+        """`fetch(symbol, expiry)` returns the payload for one tick or raises"""
+        if encoding not in ("json", "msgpack") or (encoding == "msgpack" and msgpack is None):
+            raise ValueError(f"Unsupported live stream encoding: {encoding}")
+        self.encoding = encoding
+        self.socketio = socketio
+        self.fetch = fetch
+        self.event = event
+        self.interval = interval
+        self.demand = demand
+        self.distributed = isinstance(socketio.server.manager, PubSubManager)
+        if self.distributed:
+            store = store if store is not None else get_shared_store()
+            in_process = isinstance(socketio.server.manager, LocalQueueManager) and store is not None
+            if not (isinstance(store, (RedisStore, FileStore)) or in_process):
+                raise ValueError("A Socket.IO message queue needs SHARED_STORE_URL: live-data leases must be shared by every process")
+        self.host_id = uuid.uuid4().hex
+        self._store = store
+        self.subscriptions = {}  # client_id -> {(symbol, expiry): room}
+        self.producers = {}  # (symbol, expiry) -> Producer
+        self.retiring = {}  # stopped producers whose last tick is still in flight
+        self.inflight = set()  # keys with a tick running in the pool
+        self.counters = {"started": 0, "stopped": 0, "revived": 0, "ticks": 0, "cancelled_ticks": 0}
+        self.workers = workers
+        self.max_subscriptions = max_subscriptions
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="live-stream")
+        self._wake = threading.Event()
+        self._scheduler = None
+        self._lock = threading.Lock()
+        self.outboxes = Outboxes(socketio.server, socketio.start_background_task)
+        self.direct = direct_delivery(socketio.server)
+        if not self.direct:
+            logger.warning("Socket.IO internals not found: live stream falls back to per-client emits without backpressure")
+        if self.distributed and hasattr(socketio.server.manager, "live_handler"):
+            socketio.server.manager.live_handler = self._deliver_published
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = default_store()
+        return self._store
+
+    def _shared_snapshot(self, producer, snapshot):
+        # A follower's own copy is stale; the leader keeps the latest in the store
+        if self.distributed and not producer.leading:
+            return self.store.get(STATE_KEY + producer.name) or snapshot
+        return snapshot
+
+    def subscribe(self, client_id, symbol, expiry, patches=False, view=None, exclusive=False, tagged=False):
+        """Add or change a client's subscription to symbol/expiry, starting its producer if needed
+
+        `view` is a filter from live_view.make_view. With `exclusive` the
+        client's other subscriptions are dropped, as start_stream does.
+        `tagged` sends live_data as {"sid", "exp_sid", "seq", "data"}.
+        Returns the room the client joined; raises ValueError past
+        max_subscriptions.
+        """
+        key = (symbol, str(expiry))
+        joining = View(key, PATCH if patches else TAGGED if tagged else FULL, view)
+        retired = []
+        left = []  # rooms whose held frames must not be flushed after this
+        with self._lock:
+            current = self.subscriptions.get(client_id, {})
+            if not exclusive and key not in current and len(current) >= self.max_subscriptions:
+                raise ValueError(f"At most {self.max_subscriptions} live streams per connection")
+            current = self.subscriptions.setdefault(client_id, current)
+            if exclusive:
+                for other in [other for other in current if other != key]:
+                    left.append(current[other])
+                    retired.append(self._leave(client_id, other))
+            previous = current.get(key)
+            changed = previous != joining.room
+            producer = self.producers.get(key)
+            started = producer is None
+            if started:
+                producer = self._start(key)
+            if changed:
+                if previous:
+                    # Same key, other mode or filter: switch rooms without stopping the producer
+                    producer.leave(client_id)
+                    self.socketio.server.leave_room(client_id, previous, namespace=NAMESPACE)
+                    left.append(previous)
+                joining = producer.join(client_id, joining)
+                current[key] = joining.room
+            snapshot = producer.snapshot()
+
+        if left:
+            self.outboxes.discard(client_id, left)
+        for producer_retired in retired:
+            if producer_retired:
+                self._retire(producer_retired)
+        if not changed:
+            return joining.room
+        self.socketio.server.enter_room(client_id, joining.room, namespace=NAMESPACE)
+        if started:
+            self._wake_scheduler()
+        self._send_snapshot(client_id, producer, joining, self._shared_snapshot(producer, snapshot))
+        return joining.room
+
+    def unsubscribe(self, client_id, symbol=None, expiry=None):
+        """Drop one subscription of a client, or all of them; returns the keys dropped"""
+        retired = []
+        with self._lock:
+            current = self.subscriptions.get(client_id, {})
+            keys = list(current) if symbol is None else [key for key in [(symbol, str(expiry))] if key in current]
+            rooms = [current[key] for key in keys]
+            for key in keys:
+                retired.append(self._leave(client_id, key))
+            if not current:
+                self.subscriptions.pop(client_id, None)
+        self.outboxes.discard(client_id, None if symbol is None else rooms)
+        for producer in retired:
+            if producer:
+                self._retire(producer)
+        return keys
+
+    def resync(self, client_id, symbol=None, expiry=None):
+        """Send the latest full snapshot of one subscription, or of all, to a client that missed a patch"""
+        with self._lock:
+            current = self.subscriptions.get(client_id, {})
+            keys = list(current) if symbol is None else [key for key in [(symbol, str(expiry))] if key in current]
+            targets = []
+            for key in keys:
+                producer = self.producers[key]
+                targets.append((producer, producer.views[current[key]], producer.snapshot()))
+        for producer, view, snapshot in targets:
+            self._send_snapshot(client_id, producer, view, self._shared_snapshot(producer, snapshot))
+        return bool(targets)
+
+    def _view_message(self, producer, view, snapshot):
+        """The event and message bringing a member of `view` up to `snapshot`, or None before the first tick"""
+        data = apply_view(snapshot["data"], view.spec)
+        if data is None:
+            return None
+        if view.patches:
+            return SNAPSHOT_EVENT, {**stream_tag(producer.key, snapshot["seq"]), "data": data}
+        if view.mode == TAGGED:
+            return self.event, {**stream_tag(producer.key, snapshot["seq"]), "data": data}
+        return self.event, data
+
+    def _send_snapshot(self, client_id, producer, view, snapshot):
+        message = self._view_message(producer, view, snapshot)
+        if message is not None:
+            self._broadcast(*message, client_id, slot=view.room)
+
+    def _broadcast(self, event, message, room, publish=False, slot=None):
+        """Encode once, queue the same frames for everyone in `room`; returns (bytes, encode seconds)
+
+        With `publish` over a message queue the message is published once
+        instead and None is returned: every server process encodes it once
+        for its own members of the room, see _deliver_published.
+        """
+        if publish and self.distributed:
+            if self.encoding == "msgpack":
+                message = msgpack.packb(message, use_bin_type=True, default=str)
+            self.socketio.emit(event, message, to=room, namespace=NAMESPACE)
+            return None
+        return self._deliver(event, message, room, slot=slot)
+
+    def _deliver(self, event, message, room, slot=None, packed=False):
+        # Through each participant's outbox; patch rooms coalesce into a fresh snapshot
+        if not self.direct:
+            return self._emit_local(event, message, room, packed)
+        server = self.socketio.server
+        started = time.perf_counter()
+        frames, size = encode_frames(server, event, message, "json" if packed else self.encoding)
+        seconds = time.perf_counter() - started
+        slot = slot or room
+        coalesce = None
+        if slot.endswith(PATCH_ROOM_SUFFIX):
+            coalesce = lambda: self._snapshot_frames(slot)
+        for sid, eio_sid in server.manager.get_participants(NAMESPACE, room):
+            self.outboxes.send(sid, eio_sid, slot, frames, coalesce)
+        return size, seconds
+
+    def _emit_local(self, event, message, room, packed=False):
+        """Fallback for _deliver: a public emit to this process's members of `room`"""
+        started = time.perf_counter()
+        if self.encoding == "msgpack" and not packed:
+            message = msgpack.packb(message, use_bin_type=True, default=str)
+        size = len(message) if isinstance(message, bytes) else len(json.dumps(message, default=str))
+        seconds = time.perf_counter() - started
+        # ignore_queue: over a message queue this already is the delivery of a published message
+        self.socketio.server.emit(event, message, to=room, namespace=NAMESPACE, ignore_queue=True)
+        return size, seconds
+
+    def _deliver_published(self, event, message, room):
+        """Message-queue handler: deliver a published tick to this process's clients"""
+        producer = self._producer_for(room)
+        if event not in (self.event, SNAPSHOT_EVENT, PATCH_EVENT):
+            # Errors and other events must not replace a held state frame
+            self._deliver(event, message, room, slot=f"{room}|{event}")
+            if producer is not None and room == producer.rooms[TAGGED]:
+                for view in self._filtered_views(producer):
+                    self._deliver(event, message, view.room, slot=f"{view.room}|{event}")
+            return
+        size, seconds = self._deliver(event, message, room, packed=self.encoding == "msgpack")
+        if producer is None:
+            return
+        producer.account("patch" if room.endswith(PATCH_ROOM_SUFFIX) else "full", size, seconds)
+        if event == self.event and room == producer.rooms[TAGGED]:
+            if self.encoding == "msgpack":
+                message = msgpack.unpackb(message, raw=False)
+            self._emit_views(producer, message["data"], message["seq"])
+
+    def _producer_for(self, room):
+        with self._lock:
+            for producer in self.producers.values():
+                if room in producer.views or room in producer.rooms.values():
+                    return producer
+        return None
+
+    def _filtered_views(self, producer):
+        with self._lock:
+            return producer.filtered()
+
+    def _snapshot_frames(self, room):
+        """Frames of the latest snapshot for a patch room, sent in place of the patches a slow client missed"""
+        producer = self._producer_for(room)
+        if producer is None:
+            return []
+        with self._lock:
+            view = producer.views.get(room)
+            snapshot = producer.snapshot()
+        message = self._view_message(producer, view, self._shared_snapshot(producer, snapshot)) if view else None
+        if message is None:
+            return []
+        return encode_frames(self.socketio.server, *message, self.encoding)[0]
+
+    def _start(self, key):
+        # Called with self._lock held; revives a stopped producer whose tick is still running
+        producer = self.retiring.pop(key, None)
+        if producer is not None:
+            producer.stop.clear()
+            self.counters["revived"] += 1
+            logger.info(f"Reviving live data producer for {key}")
+        else:
+            producer = Producer(key)
+            self.counters["started"] += 1
+            logger.info(f"Starting live data producer for {key}")
+        self.producers[key] = producer
+        return producer
+
+    def _leave(self, client_id, key):
+        """Called with self._lock held; returns the producer to retire once the lock is released"""
+        producer = self.producers[key]
+        del self.subscriptions[client_id][key]
+        self.socketio.server.leave_room(client_id, producer.leave(client_id), namespace=NAMESPACE)
+        if producer.clients:
+            return None
+        producer.stop.set()
+        del self.producers[key]
+        self.counters["stopped"] += 1
+        logger.info(f"Stopping live data producer for {key}: no subscribers left")
+        if key in self.inflight:
+            self.retiring[key] = producer  # retired when its tick returns, unless revived
+            return None
+        return producer
+
+    def _retire(self, producer):
+        if self.distributed and producer.leading:
+            self.store.release(LEADER_KEY + producer.name, self.host_id)
+            producer.leading = False
+
+    def _lead(self, producer):
+        """Take or keep the key's lease; a new leader continues from the shared seq"""
+        if not self.distributed:
+            producer.leading = True
+            return True
+        lease_seconds = self.interval * LEASE_INTERVALS
+        leading = self.store.acquire(LEADER_KEY + producer.name, self.host_id, lease_seconds)
+        if leading and not producer.leading:
+            state = self.store.get(STATE_KEY + producer.name)
+            with self._lock:
+                if state and state["seq"] > producer.seq:
+                    producer.seq, producer.last = state["seq"], state["data"]
+            logger.info(f"Leading live data producer for {producer.key}")
+        producer.leading = leading
+        return leading
+
+    def _wake_scheduler(self):
+        with self._lock:
+            if self._scheduler is None:
+                self._scheduler = self.socketio.start_background_task(self._schedule)
+        self._wake.set()
+
+    def _schedule(self):
+        """Submit due ticks to the pool, one in flight per key, sleeping until the next is due"""
+        while True:
+            self._wake.clear()
+            with self._lock:
+                now = time.monotonic()
+                due = [
+                    producer
+                    for key, producer in self.producers.items()
+                    if key not in self.inflight and producer.due <= now
+                ]
+                for producer in due:
+                    self.inflight.add(producer.key)
+                    producer.due = now + self.interval
+                waiting = [
+                    producer.due for key, producer in self.producers.items() if key not in self.inflight
+                ]
+            for producer in due:
+                self._pool.submit(self._tick, producer)
+            self._wake.wait(max(min(waiting) - time.monotonic(), 0) if waiting else None)
+
+    def _tick(self, producer):
+        symbol, expiry = producer.key
+        try:
+            # Keep the collector's demand signal alive; writes only subscriptions near their TTL
+            self.demand.refresh(list(producer.clients), symbol, expiry)
+            if not self._lead(producer):
+                return  # another process produces this key
+            payload = self.fetch(symbol, expiry)
+            with self._lock:
+                if producer.stop.is_set():
+                    self.counters["cancelled_ticks"] += 1
+                    return
+                previous, producer.last = producer.last, payload
+                producer.seq += 1
+                producer.ticks += 1
+                self.counters["ticks"] += 1
+                seq = producer.seq
+                # Other processes' subscribers are not known here, so publish every mode
+                modes = {mode for mode in producer.rooms if self.distributed or producer.has(mode)}
+            if self.distributed:
+                self.store.set(STATE_KEY + producer.name, {"seq": seq, "data": payload}, ttl=self.interval * LEASE_INTERVALS)
+            self._emit_tick(producer, previous, payload, seq, modes)
+        except Exception as e:
+            logger.error(f"Error in live data producer {producer.key}: {str(e)}")
+            if not producer.stop.is_set():
+                # Over a message queue each process forwards the error to its filtered views
+                rooms = list(producer.rooms.values())
+                if not self.distributed:
+                    rooms += [view.room for view in self._filtered_views(producer)]
+                error = {"sid": symbol, "exp_sid": expiry, "error": str(e)}
+                for room in rooms:
+                    self.socketio.emit("stream_error", error, to=room, namespace=NAMESPACE)
+        finally:
+            with self._lock:
+                self.inflight.discard(producer.key)
+                retired = self.retiring.pop(producer.key, None)
+            if retired:
+                self._retire(retired)
+                logger.info(f"Stopped live data producer for {producer.key} after {producer.ticks} ticks")
+            self._wake.set()
+
+    def _emit_tick(self, producer, previous, payload, seq, modes):
+        tag = stream_tag(producer.key, seq)
+        for mode, message in ((FULL, payload), (TAGGED, {**tag, "data": payload})):
+            if mode in modes:
+                sent = self._broadcast(self.event, message, producer.rooms[mode], publish=True)
+                if sent:
+                    producer.account("full", *sent)
+        if PATCH in modes:
+            if previous is None:
+                event, message = SNAPSHOT_EVENT, {**tag, "data": payload}
+            else:
+                event, message = PATCH_EVENT, {**tag, **make_patch(previous, payload, seq)}
+            sent = self._broadcast(event, message, producer.rooms[PATCH], publish=True)
+            if sent:
+                producer.account("patch", *sent)
+        if not self.distributed:
+            self._emit_views(producer, payload, seq)
+
+    def _emit_views(self, producer, payload, seq):
+        """Build and send each filtered view of a tick once; patches are made against the view's own last state"""
+        tag = stream_tag(producer.key, seq)
+        for view in self._filtered_views(producer):
+            data = apply_view(payload, view.spec)
+            if view.patches:
+                base, view.base = view.base, (seq, data)
+                if base is not None and base[0] == seq - 1:
+                    event, message = PATCH_EVENT, {**tag, **make_patch(base[1], data, seq)}
+                else:
+                    event, message = SNAPSHOT_EVENT, {**tag, "data": data}
+            elif view.mode == TAGGED:
+                event, message = self.event, {**tag, "data": data}
+            else:
+                event, message = self.event, data
+            producer.account("patch" if view.patches else "full", *self._deliver(event, message, view.room))
+
+    def stats(self):
+        """Producers and subscribers, with bytes and encode time per client per minute by mode
+
+        Each message is encoded once for its room, so a client's share of the
+        encode time is the room's total divided by its subscribers.
+        """
+        outboxes = self.outboxes.stats()
+        with self._lock:
+            keys = {}
+            for (symbol, expiry), producer in self.producers.items():
+                minutes = max(time.time() - producer.started, 1) / 60
+                counts = {"full": 0, "patch": 0}
+                for view in producer.views.values():
+                    counts["patch" if view.patches else "full"] += view.members
+                keys[f"{symbol}|{expiry}"] = {
+                    "subscribers": len(producer.clients),
+                    "patch_subscribers": counts["patch"],
+                    "filtered_views": len(producer.filtered()),
+                    "ticks": producer.ticks,
+                    "leading": producer.leading,
+                    "seq": producer.seq,
+                    "per_client_minute": {
+                        mode: {
+                            "bytes": round(traffic["bytes"] / minutes),
+                            "encode_ms": round(traffic["seconds"] * 1000 / minutes / max(counts[mode], 1), 3),
+                        }
+                        for mode, traffic in producer.traffic.items()
+                    },
+                }
+            return {
+                "producers": len(self.producers),
+                "subscribers": len(self.subscriptions),
+                "subscriptions": sum(len(current) for current in self.subscriptions.values()),
+                "workers": self.workers,
+                "inflight": len(self.inflight),
+                "retiring": len(self.retiring),
+                **self.counters,
+                **outboxes,
+                "keys": keys,
+            }
+
+
+def benchmark(payload, clients=1000, ticks=20):
+    """CPU milliseconds per tick to send `payload` to `clients` simulated subscribers of one room.
+
+    Compares encoding once per room with encoding a packet for every client,
+    as a per-connection emit loop would. Transport writes are stubbed out.
+    """
+    from flask import Flask
+    from flask_socketio import SocketIO
+
+    socketio = SocketIO(Flask(__name__), async_mode="threading")
+    server = socketio.server
+    server._send_eio_packet = lambda eio_sid, frame: None
+    for number in range(clients):
+        sid = server.manager.connect(f"bench{number}", NAMESPACE)
+        server.manager.enter_room(sid, NAMESPACE, "bench")
+    participants = list(server.manager.get_participants(NAMESPACE, "bench"))
+
+    def per_client():
+        for _, eio_sid in participants:
+            for frame in encode_frames(server, "live_data", payload)[0]:
+                server._send_eio_packet(eio_sid, frame)
+
+    results = {}
+    for encoding in ("json", "msgpack") if msgpack is not None else ("json",):
+        hub = BroadcastHub(socketio, fetch=None, encoding=encoding)
+        started = time.process_time()
+        for _ in range(ticks):
+            size, _ = hub._broadcast("live_data", payload, "bench")
+        results[f"once ({encoding})"] = {"cpu_ms": (time.process_time() - started) * 1000 / ticks, "bytes": size}
+    started = time.process_time()
+    for _ in range(max(ticks // 10, 1)):
+        per_client()
+    results["per client (json)"] = {"cpu_ms": (time.process_time() - started) * 1000 / max(ticks // 10, 1), "bytes": results["once (json)"]["bytes"]}
+    return results
+
+
+# python -m utils.broadcast [payload.json] [clients]
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1].endswith(".json"):
+        with open(sys.argv[1]) as file:
+            body = json.load(file)
+    else:
+        body = {
+            "options": {"data": {"oc": {
+                str(strike): {"ce": {"ltp": 101.5, "OI": 125000, "iv": 13.2}, "pe": {"ltp": 98.25, "OI": 118000, "iv": 14.1}}
+                for strike in range(23500, 24500, 50)
+            }}}
+        }
+    count = int(sys.argv[-1]) if len(sys.argv) > 1 and sys.argv[-1].isdigit() else 1000
+    for name, stats in benchmark(body, count).items():
+        print(f"{name:>18}: {stats['cpu_ms']:8.2f} ms CPU per tick for {count} clients, {stats['bytes']} bytes per frame")
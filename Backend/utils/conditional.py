@@ -0,0 +1,70 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from flask import Response, request
+
+# Conditional GET for the read endpoints. History validators come from the
+# storage high-water mark (snapshot count and newest timestamp of every day
+# read) plus the request parameters, so a repeat poll is answered with 304
+# before the body is projected or encoded. Live bodies without a storage
+# sequence (option chain, expiry list) are validated by a hash of the body.
+#
+# The history reads are POSTs. They honour If-None-Match, but as RFC 9110
+# requires for methods other than GET/HEAD a match is answered with 412
+# Precondition Failed rather than 304: the client's copy is current and
+# nothing was read. If-Modified-Since applies to GET/HEAD only.
+
+PAST_DAY_MAX_AGE = 365 * 24 * 3600  # history of a finished session never changes
+REVALIDATE = "private, no-cache"
+SAFE_METHODS = ("GET", "HEAD")
+
+
+def make_etag(*parts):
+    """Strong ETag over JSON-serialisable parts"""
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def http_date(timestamp):
+    return datetime.fromtimestamp(int(timestamp), timezone.utc)
+
+
+def is_fresh(etag, last_modified=None):
+    """True when the client's If-None-Match (or, on GET/HEAD without one, If-Modified-Since) still matches"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.method in SAFE_METHODS and last_modified is not None and request.if_modified_since:
+        return http_date(last_modified) <= request.if_modified_since
+    return False
+
+
+def add_validators(response, etag, last_modified=None, immutable=False):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = http_date(last_modified)
+    response.headers["Cache-Control"] = (
+        f"private, max-age={PAST_DAY_MAX_AGE}, immutable" if immutable else REVALIDATE
+    )
+    return response
+
+
+def not_modified(etag, last_modified=None, immutable=False):
+    """304 for GET/HEAD; 412 for other methods whose If-None-Match matched"""
+    if request.method not in SAFE_METHODS:
+        body = json.dumps({"error": "Precondition Failed: the resource matches If-None-Match"})
+        response = Response(body, status=412, mimetype="application/json")
+        response.set_etag(etag)
+        return response, 412
+    response = add_validators(Response(status=304), etag, last_modified, immutable)
+    response.headers["Vary"] = "Accept"
+    return response, 304
+
+
+def conditional(response, status=200):
+    """ETag from the body's hash; 304 when the client already holds it"""
+    if status != 200:
+        return response, status
+    etag = hashlib.sha1(response.get_data()).hexdigest()
+    if is_fresh(etag):
+        return not_modified(etag)
+    return add_validators(response, etag), status
@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+
+from .shared_store import default_store
+
+logger = logging.getLogger(__name__)
+
+# Demand signals published by the web processes and read by the collector.
+# Subscriptions are one key per websocket client and (symbol, expiry) it
+# watches, rewritten once a third of its TTL has passed while its stream runs;
+# REST reads that were served are counted in one-minute buckets. Each process
+# remembers the keys it set for its own clients, so a disconnect deletes them
+# without scanning the store.
+
+SUBSCRIPTION_KEY = "demand:sub:"
+REQUEST_KEY = "demand:req:"
+SUBSCRIPTION_TTL = 60  # seconds without a refresh before a subscriber is dropped
+REFRESH_AFTER = SUBSCRIPTION_TTL / 3  # seconds before a live subscription is rewritten
+REQUEST_WINDOW = 300  # seconds of request history that count as "recent"
+BUCKET_SECONDS = 60
+SUBSCRIBER_WEIGHT = 10  # one live subscriber counts as this many recent requests
+
+
+def demand_key(symbol, expiry):
+    return f"{symbol}|{expiry}"
+
+
+class DemandTracker:
+    def __init__(self, store=None):
+        self._store = store
+        self.keys = {}  # client_id -> {subscription key this process set: monotonic time written}
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = default_store()
+        return self._store
+
+    def subscribe(self, client_id, symbol, expiry):
+        """Mark (or refresh) a websocket client as watching symbol/expiry"""
+        key = f"{SUBSCRIPTION_KEY}{client_id}|{demand_key(symbol, expiry)}"
+        with self._lock:
+            self.keys.setdefault(client_id, {})[key] = time.monotonic()
+        self._publish([key], symbol, expiry)
+
+    def refresh(self, client_ids, symbol, expiry):
+        """Keep clients' subscriptions to symbol/expiry alive; only keys past REFRESH_AFTER are written"""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for client_id in client_ids:
+                key = f"{SUBSCRIPTION_KEY}{client_id}|{demand_key(symbol, expiry)}"
+                written = self.keys.setdefault(client_id, {})
+                if now - written.get(key, float("-inf")) >= REFRESH_AFTER:
+                    written[key] = now
+                    due.append(key)
+        self._publish(due, symbol, expiry)
+
+    def _publish(self, keys, symbol, expiry):
+        try:
+            for key in keys:
+                self.store.set(key, demand_key(symbol, expiry), ttl=SUBSCRIPTION_TTL)
+        except Exception as e:
+            logger.warning(f"Could not publish subscription demand: {str(e)}")
+
+    def unsubscribe(self, client_id, symbol=None, expiry=None):
+        """Drop one of a client's subscriptions, or all of them without symbol/expiry"""
+        with self._lock:
+            if symbol is None:
+                keys = set(self.keys.pop(client_id, {}))
+            else:
+                keys = {f"{SUBSCRIPTION_KEY}{client_id}|{demand_key(symbol, expiry)}"}
+                remaining = self.keys.get(client_id, {})
+                for key in keys:
+                    remaining.pop(key, None)
+                if not remaining:
+                    self.keys.pop(client_id, None)
+        try:
+            for key in keys:
+                self.store.delete(key)
+        except Exception as e:
+            logger.warning(f"Could not clear subscription demand: {str(e)}")
+
+    def record_request(self, symbol, expiry):
+        """Count one REST read of symbol/expiry"""
+        if not symbol or expiry is None:
+            return
+        bucket = int(time.time() // BUCKET_SECONDS)
+        try:
+            self.store.incr(
+                f"{REQUEST_KEY}{demand_key(symbol, expiry)}|{bucket}",
+                ttl=REQUEST_WINDOW + BUCKET_SECONDS,
+            )
+        except Exception as e:
+            logger.warning(f"Could not record request demand: {str(e)}")
+
+    def record_response(self, symbol, expiry, status):
+        """Count a REST read once it was served: made-up keys fail validation and never become demand"""
+        # 304 is a served read too: the client's copy of a valid key is current
+        if 200 <= status < 300 or status == 304:
+            self.record_request(symbol, expiry)
+
+    def snapshot(self):
+        """{(symbol, expiry): {"subscribers", "requests", "score"}} for live demand"""
+        demand = {}
+
+        def entry(key):
+            symbol, expiry = key.split("|", 1)
+            return demand.setdefault(
+                (symbol, expiry), {"subscribers": 0, "requests": 0, "score": 0}
+            )
+
+        for value in self.store.items(SUBSCRIPTION_KEY).values():
+            if value:
+                entry(value)["subscribers"] += 1
+
+        oldest_bucket = int((time.time() - REQUEST_WINDOW) // BUCKET_SECONDS)
+        for key, count in self.store.items(REQUEST_KEY).items():
+            key, bucket = key[len(REQUEST_KEY):].rsplit("|", 1)
+            if int(bucket) >= oldest_bucket:
+                entry(key)["requests"] += int(count)
+
+        for stats in demand.values():
+            stats["score"] = stats["subscribers"] * SUBSCRIBER_WEIGHT + stats["requests"]
+        return demand
+
+
+demand_tracker = DemandTracker()
@@ -0,0 +1,162 @@
+import json
+import sys
+import time
+
+from flask import Response, jsonify, request
+
+from utils.conditional import add_validators
+
+# Optional encodings; each is offered only when its package is installed
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+ARROW = "application/vnd.apache.arrow.stream"
+ALIASES = {"application/x-msgpack": MSGPACK, "application/vnd.apache.arrow.file": ARROW}
+
+
+def available_formats():
+    formats = [JSON]
+    if msgpack is not None:
+        formats.append(MSGPACK)
+    if pa is not None:
+        formats.append(ARROW)
+    return formats
+
+
+def negotiate(accept):
+    """Best format for an Accept header (werkzeug MIMEAccept or string); JSON unless asked otherwise"""
+    if isinstance(accept, str):
+        accept = [(part.split(";")[0].strip(), 1) for part in accept.split(",")]
+    formats = available_formats()
+    best, best_quality = JSON, 0
+    for mimetype, quality in accept:
+        mimetype = ALIASES.get(mimetype, mimetype)
+        if mimetype in formats and quality > best_quality:
+            best, best_quality = mimetype, quality
+    return best
+
+
+def flatten(payload, prefix=""):
+    """{"a": {"b": [..]}} -> {"a.b": [..]}; lists and scalars are leaves"""
+    flat = {}
+    for key, value in payload.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def history_columns(payload, length_key="timestamp"):
+    """History bodies are already columnar: every list as long as `length_key` is a column"""
+    flat = flatten(payload)
+    rows = len(flat.get(length_key) or [])
+    columns = {key: value for key, value in flat.items() if isinstance(value, list) and len(value) == rows}
+    meta = {key: value for key, value in flat.items() if key not in columns}
+    return columns, meta
+
+
+def option_chain_columns(payload):
+    """Live chain {strike: {"ce": {...}, "pe": {...}}} pivoted into one column per field"""
+    options = payload.get("options") or {}
+    chain = (options.get("data") or {}).get("oc") or {}
+    strikes = sorted(chain, key=float)
+    rows = [flatten(chain[strike]) for strike in strikes]
+    names = sorted({name for row in rows for name in row})
+    columns = {"strike": strikes}
+    columns.update({name: [row.get(name) for row in rows] for name in names})
+
+    meta = {key: value for key, value in payload.items() if key != "options"}
+    meta["options"] = {key: value for key, value in options.items() if key != "data"}
+    meta["options"]["data"] = {key: value for key, value in (options.get("data") or {}).items() if key != "oc"}
+    return columns, meta
+
+
+def _arrow_column(values):
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # Mixed types (e.g. dicts or strings among numbers) travel as JSON text
+        return pa.array([None if value is None else json.dumps(value) for value in values])
+
+
+def encode(columns, meta, mimetype):
+    """Body bytes for a binary format: {"meta", "columns"} in MessagePack, or an Arrow IPC stream"""
+    if mimetype == MSGPACK:
+        return msgpack.packb({"meta": meta, "columns": columns}, use_bin_type=True, default=str)
+    if mimetype == ARROW:
+        table = pa.table(
+            {name: _arrow_column(values) for name, values in columns.items()},
+            metadata={"meta": json.dumps(meta, default=str)},
+        )
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    raise ValueError(f"Unsupported encoding {mimetype}")
+
+
+def respond(payload, status=200, columnar=history_columns, validators=None):
+    """JSON by default; MessagePack or Arrow (columnar) when the Accept header asks for it
+
+    `validators` ({"etag", "last_modified", "immutable"}) are set as
+    ETag/Last-Modified/Cache-Control headers, see utils.conditional.
+    """
+    mimetype = negotiate(request.accept_mimetypes)
+    if mimetype == JSON:
+        response = jsonify(payload)
+    else:
+        columns, meta = columnar(payload)
+        response = Response(encode(columns, meta, mimetype), mimetype=mimetype)
+    response.headers["Vary"] = "Accept"
+    if validators:
+        add_validators(response, **validators)
+    return response, status
+
+
+def benchmark(payload, columnar=history_columns, repeat=5):
+    """Size and encode/decode time of a payload in every available format"""
+    columns, meta = columnar(payload)
+    results = {}
+    for mimetype in available_formats():
+        if mimetype == JSON:
+            encoder = lambda: json.dumps(payload).encode()
+            decoder = json.loads
+        elif mimetype == MSGPACK:
+            encoder = lambda: encode(columns, meta, MSGPACK)
+            decoder = lambda body: msgpack.unpackb(body, raw=False)
+        else:
+            encoder = lambda: encode(columns, meta, ARROW)
+            decoder = lambda body: pa.ipc.open_stream(body).read_all()
+        timings = {"encode": [], "decode": []}
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = encoder()
+            timings["encode"].append(time.perf_counter() - started)
+            started = time.perf_counter()
+            decoder(body)
+            timings["decode"].append(time.perf_counter() - started)
+        results[mimetype] = {
+            "bytes": len(body),
+            "encode_ms": round(min(timings["encode"]) * 1000, 3),
+            "decode_ms": round(min(timings["decode"]) * 1000, 3),
+        }
+    return results
+
+
+# Benchmark a saved response body: python -m utils.encoding <payload.json> [chain]
+if __name__ == "__main__":
+    with open(sys.argv[1]) as file:
+        body = json.load(file)
+    shape = option_chain_columns if len(sys.argv) > 2 and sys.argv[2] == "chain" else history_columns
+    for mimetype, stats in benchmark(body, shape).items():
+        print(f"{mimetype:>38}: {stats['bytes']:>9} bytes, encode {stats['encode_ms']} ms, decode {stats['decode_ms']} ms")
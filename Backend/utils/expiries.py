@@ -0,0 +1,54 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Listed expiries per symbol, used to validate live-stream subscriptions
+# before a producer is started for them. A list is refreshed every
+# EXPIRY_REFRESH seconds. A failed lookup keeps the last list and is retried
+# after a backoff (EXPIRY_RETRY doubling up to EXPIRY_REFRESH), as in the
+# collector, so made-up keys cost at most one upstream call per symbol and
+# backoff however many clients send them.
+
+EXPIRY_REFRESH = 300  # seconds between expiry-list lookups per symbol
+EXPIRY_RETRY = 5  # seconds before retrying a failed lookup
+
+
+class ExpiryCache:
+    def __init__(self, lookup, symbols):
+        """`lookup(symbol)` returns the symbol's listed expiries or raises; `symbols` are the valid symbol names"""
+        self.lookup = lookup
+        self.symbols = symbols
+        self.entries = {}  # symbol -> (expiries as strings or None, fetched_at, failures)
+        self._locks = {symbol: threading.Lock() for symbol in symbols}
+
+    def listed(self, symbol):
+        """A symbol's listed expiries as strings; raises LookupError while none could be fetched"""
+        with self._locks[symbol]:  # one lookup per symbol at a time; others wait for its result
+            expiries, fetched_at, failures = self.entries.get(symbol, (None, 0.0, 0))
+            now = time.monotonic()
+            wait = min(EXPIRY_RETRY * 2 ** (failures - 1), EXPIRY_REFRESH) if failures else EXPIRY_REFRESH
+            if fetched_at and now - fetched_at < wait:
+                if expiries is None:
+                    raise LookupError(f"Expiries for {symbol} are unavailable; retry in {wait - (now - fetched_at):.0f}s")
+                return expiries
+            try:
+                latest = {str(expiry) for expiry in self.lookup(symbol)}
+                if not latest:
+                    raise LookupError(f"No expiries listed for {symbol}")
+            except Exception as e:
+                self.entries[symbol] = (expiries, now, failures + 1)
+                if expiries is None:
+                    raise LookupError(f"Expiries for {symbol} are unavailable: {str(e)}")
+                logger.warning(f"Expiry lookup for {symbol} failed, keeping the last list: {str(e)}")
+                return expiries
+            self.entries[symbol] = (latest, now, 0)
+            return latest
+
+    def validate(self, symbol, expiry):
+        """Raise ValueError unless symbol is known and expiry is one of its listed expiries"""
+        if symbol not in self.symbols:
+            raise ValueError(f"Invalid symbol: {symbol}")
+        if str(expiry) not in self.listed(symbol):
+            raise ValueError(f"{expiry} is not a listed expiry of {symbol}")
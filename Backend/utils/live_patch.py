@@ -0,0 +1,71 @@
+import json
+import sys
+import time
+
+# Patches between consecutive live payloads, for clients that opt in to
+# delta updates. A patch lists what changed as key paths into the nested
+# payload; lists and scalars are replaced whole:
+#     {"seq": 42, "set": [[["options", "data", "oc", "24000", "ce", "OI"], 1250], ...],
+#      "unset": [["options", "data", "oc", "23500"]]}
+# Each patch applies to the payload of seq - 1. A client that sees a gap asks
+# for a resync and gets a full snapshot.
+
+_MISSING = object()
+
+
+def diff(old, new, path=()):
+    """(set, unset) turning `old` into `new`"""
+    changed, removed = [], []
+    for key, value in new.items():
+        before = old.get(key, _MISSING)
+        if isinstance(value, dict) and isinstance(before, dict):
+            sub_changed, sub_removed = diff(before, value, path + (key,))
+            changed.extend(sub_changed)
+            removed.extend(sub_removed)
+        elif before is _MISSING or before != value:
+            changed.append([list(path + (key,)), value])
+    removed.extend(list(path + (key,)) for key in old if key not in new)
+    return changed, removed
+
+
+def make_patch(old, new, seq):
+    changed, removed = diff(old, new)
+    return {"seq": seq, "set": changed, "unset": removed}
+
+
+def apply_patch(payload, patch):
+    """Apply a patch in place (the client-side step, kept here for tests and tools)"""
+    for path, value in patch["set"]:
+        target = payload
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = value
+    for path in patch["unset"]:
+        target = payload
+        for key in path[:-1]:
+            target = target.get(key, {})
+        target.pop(path[-1], None)
+    return payload
+
+
+def encoded_size(message):
+    """(bytes, seconds) to JSON-encode one message, roughly what each emit costs"""
+    started = time.perf_counter()
+    size = len(json.dumps(message))
+    return size, time.perf_counter() - started
+
+
+# Compare full snapshots with patches over saved payloads: python -m utils.live_patch <tick1.json> <tick2.json> ...
+if __name__ == "__main__":
+    payloads = []
+    for name in sys.argv[1:]:
+        with open(name) as file:
+            payloads.append(json.load(file))
+    full_bytes = patch_bytes = 0
+    for seq, (old, new) in enumerate(zip(payloads, payloads[1:]), 1):
+        full_bytes += encoded_size(new)[0]
+        patch = make_patch(old, new, seq)
+        patch_bytes += encoded_size(patch)[0]
+        assert apply_patch(json.loads(json.dumps(old)), patch) == new
+    ticks = max(len(payloads) - 1, 1)
+    print(f"full snapshot: {full_bytes // ticks} bytes/tick, patch: {patch_bytes // ticks} bytes/tick")
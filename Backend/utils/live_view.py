@@ -0,0 +1,99 @@
+import hashlib
+import json
+
+# Per-subscription filters over a live-data payload. A view keeps a window of
+# strikes of the option chain (options.data.oc) and, optionally, only some
+# fields of each strike:
+#     strikes: N          N strikes either side of the one nearest the spot
+#     strikes: [lo, hi]   strikes priced from lo to hi inclusive
+#     fields: [...]       keys kept in each "ce"/"pe" leg and on the strike
+# Subscribers with the same view share a room, so each filtered payload is
+# still built and encoded once per tick however many clients watch it.
+
+LEGS = ("ce", "pe")
+MAX_WINDOW = 100
+
+
+def make_view(strikes=None, fields=None):
+    """Canonical filter for one subscription, or None for the whole payload; raises ValueError"""
+    view = {}
+    if strikes is not None:
+        if isinstance(strikes, bool):
+            raise ValueError("'strikes' must be a count or a [low, high] price range")
+        if isinstance(strikes, int):
+            if not 0 <= strikes <= MAX_WINDOW:
+                raise ValueError(f"'strikes' must be between 0 and {MAX_WINDOW}")
+            view["strikes"] = strikes
+        elif isinstance(strikes, (list, tuple)) and len(strikes) == 2:
+            try:
+                low, high = sorted(float(price) for price in strikes)
+            except (TypeError, ValueError):
+                raise ValueError("'strikes' range must be two prices")
+            view["strikes"] = [low, high]
+        else:
+            raise ValueError("'strikes' must be a count or a [low, high] price range")
+    if fields:
+        if isinstance(fields, str) or not all(isinstance(field, str) for field in fields):
+            raise ValueError("'fields' must be a list of field names")
+        view["fields"] = sorted(set(fields))
+    return view or None
+
+
+def view_id(view):
+    """Short stable id of a view, used in its room name; "" for no filter"""
+    if not view:
+        return ""
+    return hashlib.sha1(json.dumps(view, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def spot_price(payload):
+    spot = (payload.get("spot") or {}).get("data") or {}
+    if spot.get("Ltp") is not None:
+        return spot["Ltp"]
+    return ((payload.get("options") or {}).get("data") or {}).get("sltp")
+
+
+def select_strikes(chain, window, spot=None):
+    """Keys of `chain` inside the window, in price order"""
+    priced = []
+    for key in chain:
+        try:
+            priced.append((float(key), key))
+        except ValueError:
+            continue
+    priced.sort()
+    if isinstance(window, list):
+        low, high = window
+        return [key for price, key in priced if low <= price <= high]
+    if not priced:
+        return []
+    if spot is None:
+        nearest = len(priced) // 2
+    else:
+        nearest = min(range(len(priced)), key=lambda index: abs(priced[index][0] - spot))
+    return [key for _, key in priced[max(nearest - window, 0):nearest + window + 1]]
+
+
+def _strike_fields(strike, fields):
+    if not isinstance(strike, dict):
+        return strike
+    return {
+        key: {field: value for field, value in leg.items() if field in fields} if key in LEGS and isinstance(leg, dict) else leg
+        for key, leg in strike.items()
+        if key in LEGS or key in fields
+    }
+
+
+def apply_view(payload, view):
+    """The part of a live-data payload a view keeps; the payload itself is never modified"""
+    if not view or not isinstance(payload, dict):
+        return payload
+    options = payload.get("options")
+    data = options.get("data") if isinstance(options, dict) else None
+    chain = data.get("oc") if isinstance(data, dict) else None
+    if not isinstance(chain, dict):
+        return payload
+    keys = select_strikes(chain, view["strikes"], spot_price(payload)) if "strikes" in view else list(chain)
+    fields = view.get("fields")
+    oc = {key: _strike_fields(chain[key], fields) if fields else chain[key] for key in keys}
+    return {**payload, "options": {**options, "data": {**data, "oc": oc}}}
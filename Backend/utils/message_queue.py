@@ -0,0 +1,75 @@
+import base64
+import os
+import queue
+import threading
+
+from socketio import PubSubManager, RedisManager
+from socketio.packet import Packet
+
+# Message queue shared by the Socket.IO server processes, so rooms and emits
+# span all of them. SOCKETIO_MESSAGE_QUEUE names it: a redis:// URL in
+# deployments (python-socketio's RedisManager), or local:// for the in-process
+# stand-in below, which lets tests run several servers in one process without
+# a Redis server.
+#
+# Both managers hand emits to live-stream rooms to `live_handler` when one is
+# set (BroadcastHub does), so each process delivers published ticks through
+# its own per-connection send queues instead of the default fan-out.
+
+MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+CHANNEL = os.getenv("SOCKETIO_CHANNEL", "flask-socketio")
+LIVE_ROOM_PREFIX = "live:"
+
+
+class LiveRoutingMixin:
+    live_handler = None  # live_handler(event, data, room)
+
+    def _handle_emit(self, message):
+        room = message.get("room")
+        if self.live_handler is None or not str(room).startswith(LIVE_ROOM_PREFIX) or message.get("callback"):
+            return super()._handle_emit(message)
+        data = message["data"]
+        if message.get("binary"):
+            data = Packet.reconstruct_binary(data[0], [base64.b64decode(a) for a in data[1:]])
+        self.live_handler(message["event"], data[0] if len(data) == 1 else tuple(data), room)
+
+
+class LiveRedisManager(LiveRoutingMixin, RedisManager):
+    pass
+
+
+class LocalQueueManager(LiveRoutingMixin, PubSubManager):
+    """Pub/sub between the Socket.IO servers of one process, with the same semantics as Redis"""
+
+    name = "local"
+    _subscribers = {}  # channel -> [queue.Queue, ...]
+    _lock = threading.Lock()
+
+    def __init__(self, url="local://", channel=CHANNEL, write_only=False, logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.queue = queue.Queue()
+        if not write_only:
+            with self._lock:
+                self._subscribers.setdefault(channel, []).append(self.queue)
+
+    def _publish(self, data):
+        message = self.json.dumps(data)
+        with self._lock:
+            subscribers = list(self._subscribers.get(self.channel, []))
+        for subscriber in subscribers:
+            subscriber.put(message)
+
+    def _listen(self):
+        while True:
+            yield self.queue.get()
+
+
+def queue_options(url=MESSAGE_QUEUE, channel=CHANNEL):
+    """SocketIO() keyword arguments for the configured message queue, if any"""
+    if not url:
+        return {}
+    if url.startswith("local://"):
+        return {"client_manager": LocalQueueManager(url, channel=channel)}
+    if url.startswith(("redis://", "rediss://")):
+        return {"client_manager": LiveRedisManager(url, channel=channel)}
+    return {"message_queue": url, "channel": channel}
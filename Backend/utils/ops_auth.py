@@ -0,0 +1,21 @@
+import hmac
+import os
+from functools import wraps
+from flask import request, jsonify
+
+# Bearer token for the monitoring endpoints (collector health/metrics, stream
+# stats), which scrapers call without a user session. Unset keeps them closed.
+# Kept apart from auth_middleware so these routes need no Firebase setup.
+OPS_TOKEN = os.getenv("OPS_TOKEN")
+
+def ops_token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not OPS_TOKEN:
+            return jsonify({"error": "Monitoring endpoints are disabled; set OPS_TOKEN"}), 403
+        auth_header = request.headers.get('Authorization', '')
+        token = auth_header[len("Bearer "):] if auth_header.startswith("Bearer ") else ""
+        if not token or not hmac.compare_digest(token.encode(), OPS_TOKEN.encode()):
+            return jsonify({"error": "Invalid ops token"}), 401
+        return f(*args, **kwargs)
+    return decorated
@@ -0,0 +1,317 @@
+import json
+import os
+import threading
+import time
+from urllib.parse import quote, unquote, urlparse
+
+# Shared key/value store used to coordinate the collector and web processes.
+# Redis is used in deployments; FileStore keeps the same semantics in a local
+# directory so a single host (or a test) can run without a Redis server, and
+# MemoryStore covers callers that only need to share within one process.
+
+STORE_PREFIX = "optionchain"
+
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisStore:
+    def __init__(self, client=None, prefix=STORE_PREFIX):
+        if client is None:
+            import redis
+
+            client = redis.Redis(
+                host=os.getenv("REDIS_HOST", "localhost"),
+                port=int(os.getenv("REDIS_PORT", 6379)),
+                db=0,
+                decode_responses=True,
+            )
+        self.client = client
+        self.prefix = prefix
+        self._renew = client.register_script(_RENEW_SCRIPT)
+        self._release = client.register_script(_RELEASE_SCRIPT)
+
+    def _key(self, key):
+        return f"{self.prefix}:{key}"
+
+    def acquire(self, key, owner, ttl):
+        """Take or renew a lease; returns True while `owner` holds it"""
+        k = self._key(key)
+        if self.client.set(k, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        return bool(self._renew(keys=[k], args=[owner, int(ttl * 1000)]))
+
+    def release(self, key, owner):
+        self._release(keys=[self._key(key)], args=[owner])
+
+    def holder(self, key):
+        return self.client.get(self._key(key))
+
+    def set(self, key, value, ttl=None):
+        px = int(ttl * 1000) if ttl else None
+        self.client.set(self._key(key), json.dumps(value), px=px)
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        return json.loads(raw) if raw is not None else None
+
+    def delete(self, key):
+        self.client.delete(self._key(key))
+
+    def incr(self, key, amount=1, ttl=None):
+        k = self._key(key)
+        pipe = self.client.pipeline()
+        pipe.incrby(k, amount)
+        if ttl:
+            pipe.pexpire(k, int(ttl * 1000))
+        return int(pipe.execute()[0])
+
+    def items(self, prefix):
+        """Return {key: value} for every live key starting with `prefix`"""
+        start = len(self.prefix) + 1
+        keys = list(self.client.scan_iter(match=self._key(prefix) + "*"))
+        if not keys:
+            return {}
+        result = {}
+        for k, raw in zip(keys, self.client.mget(keys)):
+            if raw is None:
+                continue
+            try:
+                result[k[start:]] = json.loads(raw)
+            except ValueError:
+                result[k[start:]] = raw
+        return result
+
+
+class FileStore:
+    """Directory-backed stand-in for RedisStore (one JSON file per key)."""
+
+    LOCK_STALE_AFTER = 5  # seconds
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        os.makedirs(self.path, exist_ok=True)
+        self._lock_path = os.path.join(self.path, ".lock")
+
+    def _file(self, key):
+        return os.path.join(self.path, quote(key, safe="") + ".json")
+
+    def _lock(self):
+        while True:
+            try:
+                fd = os.open(self._lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self._lock_path) > self.LOCK_STALE_AFTER:
+                        os.remove(self._lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.005)
+
+    def _unlock(self):
+        try:
+            os.remove(self._lock_path)
+        except FileNotFoundError:
+            pass
+
+    def _read(self, key):
+        try:
+            with open(self._file(key), "r") as file:
+                entry = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        if entry.get("expires_at") and entry["expires_at"] <= time.time():
+            return None
+        return entry
+
+    def _write(self, key, value, ttl=None):
+        entry = {"value": value, "expires_at": time.time() + ttl if ttl else None}
+        tmp_path = self._file(key) + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(entry, file)
+        os.replace(tmp_path, self._file(key))
+
+    def acquire(self, key, owner, ttl):
+        """Take or renew a lease; returns True while `owner` holds it"""
+        self._lock()
+        try:
+            entry = self._read(key)
+            if entry is not None and entry["value"] != owner:
+                return False
+            self._write(key, owner, ttl)
+            return True
+        finally:
+            self._unlock()
+
+    def release(self, key, owner):
+        self._lock()
+        try:
+            entry = self._read(key)
+            if entry is not None and entry["value"] == owner:
+                os.remove(self._file(key))
+        finally:
+            self._unlock()
+
+    def holder(self, key):
+        entry = self._read(key)
+        return entry["value"] if entry else None
+
+    def set(self, key, value, ttl=None):
+        self._lock()
+        try:
+            self._write(key, value, ttl)
+        finally:
+            self._unlock()
+
+    def get(self, key):
+        entry = self._read(key)
+        return entry["value"] if entry else None
+
+    def delete(self, key):
+        self._lock()
+        try:
+            os.remove(self._file(key))
+        except FileNotFoundError:
+            pass
+        finally:
+            self._unlock()
+
+    def incr(self, key, amount=1, ttl=None):
+        self._lock()
+        try:
+            entry = self._read(key)
+            value = (entry["value"] if entry else 0) + amount
+            if entry and not ttl and entry.get("expires_at"):
+                ttl = entry["expires_at"] - time.time()
+            self._write(key, value, ttl)
+            return value
+        finally:
+            self._unlock()
+
+    def items(self, prefix):
+        """Return {key: value} for every live key starting with `prefix`"""
+        result = {}
+        self._lock()
+        try:
+            for name in os.listdir(self.path):
+                if not name.endswith(".json"):
+                    continue
+                key = unquote(name[: -len(".json")])
+                if not key.startswith(prefix):
+                    continue
+                entry = self._read(key)
+                if entry is not None:
+                    result[key] = entry["value"]
+                else:
+                    # Expired entries are only ever swept here
+                    try:
+                        os.remove(os.path.join(self.path, name))
+                    except FileNotFoundError:
+                        pass
+        finally:
+            self._unlock()
+        return result
+
+
+class MemoryStore:
+    """Process-local store with the same interface, used when nothing is shared."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _read(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] and entry[1] <= time.time():
+            self._data.pop(key, None)
+            return None
+        return entry
+
+    def acquire(self, key, owner, ttl):
+        with self._lock:
+            entry = self._read(key)
+            if entry is not None and entry[0] != owner:
+                return False
+            self._data[key] = (owner, time.time() + ttl)
+            return True
+
+    def release(self, key, owner):
+        with self._lock:
+            entry = self._read(key)
+            if entry is not None and entry[0] == owner:
+                del self._data[key]
+
+    def holder(self, key):
+        entry = self._read(key)
+        return entry[0] if entry else None
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def get(self, key):
+        entry = self._read(key)
+        return entry[0] if entry else None
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            entry = self._read(key)
+            value = (entry[0] if entry else 0) + amount
+            expires_at = time.time() + ttl if ttl else (entry[1] if entry else None)
+            self._data[key] = (value, expires_at)
+            return value
+
+    def items(self, prefix):
+        with self._lock:
+            keys = [key for key in self._data if key.startswith(prefix)]
+            return {key: entry[0] for key in keys for entry in [self._read(key)] if entry}
+
+
+def get_shared_store(url=None):
+    """Build the store named by SHARED_STORE_URL, or None when unset.
+
+    `redis://host:port/db` selects Redis; `file:///some/dir` or a plain
+    directory path selects the FileStore.
+    """
+    url = url or os.getenv("SHARED_STORE_URL")
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme in ("redis", "rediss", "unix"):
+        import redis
+
+        return RedisStore(redis.Redis.from_url(url, decode_responses=True))
+    if parsed.scheme == "file":
+        return FileStore(parsed.path)
+    return FileStore(url)
+
+
+_default_store = None
+
+
+def default_store():
+    """The configured shared store, else one MemoryStore shared by this process"""
+    global _default_store
+    if _default_store is None:
+        _default_store = get_shared_store() or MemoryStore()
+    return _default_store
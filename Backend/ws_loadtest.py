@@ -0,0 +1,79 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import urllib.request
+
+import socketio
+
+# Websocket load test against a running new_app.py:
+#     python ws_loadtest.py http://localhost:5000 --clients 3000 --hold 60
+# Connects the clients in batches, subscribes each to a (symbol, expiry),
+# holds them while counting received ticks, and reads /api/stream-stats before
+# and after to report the server's memory per connection; pass the server's
+# OPS_TOKEN in the environment. Needs the asyncio client transport:
+# pip install "python-socketio[asyncio_client]".
+
+
+def stream_stats(url):
+    request = urllib.request.Request(
+        f"{url}/api/stream-stats", headers={"Authorization": f"Bearer {os.getenv('OPS_TOKEN', '')}"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+async def subscriber(url, keys, number, received, connected):
+    client = socketio.AsyncClient(reconnection=False)
+    symbol, expiry = keys[number % len(keys)]
+
+    @client.on("live_data")
+    async def on_live_data(data):
+        received[number] += 1
+
+    await client.connect(url, transports=["websocket"])
+    await client.emit("start_stream", {"sid": symbol, "exp_sid": expiry})
+    connected.append(client)
+
+
+async def run(url, clients, keys, hold, batch):
+    received = [0] * clients
+    connected = []
+    before = stream_stats(url)
+
+    started = time.perf_counter()
+    for first in range(0, clients, batch):
+        results = await asyncio.gather(
+            *(subscriber(url, keys, number, received, connected) for number in range(first, min(first + batch, clients))),
+            return_exceptions=True,
+        )
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            print(f"{len(failures)} connections failed in batch at {first}: {failures[0]!r}")
+    print(f"Connected {len(connected)}/{clients} clients in {time.perf_counter() - started:.1f}s")
+
+    await asyncio.sleep(hold)
+    after = stream_stats(url)
+    await asyncio.gather(*(client.disconnect() for client in connected), return_exceptions=True)
+
+    added = max(after["connections"] - before["connections"], 1)
+    memory = after["rss_bytes"] - before["rss_bytes"]
+    ticks = sorted(received)
+    print(f"server mode      : {after['async_mode']}")
+    print(f"connections      : {after['connections']} ({added} added)")
+    print(f"producers        : {after['hub']['producers']}")
+    print(f"memory           : {memory / 1024 / 1024:.1f} MiB added, {memory / added / 1024:.1f} KiB per connection")
+    print(f"ticks per client : min {ticks[0]}, median {ticks[len(ticks) // 2]}, max {ticks[-1]} over {hold}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Websocket subscriber load test")
+    parser.add_argument("url")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--keys", default="NIFTY:1419013800", help="comma-separated symbol:expiry pairs to spread clients over")
+    parser.add_argument("--hold", type=int, default=60, help="seconds to stay subscribed")
+    parser.add_argument("--batch", type=int, default=200, help="connections opened concurrently")
+    args = parser.parse_args()
+    pairs = [tuple(pair.split(":", 1)) for pair in args.keys.split(",")]
+    asyncio.run(run(args.url.rstrip("/"), args.clients, pairs, args.hold, args.batch))